@@ -0,0 +1,124 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from uni_kie.models import http
+from uni_kie.models.adaptive_concurrency import (
+    AdaptiveConcurrencyLargeLanguageModel,
+    AIMDController,
+)
+from uni_kie.models.model import LargeLanguageModel
+
+
+def test_limit_increases_while_latency_is_stable():
+    controller = AIMDController(initial_limit=2)
+    for _ in range(20):
+        controller.acquire()
+        controller.release(latency=0.1)
+    assert controller.stats()["limit"] > 2
+
+
+def test_limit_decreases_once_per_throttling_event():
+    controller = AIMDController(initial_limit=16)
+    for _ in range(10):
+        controller.acquire()
+        controller.release(latency=1.0)
+    limit = controller.stats()["limit"]
+
+    controller.record_throttled(429)
+    controller.record_throttled(429)  # same overload, still in the cooldown
+    assert controller.stats()["limit"] == limit // 2
+    assert controller.history[-1]["reason"] == "throttled (429)"
+
+
+def test_limit_decreases_on_rising_p95_latency():
+    controller = AIMDController(initial_limit=16, max_limit=16)
+    for _ in range(10):
+        controller.acquire()
+        controller.release(latency=0.001)
+    for _ in range(10):
+        controller.acquire()
+        controller.release(latency=1.0)
+    assert controller.stats()["limit"] == 8
+    assert controller.history[-1]["reason"] == "rising p95 latency"
+
+
+def test_limit_recovers_once_latency_is_stable_at_a_higher_level():
+    controller = AIMDController(initial_limit=8, max_limit=64)
+    for _ in range(200):
+        controller.acquire()
+        controller.release(latency=0.5)
+    for _ in range(300):  # e.g. longer prompts, not an overloaded backend
+        controller.acquire()
+        controller.release(latency=1.2)
+
+    decreases = [
+        i
+        for i, change in enumerate(controller.history)
+        if change["reason"] == "rising p95 latency"
+    ]
+    assert len(decreases) == 1
+    assert controller.stats()["limit"] > controller.history[decreases[0]]["limit"]
+    assert controller.stats()["baseline_p95_latency"] == 1.2
+
+
+class FakeModel(LargeLanguageModel):
+    def __init__(self, throttle_every: int = 0):
+        super().__init__()
+        self.max_input_tokens = 100
+        self.throttle_every = throttle_every
+        self.calls = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+
+    def _enter(self) -> bool:
+        with self.lock:
+            self.calls += 1
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            return self.throttle_every and self.calls % self.throttle_every == 0
+
+    def _exit(self):
+        with self.lock:
+            self.in_flight -= 1
+
+    def predict(self, input: str) -> str:
+        if self._enter():
+            http._notify_throttled(429)  # what http.post_json does on a retried 429
+        threading.Event().wait(0.01)
+        self._exit()
+        return input
+
+    async def apredict(self, input: str) -> str:
+        self._enter()
+        await asyncio.sleep(0.01)
+        self._exit()
+        return input
+
+
+def test_wrapper_limits_in_flight_requests_of_threads():
+    model = FakeModel(throttle_every=10)
+    controller = AIMDController(initial_limit=4, max_limit=4)
+    wrapped = AdaptiveConcurrencyLargeLanguageModel(model, controller)
+
+    with ThreadPoolExecutor(max_workers=16) as executor:
+        assert list(executor.map(wrapped.predict, map(str, range(50)))) == list(
+            map(str, range(50))
+        )
+    assert model.max_in_flight <= 4
+    assert any(change["reason"] == "throttled (429)" for change in controller.history)
+    assert controller.stats()["in_flight"] == 0
+
+
+def test_wrapper_limits_in_flight_requests_of_asyncio_tasks():
+    model = FakeModel()
+    wrapped = AdaptiveConcurrencyLargeLanguageModel(
+        model, AIMDController(initial_limit=3, max_limit=3)
+    )
+
+    async def run():
+        return await asyncio.gather(*(wrapped.apredict(str(i)) for i in range(30)))
+
+    assert asyncio.run(run()) == list(map(str, range(30)))
+    assert model.max_in_flight == 3
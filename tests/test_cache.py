@@ -0,0 +1,96 @@
+import pytest
+
+from uni_kie.cache import SQLiteCache
+from uni_kie.models.adaptive_concurrency import (
+    AdaptiveConcurrencyLargeLanguageModel,
+    AIMDController,
+)
+from uni_kie.models.cached import CachedLargeLanguageModel
+from uni_kie.models.model import LargeLanguageModel
+from uni_kie.models.rate_limited import RateLimitedLargeLanguageModel, RateLimiter
+
+
+def test_cache_hits_and_misses(tmp_path):
+    cache = SQLiteCache(tmp_path / "cache.sqlite")
+    key = cache.make_key("GPT_NeoX(temperature=1)", "prompt")
+
+    assert cache.get(key) is None
+    cache.set(key, " completion")
+    assert cache.get(key) == " completion"
+
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["entries"] == 1
+
+
+def test_cache_key_depends_on_namespace():
+    assert SQLiteCache.make_key("GPT_NeoX(temperature=1)", "prompt") != (
+        SQLiteCache.make_key("GPT_NeoX(temperature=0.1)", "prompt")
+    )
+
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    cache = SQLiteCache(tmp_path / "cache.sqlite", max_size_bytes=10)
+    cache.set("a", "12345")
+    cache.set("b", "12345")
+    cache.get("a")  # "b" is now the least recently used entry
+    cache.set("c", "12345")
+
+    assert cache.get("b") is None
+    assert cache.get("a") == "12345"
+    assert cache.get("c") == "12345"
+    assert cache.stats()["evictions"] == 1
+
+
+def test_cache_read_only(tmp_path):
+    path = tmp_path / "cache.sqlite"
+    cache = SQLiteCache(path)
+    cache.set("a", "value")
+    cache.close()
+
+    read_only_cache = SQLiteCache(path, read_only=True)
+    read_only_cache.set("b", "value")
+    assert read_only_cache.get("a") == "value"
+    assert read_only_cache.get("b") is None
+    assert len(read_only_cache) == 1
+
+
+def test_cache_read_only_missing_file(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        SQLiteCache(tmp_path / "missing.sqlite", read_only=True)
+
+
+class FakeModel(LargeLanguageModel):
+    def __init__(self):
+        super().__init__()
+        self.max_input_tokens = 100
+        self.max_generated_tokens = 0
+        self.calls = 0
+
+    def __repr__(self):
+        return "FakeModel(temperature=0)"
+
+    def predict(self, input):
+        self.calls += 1
+        return input.upper()
+
+
+def test_stacked_wrappers_behave_like_the_wrapped_model(tmp_path, monkeypatch):
+    monkeypatch.setattr(
+        RateLimitedLargeLanguageModel, "_get_number_of_tokens", lambda self, input: 1
+    )
+    model = FakeModel()
+    wrapped = CachedLargeLanguageModel(
+        RateLimitedLargeLanguageModel(
+            AdaptiveConcurrencyLargeLanguageModel(model, AIMDController()),
+            RateLimiter(),
+        ),
+        SQLiteCache(tmp_path / "completions.sqlite"),
+    )
+
+    assert repr(wrapped) == repr(model)
+    assert wrapped.max_input_tokens == 100
+    assert wrapped.max_generated_tokens == 0
+    assert wrapped.predict("a") == wrapped.predict("a") == "A"
+    assert model.calls == 1
@@ -0,0 +1,162 @@
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from uni_kie.models import http
+from uni_kie.models.flan_t5 import FLAN_T5
+from uni_kie.models.gpt import GPT3_Davinci, GPT_NeoX
+from uni_kie.models.model import (
+    ModelAPIError,
+    ModelRateLimitError,
+    ModelServerError,
+    ModelTimeoutError,
+)
+
+
+@pytest.fixture
+def server(monkeypatch):
+    """
+    Answers POST /<status>,<status>,... with the given status codes in turn (the last one repeats),
+    POST /slow after 1 second. Every response body is {"text": "ok"}, except for POST /html
+    (200 with an HTML error page).
+    """
+    monkeypatch.setattr(http, "get_backoff_delay", lambda *args, **kwargs: 0)
+    calls = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            self.rfile.read(int(self.headers["Content-Length"]))
+            calls.append(self.path)
+            if self.path == "/slow":
+                time.sleep(1)
+                status_codes = [200]
+            elif self.path == "/html":
+                status_codes = [200]
+            else:
+                status_codes = [int(code) for code in self.path[1:].split(",")]
+            status_code = status_codes[min(len(calls) - 1, len(status_codes) - 1)]
+
+            if self.path == "/html":
+                body = ("<html>" + "Bad Gateway " * 100 + "</html>").encode()
+            else:
+                body = json.dumps({"text": "ok"}).encode()
+            try:
+                self.send_response(status_code)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            except BrokenPipeError:  # the client timed out
+                pass
+
+        def log_message(self, *args):
+            pass
+
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}", calls
+    httpd.shutdown()
+
+
+def test_post_json_retries_rate_limits_and_server_errors(server):
+    url, calls = server
+    assert http.post_json(f"{url}/429,503,200", {}, {}) == {"text": "ok"}
+    assert len(calls) == 3
+
+
+@pytest.mark.parametrize(
+    "status_code, error",
+    [(429, ModelRateLimitError), (500, ModelServerError)],
+)
+def test_post_json_raises_typed_error_after_all_retries(server, status_code, error):
+    url, calls = server
+    with pytest.raises(error) as exc_info:
+        http.post_json(f"{url}/{status_code}", {}, {}, max_retries=2)
+    assert exc_info.value.status_code == status_code
+    assert len(calls) == 3
+
+
+def test_post_json_does_not_retry_client_errors(server):
+    url, calls = server
+    with pytest.raises(ModelAPIError) as exc_info:
+        http.post_json(f"{url}/400", {}, {})
+    assert type(exc_info.value) is ModelAPIError
+    assert len(calls) == 1
+
+
+def test_post_json_times_out(server):
+    url, calls = server
+    with pytest.raises(ModelTimeoutError):
+        http.post_json(f"{url}/slow", {}, {}, max_retries=1, timeout=(1, 0.1))
+    assert len(calls) == 2
+
+
+def test_apost_json_retries_and_raises_typed_errors(server):
+    url, calls = server
+
+    async def run():
+        try:
+            assert await http.apost_json(f"{url}/429,503,200", {}, {}) == {"text": "ok"}
+            with pytest.raises(ModelServerError):
+                await http.apost_json(f"{url}/500", {}, {}, max_retries=1)
+        finally:
+            await http.close_async_session()
+
+    asyncio.run(run())
+    assert len(calls) == 5
+
+
+def test_close_async_session():
+    async def run():
+        session = http.get_async_session()
+        assert http.get_async_session() is session  # shared by all requests of the loop
+        await http.close_async_session()
+        assert session.closed
+
+        new_session = http.get_async_session()
+        assert new_session is not session
+        await http.close_async_session()
+        await http.close_async_session()  # nothing left to close
+        return new_session
+
+    assert asyncio.run(run()).closed
+
+
+def test_non_json_responses_raise_model_api_error(server):
+    url, calls = server
+
+    async def run():
+        try:
+            with pytest.raises(ModelAPIError) as exc_info:
+                await http.apost_json(f"{url}/html", {}, {})
+            return exc_info.value
+        finally:
+            await http.close_async_session()
+
+    with pytest.raises(ModelAPIError) as exc_info:
+        http.post_json(f"{url}/html", {}, {})
+    for error in [exc_info.value, asyncio.run(run())]:
+        assert type(error) is ModelAPIError
+        assert error.status_code == 200
+        assert "<html>Bad Gateway" in str(error)
+        assert len(str(error)) < http.MAX_ERROR_BODY_LENGTH + 100  # truncated
+    assert len(calls) == 2
+
+
+@pytest.mark.parametrize(
+    "parse_response, resp",
+    [
+        (FLAN_T5._parse_response, []),
+        (FLAN_T5._parse_response, {"error": "model is loading"}),
+        (FLAN_T5._parse_response, [{"error": "model is loading"}]),
+        (GPT_NeoX._parse_response, {"error": "unknown engine"}),
+        (GPT3_Davinci._parse_response, {"choices": []}),
+    ],
+)
+def test_unexpected_responses_raise_model_api_error(parse_response, resp):
+    with pytest.raises(ModelAPIError):
+        parse_response(resp)
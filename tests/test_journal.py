@@ -0,0 +1,39 @@
+from uni_kie.journal import RunJournal
+
+FILENAMES = ["a.pdf", "b.pdf", "c.pdf"]
+
+
+def test_journal_skips_completed_documents(tmp_path):
+    journal = RunJournal(tmp_path / "run.journal.jsonl")
+    journal.record_done("a.pdf", [" London"], "address__post_town=London")
+    journal.record_failed("b.pdf", ValueError("API down"))
+
+    restarted_journal = RunJournal(tmp_path / "run.journal.jsonl")
+    assert restarted_journal.get_pending(FILENAMES) == ["b.pdf", "c.pdf"]
+    assert restarted_journal.get_pending(FILENAMES, retry_failed_only=True) == ["b.pdf"]
+    assert restarted_journal.get_prediction("a.pdf") == "address__post_town=London"
+    assert restarted_journal.get_prediction("b.pdf") is None
+
+
+def test_journal_last_record_wins(tmp_path):
+    journal = RunJournal(tmp_path / "run.journal.jsonl")
+    journal.record_failed("b.pdf", ValueError("API down"))
+    journal.record_done("b.pdf", [" London"], "address__post_town=London")
+
+    restarted_journal = RunJournal(tmp_path / "run.journal.jsonl")
+    assert restarted_journal.failed == []
+    assert restarted_journal.completed == ["b.pdf"]
+
+
+def test_journal_ignores_truncated_last_line(tmp_path):
+    path = tmp_path / "run.journal.jsonl"
+    journal = RunJournal(path)
+    journal.record_done("a.pdf", [" London"], "address__post_town=London")
+    with open(path, "a") as f:
+        f.write('{"filename": "b.pdf", "sta')
+
+    restarted_journal = RunJournal(path)
+    assert restarted_journal.completed == ["a.pdf"]
+
+    restarted_journal.record_done("b.pdf", [" Leeds"], "address__post_town=Leeds")
+    assert RunJournal(path).completed == ["a.pdf", "b.pdf"]
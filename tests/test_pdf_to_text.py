@@ -0,0 +1,314 @@
+import os
+import pickle
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+import fitz as PyMuPDF
+import numpy as np
+import pandas as pd
+import pytest
+
+from uni_kie import PATH_DATA
+from uni_kie.constants import RASTERIZERS
+from uni_kie.kleister_charity_constants import KLEISTER_CHARITY_CONSTANTS
+from uni_kie.pdf_to_text import pdf_to_text
+from uni_kie.pdf_to_text.ocr import ocr
+from uni_kie.pdf_to_text.ocr.ocr import AbstractOCRModel
+from uni_kie.pdf_to_text.pdf_to_text import (
+    PYMUPDF_LOCK,
+    KleisterCharityWrapper,
+    PyMuPDFWrapper,
+    SroieWrapper,
+)
+from uni_kie.sroie_constants import PATH_SROIE_TEST
+
+SAMPLE_PDF = PATH_DATA / "own_sample_invoice.pdf"
+
+
+def test_pymupdf_wrapper_serialises_extraction_across_threads(monkeypatch):
+    extract_pages = pdf_to_text._extract_pages
+
+    def extract_pages_holding_lock(*args, **kwargs):
+        assert PYMUPDF_LOCK.locked()
+        return extract_pages(*args, **kwargs)
+
+    monkeypatch.setattr(pdf_to_text, "_extract_pages", extract_pages_holding_lock)
+
+    wrapper = PyMuPDFWrapper()
+    text = wrapper.get_text(SAMPLE_PDF)
+    number_of_pages = wrapper.stats["pages"]
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        texts = list(executor.map(wrapper.get_text, [SAMPLE_PDF] * 16))
+
+    assert texts == [text] * 16
+    assert wrapper.stats["pages"] == 17 * number_of_pages
+
+
+def write_pdf(path, page_texts: list) -> None:
+    with PyMuPDF.open() as doc:
+        for text in page_texts:
+            doc.new_page().insert_text((72, 72), text)
+        doc.save(path)
+
+
+def test_pymupdf_wrapper_extracts_in_parallel_like_serially(tmp_path):
+    write_pdf(tmp_path / "long.pdf", [f"page {i}" for i in range(7)])
+    write_pdf(tmp_path / "short.pdf", ["only page"])
+    file_paths = [tmp_path / "long.pdf", SAMPLE_PDF, tmp_path / "short.pdf"]
+    serial_wrapper = PyMuPDFWrapper()
+    texts = serial_wrapper.get_texts(file_paths)
+    assert [line for line in texts[0].split() if line.isdigit()] == list("0123456")
+
+    parallel_wrapper = PyMuPDFWrapper(processes=2, pages_per_task=2)
+    try:
+        assert parallel_wrapper.get_texts(file_paths) == texts
+        assert parallel_wrapper.get_text(tmp_path / "long.pdf") == texts[0]
+    finally:
+        parallel_wrapper.close()
+    assert parallel_wrapper.stats["pages"] == serial_wrapper.stats["pages"] + 7
+
+
+def test_only_pages_without_a_usable_text_layer_need_ocr(tmp_path, monkeypatch):
+    image = PyMuPDF.Pixmap(PyMuPDF.csRGB, PyMuPDF.IRect(0, 0, 20, 20), False)
+    image.clear_with(128)
+    with PyMuPDF.open() as doc:
+        for text, image_fraction in [
+            ("text only", None),
+            (None, 1.0),  # a scan
+            (None, 0.1),  # a small image without any text
+            ("text and a logo", 0.1),
+            ("a scan with an annotation", 0.9),
+        ]:
+            page = doc.new_page()
+            if text is not None:
+                page.insert_text((72, 72), text)
+            if image_fraction is not None:
+                width, height = page.rect.width, page.rect.height
+                page.insert_image(
+                    PyMuPDF.Rect(0, 0, width, height * image_fraction), pixmap=image
+                )
+        doc.save(tmp_path / "mixed.pdf")
+
+    with PyMuPDF.open(tmp_path / "mixed.pdf") as doc:
+        assert [pdf_to_text._page_needs_ocr(page, 0.5) for page in doc] == [
+            False,
+            True,
+            True,
+            False,
+            True,
+        ]
+
+    # tesseract isn't needed to check which pages are OCR'd
+    monkeypatch.setattr(
+        PyMuPDF.Page,
+        "get_textpage_ocr",
+        lambda page, flags=0, full=False: page.get_textpage(),
+    )
+    wrapper = PyMuPDFWrapper()
+    assert "text and a logo" in wrapper.get_text(tmp_path / "mixed.pdf")
+    assert wrapper.stats == {"pages": 5, "ocr_pages": 3, "cached_pages": 0}
+
+
+class ShapeOCRModel(AbstractOCRModel):
+    # module-level so that it can be sent to the worker processes
+    def ocr_image(self, image) -> str:
+        return str(image.shape)
+
+
+def test_ocr_workers_forked_while_another_thread_holds_the_pymupdf_lock():
+    expected_text = ShapeOCRModel(
+        dpi=20, batch_size=1, rasterizer=RASTERIZERS.PY_MU_PDF
+    ).get_text(SAMPLE_PDF)
+    ocr_model = ShapeOCRModel(
+        dpi=20, batch_size=1, processes=2, rasterizer=RASTERIZERS.PY_MU_PDF
+    )
+
+    with PYMUPDF_LOCK:  # e.g. a pipeline thread that is extracting another document
+        executor = ocr_model._get_executor()
+        assert list(executor.map(abs, [-1, -2])) == [1, 2]  # forks the workers
+
+    with ThreadPoolExecutor(max_workers=1) as thread:
+        future = thread.submit(ocr_model.get_text, SAMPLE_PDF)
+        try:
+            assert future.result(timeout=30) == expected_text
+        except FutureTimeoutError:
+            for process in executor._processes.values():
+                process.terminate()
+            pytest.fail("the OCR worker processes are deadlocked on PYMUPDF_LOCK")
+        finally:
+            ocr_model.close()
+
+
+def test_ocr_threads_share_one_process_pool(monkeypatch):
+    pools = []
+
+    class SlowProcessPoolExecutor:
+        def __init__(self, max_workers):
+            time.sleep(
+                0.05
+            )  # widens the window in which another thread could create a pool
+            pools.append(self)
+
+    monkeypatch.setattr(ocr, "ProcessPoolExecutor", SlowProcessPoolExecutor)
+    ocr_model = ShapeOCRModel(processes=2)
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        executors = list(executor.map(lambda _: ocr_model._get_executor(), range(8)))
+
+    assert len(pools) == 1
+    assert executors == pools * 8
+    # the pool and its lock aren't sent to the worker processes
+    copied_model = pickle.loads(pickle.dumps(ocr_model))
+    assert copied_model._executor is None
+    assert copied_model._get_executor() is not ocr_model._executor
+
+
+def write_kleister_tsv(path, texts):
+    pd.DataFrame(
+        {
+            "filename": [f"{i}.pdf" for i in range(len(texts))],
+            "text_best_cleaned": texts,
+            "text_best": texts,
+        }
+    ).to_csv(path, sep="\t", index=False)
+
+
+def test_memory_mapped_kleister_texts_survive_a_concurrent_run(tmp_path, monkeypatch):
+    monkeypatch.setattr(pdf_to_text, "PATH_CACHE", tmp_path / "cache")
+    tsv_path = tmp_path / "in_extended.tsv"
+    monkeypatch.setitem(KLEISTER_CHARITY_CONSTANTS.split_to_path, "dev-0", tsv_path)
+
+    write_kleister_tsv(tsv_path, ["first text", "second text"])
+    first_run = KleisterCharityWrapper(memory_map_texts=True)
+
+    # another run on the same split rewrites the text store (here with other texts)
+    write_kleister_tsv(tsv_path, ["another text, longer than the first one", "b"])
+    second_run = KleisterCharityWrapper(memory_map_texts=True)
+
+    assert first_run.get_text("0.pdf") == "first text"
+    assert first_run.get_text("1.pdf") == "second text"
+    assert second_run.get_text("1.pdf") == "b"
+    assert list((tmp_path / "cache").iterdir()) == [first_run.text_store_path]
+
+
+def test_kleister_wrapper_looks_up_texts_by_filename(tmp_path, monkeypatch):
+    tsv_path = tmp_path / "in_extended.tsv"
+    monkeypatch.setitem(KLEISTER_CHARITY_CONSTANTS.split_to_path, "dev-0", tsv_path)
+    write_kleister_tsv(tsv_path, ["first text", "second text"])
+
+    wrapper = KleisterCharityWrapper()
+
+    assert wrapper.get_text("1.pdf") == "second text"
+    assert wrapper.get_text("0.pdf") == "first text"
+    with pytest.raises(KeyError):
+        wrapper.get_text("2.pdf")
+    assert list(wrapper.iter_documents()) == [
+        ("0.pdf", "first text"),
+        ("1.pdf", "second text"),
+    ]
+
+
+def write_sroie_ocr_boxes(directory, lines_by_stem: dict) -> None:
+    directory.mkdir(parents=True, exist_ok=True)
+    for stem, lines in lines_by_stem.items():
+        (directory / f"{stem}.txt").write_text(
+            "".join(
+                f"{i},{i},{i + 10},{i},{i + 10},{i + 5},{i},{i + 5},{line}\n"
+                for i, line in enumerate(lines)
+            )
+        )
+
+
+@pytest.fixture
+def sroie_ocr_boxes(tmp_path, monkeypatch):
+    monkeypatch.setattr(pdf_to_text, "PATH_CACHE", tmp_path / "cache")
+    monkeypatch.setattr(pdf_to_text, "PATH_SROIE_TEST_OCR", tmp_path / "ocr_boxes")
+    write_sroie_ocr_boxes(
+        tmp_path / "ocr_boxes",
+        {
+            "X001": ["ACME", "TOTAL: 1,234.50"],
+            "X002": ["SHOP"],
+            "X003": [],
+        },
+    )
+    return tmp_path / "ocr_boxes"
+
+
+def test_sroie_wrapper_looks_up_texts_by_filename(sroie_ocr_boxes):
+    wrapper = SroieWrapper(use_cache=False)
+
+    assert wrapper.get_text(PATH_SROIE_TEST / "X002.jpg") == "SHOP"
+    assert (
+        wrapper.get_text(str(PATH_SROIE_TEST / "X001.jpg")) == "ACME\nTOTAL: 1,234.50"
+    )
+    assert wrapper.get_text(PATH_SROIE_TEST / "X003.jpg") == ""
+    with pytest.raises(KeyError):
+        wrapper.get_text(PATH_SROIE_TEST / "X004.jpg")
+    assert list(wrapper.iter_documents()) == [
+        (PATH_SROIE_TEST / "X001.jpg", "ACME\nTOTAL: 1,234.50"),
+        (PATH_SROIE_TEST / "X002.jpg", "SHOP"),
+        (PATH_SROIE_TEST / "X003.jpg", ""),
+    ]
+
+
+def test_sroie_ocr_box_cache_is_rebuilt_when_a_file_changes(
+    sroie_ocr_boxes, monkeypatch
+):
+    load_file_ocr = SroieWrapper._load_file_ocr
+    loaded_files = []
+
+    def counting_load_file_ocr(path):
+        loaded_files.append(path.name)
+        return load_file_ocr(path)
+
+    monkeypatch.setattr(
+        SroieWrapper, "_load_file_ocr", staticmethod(counting_load_file_ocr)
+    )
+
+    def load() -> SroieWrapper:
+        loaded_files.clear()
+        return SroieWrapper()
+
+    wrapper = load()
+    assert len(loaded_files) == 3
+    expected_boxes = list(wrapper.data["boxes"])
+    assert [len(boxes) for boxes in expected_boxes] == [2, 1, 0]
+
+    wrapper = load()  # from the cache
+    assert loaded_files == []
+    assert wrapper.get_text(PATH_SROIE_TEST / "X002.jpg") == "SHOP"
+    for boxes, cached_boxes in zip(expected_boxes, wrapper.data["boxes"]):
+        assert np.array_equal(boxes, cached_boxes)
+
+    # the size changes
+    write_sroie_ocr_boxes(sroie_ocr_boxes, {"X002": ["SHOP SHOP"]})
+    wrapper = load()
+    assert len(loaded_files) == 3
+    assert wrapper.get_text(PATH_SROIE_TEST / "X002.jpg") == "SHOP SHOP"
+
+    # only the modification time changes
+    path = sroie_ocr_boxes / "X002.txt"
+    os.utime(path, ns=(path.stat().st_atime_ns, path.stat().st_mtime_ns + 10**9))
+    load()
+    assert len(loaded_files) == 3
+
+    # only the name changes
+    path.rename(sroie_ocr_boxes / "X004.txt")
+    wrapper = load()
+    assert len(loaded_files) == 3
+    assert wrapper.get_text(PATH_SROIE_TEST / "X004.jpg") == "SHOP SHOP"
+    with pytest.raises(KeyError):
+        wrapper.get_text(PATH_SROIE_TEST / "X002.jpg")
+
+
+@pytest.mark.parametrize("use_cache", [False, True])
+def test_sroie_wrapper_without_ocr_box_files(tmp_path, monkeypatch, use_cache):
+    monkeypatch.setattr(pdf_to_text, "PATH_CACHE", tmp_path / "cache")
+    monkeypatch.setattr(pdf_to_text, "PATH_SROIE_TEST_OCR", tmp_path / "ocr_boxes")
+    (tmp_path / "ocr_boxes").mkdir()
+
+    for _ in range(2):  # the second time from the cache (if use_cache)
+        wrapper = SroieWrapper(use_cache=use_cache)
+        assert len(wrapper.data) == 0
+        assert list(wrapper.iter_documents()) == []
@@ -0,0 +1,603 @@
+import asyncio
+import random
+import threading
+
+import pytest
+import regex
+
+from uni_kie.constants import (
+    LONG_DOCUMENT_HANDLING_VARIANTS,
+    PARSERS,
+    PROMPT_VARIANTS,
+    TOKENIZERS,
+)
+from uni_kie.journal import RunJournal
+from uni_kie.kleister_charity_constants import KLEISTER_CHARITY_CONSTANTS
+from uni_kie.models.model import LargeLanguageModel
+from uni_kie.models.rate_limited import RateLimitedLargeLanguageModel, RateLimiter
+from uni_kie.models.routing import ModelProfile
+from uni_kie.pdf_to_text.pdf_to_text import AbstractPDFToTextModel
+from uni_kie.pipeline import TRUNCATION_MARKER, LLMPipeline, RouterLLMPipeline
+from uni_kie.sroie_constants import SROIE_CONSTANTS
+
+SROIE_VALUES = {
+    "Company Name": "ACME",
+    "Date of Receipt": "02/01/2018",
+    "Address of Company": "SETAPAK",
+    "Total": "39.75",
+}
+KLEISTER_CHARITY_VALUES = {
+    "Address (post town)": "LEIGH-ON-SEA",
+    "Address (post code)": "SS08HX",
+    "Address (street)": "SECOND-AVENUE",
+    "Charity Name": "HAVENS",
+    "Charity Number": "1022119",
+    "Annual Income": "10348000.00",
+    "Period End Date": "2016-03-31",
+    "Annual Spending": "9415000.00",
+}
+
+
+class FakeTokenizer:
+    """
+    Every word is a token (together with the whitespace in front of it), which is enough to
+    count tokens without the gpt2 tokenizer.
+    """
+
+    def __call__(self, text: str, return_offsets_mapping: bool = False) -> dict:
+        spans = [match.span() for match in regex.finditer(r"\s*\S+|\s+", text)]
+        tokenized = {"input_ids": list(range(len(spans)))}
+        if return_offsets_mapping:
+            tokenized["offset_mapping"] = spans
+        return tokenized
+
+
+class FakeModel(LargeLanguageModel):
+    """
+    Answers the keys of the prompt with the values that are in the model input (null otherwise),
+    in the format of a completion (the prompt ends with the first key).
+    """
+
+    def __init__(self, values: dict, max_input_tokens: int = 100):
+        super().__init__()
+        self.values = values
+        self.max_input_tokens = max_input_tokens
+        self.model_inputs = []
+
+    def predict(self, input: str) -> str:
+        assert get_number_of_tokens(input) <= self.max_input_tokens
+        self.model_inputs.append(input)
+        document, prompt = input.rsplit("\n\nExtract ", 1)
+        prompt_keys = regex.findall(r'"([^"]+)"', prompt.split(" from the document")[0])
+        answers = [
+            self.values[key] if self.values[key] in document.split() else "null"
+            for key in prompt_keys[:-1]  # the last one is the stop key
+        ]
+        return " " + "\n".join(
+            [answers[0]]
+            + [f"{key}: {answer}" for key, answer in zip(prompt_keys[1:], answers[1:])]
+        )
+
+
+class EchoModel(LargeLanguageModel):
+    """
+    Answers the first key with the first word of the document after a random latency, so that
+    requests finish in a random order. Counts the requests that are in flight at the same time.
+    """
+
+    def __init__(self, max_input_tokens: int = 100):
+        super().__init__()
+        self.max_input_tokens = max_input_tokens
+        self.calls = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+
+    def _enter(self) -> None:
+        with self.lock:
+            self.calls += 1
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+    def _exit(self) -> None:
+        with self.lock:
+            self.in_flight -= 1
+
+    def predict(self, input: str) -> str:
+        assert get_number_of_tokens(input) <= self.max_input_tokens
+        self._enter()
+        threading.Event().wait(random.uniform(0, 0.01))
+        self._exit()
+        return " " + input.split()[0]
+
+    async def apredict(self, input: str) -> str:
+        assert get_number_of_tokens(input) <= self.max_input_tokens
+        self._enter()
+        await asyncio.sleep(random.uniform(0, 0.01))
+        self._exit()
+        return " " + input.split()[0]
+
+
+class FakePDFToTextModel(AbstractPDFToTextModel):
+    def __init__(self, texts: dict):
+        super().__init__()
+        self.texts = texts
+
+    def get_text(self, file_path) -> str:
+        return self.texts[str(file_path)]
+
+
+@pytest.fixture(autouse=True)
+def fake_tokenizer(monkeypatch):
+    # set the value of the LazyAttribute (getattr would load the gpt2 tokenizer)
+    monkeypatch.setattr(
+        vars(TOKENIZERS)["GPT2_TOKENIZER_FAST"], "value", FakeTokenizer()
+    )
+
+
+def get_document(values: dict, positions: dict, number_of_words: int = 400) -> str:
+    """
+    Filler words with the value of every key at the word index given in positions.
+    """
+    words = [f"word{i}" for i in range(number_of_words)]
+    for key, position in positions.items():
+        words[position] = values[key]
+    return " ".join(words)
+
+
+def get_number_of_tokens(text: str) -> int:
+    return len(FakeTokenizer()(text)["input_ids"])
+
+
+def get_pipeline(keys, values, parser, text, **kwargs) -> LLMPipeline:
+    return LLMPipeline(
+        keys=keys,
+        model=kwargs.pop(
+            "model",
+            FakeModel(values, max_input_tokens=kwargs.pop("max_input_tokens", 150)),
+        ),
+        pdf_to_text_model=FakePDFToTextModel(
+            text if isinstance(text, dict) else {"document.pdf": text}
+        ),
+        prompt_variant=PROMPT_VARIANTS.NEUTRAL,
+        long_document_handling_variant=kwargs.pop(
+            "long_document_handling_variant",
+            LONG_DOCUMENT_HANDLING_VARIANTS.SPLIT_TO_SUBDOCUMENTS,
+        ),
+        parser=parser,
+        shots=kwargs.pop("shots", None),
+        **kwargs,
+    )
+
+
+DATASETS = [
+    (SROIE_CONSTANTS.prompt_keys, SROIE_VALUES, PARSERS.DICT_PARSER()),
+    (
+        KLEISTER_CHARITY_CONSTANTS.prompt_keys,
+        KLEISTER_CHARITY_VALUES,
+        PARSERS.KLEISTER_CHARITY_PARSER(),
+    ),
+]
+
+
+@pytest.mark.parametrize(
+    "keys, values, parser", DATASETS, ids=["sroie", "kleister_charity"]
+)
+def test_early_exit_stops_once_every_key_is_found(keys, values, parser):
+    text = get_document(values, {key: i for i, key in enumerate(keys)})
+    pipeline = get_pipeline(keys, values, parser, text, early_exit=True)
+    number_of_subdocuments = len(pipeline.get_subdocuments(text))
+    assert number_of_subdocuments > 2
+
+    model_output, parsed_output = pipeline.predict_with_model_output("document.pdf")
+    assert len(model_output) == 1
+    assert pipeline.stats == {
+        "completions": 1,
+        "saved_completions": number_of_subdocuments - 1,
+    }
+    assert parsed_output == parser.parse_model_output(model_output[0], keys)
+
+
+@pytest.mark.parametrize(
+    "keys, values, parser", DATASETS, ids=["sroie", "kleister_charity"]
+)
+@pytest.mark.parametrize("shrink_prompts", [False, True])
+def test_values_of_several_subdocuments_are_merged(
+    keys, values, parser, shrink_prompts
+):
+    # one key per subdocument (the subdocuments are about 100 words long)
+    text = get_document(values, {key: 50 + 100 * i for i, key in enumerate(keys)}, 1000)
+    pipeline = get_pipeline(
+        keys, values, parser, text, early_exit=True, shrink_prompts=shrink_prompts
+    )
+
+    _, parsed_output = pipeline.predict_with_model_output("document.pdf")
+    expected_output = parser.parse_model_output(
+        " "
+        + "\n".join([values[keys[0]]] + [f"{key}: {values[key]}" for key in keys[1:]]),
+        keys,
+    )
+    assert parsed_output == expected_output
+    assert pipeline.stats["saved_completions"] > 0
+
+
+@pytest.mark.parametrize(
+    "shots, max_input_tokens", [(None, 150), (SROIE_CONSTANTS.SHOTS, 600)]
+)
+def test_subdocuments_fit_into_the_model_and_cover_the_document(
+    shots, max_input_tokens
+):
+    keys, values = SROIE_CONSTANTS.prompt_keys, SROIE_VALUES
+    text = get_document(values, {}, 1000)
+    pipeline = get_pipeline(
+        keys,
+        values,
+        PARSERS.DICT_PARSER(),
+        text,
+        shots=shots,
+        max_input_tokens=max_input_tokens,
+    )
+
+    subdocuments = pipeline.get_subdocuments(text)
+    assert len(subdocuments) > 2
+    model_inputs = pipeline.get_model_inputs(text)
+    for model_input in model_inputs:
+        assert get_number_of_tokens(model_input) <= max_input_tokens
+    for model_input in model_inputs[:-1]:  # the last subdocument is shorter
+        assert max_input_tokens - 10 < get_number_of_tokens(model_input)
+
+    # consecutive subdocuments overlap by 20 tokens (i.e. words)
+    words = subdocuments[0].split()
+    for subdocument in subdocuments[1:]:
+        assert subdocument.split()[:20] == words[-20:]
+        words += subdocument.split()[20:]
+    assert words == text.split()
+
+
+@pytest.mark.parametrize("subdocument_length", [-5, 0, 1, 20])
+def test_subdocuments_that_are_not_longer_than_the_overlap_raise(subdocument_length):
+    keys, values = SROIE_CONSTANTS.prompt_keys, SROIE_VALUES
+    text = get_document(values, {}, 1000)
+    pipeline = get_pipeline(keys, values, PARSERS.DICT_PARSER(), text)
+    # leaves subdocument_length tokens for the document next to the prompt
+    pipeline.model.max_input_tokens = (
+        pipeline.prompt_variant.get_model_input_number_of_tokens(0)
+        + 6
+        + subdocument_length
+    )
+
+    with pytest.raises(ValueError, match="don't fit into the"):
+        pipeline.get_subdocuments(text)
+
+
+@pytest.mark.parametrize(
+    "long_document_handling_variant",
+    [
+        LONG_DOCUMENT_HANDLING_VARIANTS.TRUNCATE_END,
+        LONG_DOCUMENT_HANDLING_VARIANTS.TRUNCATE_START,
+        LONG_DOCUMENT_HANDLING_VARIANTS.TRUNCATE_MIDDLE,
+    ],
+)
+@pytest.mark.parametrize(
+    "shots, max_input_tokens", [(None, 150), (SROIE_CONSTANTS.SHOTS, 600)]
+)
+def test_truncated_document_fits_into_the_model(
+    long_document_handling_variant, shots, max_input_tokens
+):
+    keys, values = SROIE_CONSTANTS.prompt_keys, SROIE_VALUES
+    text = get_document(values, {}, 1000)
+    pipeline = get_pipeline(
+        keys,
+        values,
+        PARSERS.DICT_PARSER(),
+        text,
+        long_document_handling_variant=long_document_handling_variant,
+        shots=shots,
+        max_input_tokens=max_input_tokens,
+    )
+
+    (model_input,) = pipeline.get_model_inputs(text)
+    assert max_input_tokens - 10 < get_number_of_tokens(model_input)
+    assert get_number_of_tokens(model_input) <= max_input_tokens
+
+    (subdocument,) = pipeline.get_subdocuments(text)
+    if long_document_handling_variant == LONG_DOCUMENT_HANDLING_VARIANTS.TRUNCATE_END:
+        assert text.startswith(subdocument)
+    elif (
+        long_document_handling_variant == LONG_DOCUMENT_HANDLING_VARIANTS.TRUNCATE_START
+    ):
+        assert text.endswith(subdocument)
+    else:
+        start, end = subdocument.split(TRUNCATION_MARKER)
+        assert text.startswith(start)
+        assert text.endswith(end)
+        assert abs(get_number_of_tokens(start) - get_number_of_tokens(end)) <= 1
+
+    pipeline.predict_with_model_output("document.pdf")
+    assert pipeline.stats == {"completions": 1, "saved_completions": 0}
+
+
+def test_retrieved_chunks_fit_into_the_model_and_keep_the_document_order():
+    keys = SROIE_CONSTANTS.prompt_keys
+    # the keys themselves are in the document, so that their chunks are retrieved
+    positions = {key: position for key, position in zip(keys, [100, 400, 700, 995])}
+    text = get_document({key: key for key in keys}, positions, 1000)
+    pipeline = get_pipeline(
+        keys,
+        SROIE_VALUES,
+        PARSERS.DICT_PARSER(),
+        text,
+        long_document_handling_variant=LONG_DOCUMENT_HANDLING_VARIANTS.RETRIEVE_CHUNKS,
+        retrieval_chunk_length=10,
+        retrieval_top_k=1,
+    )
+
+    (model_input,) = pipeline.get_model_inputs(text)
+    assert get_number_of_tokens(model_input) <= 150
+
+    (subdocument,) = pipeline.get_subdocuments(text)
+    chunks = subdocument.split(TRUNCATION_MARKER)
+    assert len(chunks) > 1
+    end = 0
+    for chunk in chunks:
+        start = text.find(chunk, end)
+        # in document order and there is a gap in front of every TRUNCATION_MARKER
+        assert start > end or (start == 0 and end == 0)
+        end = start + len(chunk)
+    for key in keys:
+        assert key in subdocument
+
+
+def test_retrieval_chunks_that_dont_fit_into_the_model_raise():
+    text = get_document(SROIE_VALUES, {}, 1000)
+    pipeline = get_pipeline(
+        SROIE_CONSTANTS.prompt_keys,
+        SROIE_VALUES,
+        PARSERS.DICT_PARSER(),
+        text,
+        long_document_handling_variant=LONG_DOCUMENT_HANDLING_VARIANTS.RETRIEVE_CHUNKS,
+        retrieval_chunk_length=200,
+    )
+
+    with pytest.raises(ValueError, match="retrieval_chunk_length=200"):
+        pipeline.get_subdocuments(text)
+
+
+@pytest.mark.parametrize(
+    "keys, values, parser", DATASETS, ids=["sroie", "kleister_charity"]
+)
+def test_shrunk_prompts_only_ask_for_missing_keys(keys, values, parser):
+    text = get_document(values, {key: 50 + 100 * i for i, key in enumerate(keys)}, 1000)
+    pipeline = get_pipeline(keys, values, parser, text, shrink_prompts=True)
+
+    pipeline.predict_with_model_output("document.pdf")
+    model_inputs = pipeline.model.model_inputs
+    assert len(model_inputs) > 1
+
+    documents_so_far = []
+    for model_input in model_inputs:
+        document = model_input.rsplit("\n\nExtract ", 1)[0]
+        missing_keys = [
+            key
+            for key in keys
+            if not any(values[key] in earlier.split() for earlier in documents_so_far)
+        ]
+        assert model_input.endswith(
+            pipeline.prompt_variant._get_prompt_text(missing_keys)
+        )
+        documents_so_far.append(document)
+
+
+def get_echo_pipeline(texts: dict, **kwargs) -> LLMPipeline:
+    return get_pipeline(
+        SROIE_CONSTANTS.prompt_keys,
+        SROIE_VALUES,
+        PARSERS.DICT_PARSER(),
+        texts,
+        model=kwargs.pop("model", EchoModel(max_input_tokens=150)),
+        **kwargs,
+    )
+
+
+def test_predict_many_and_predict_directory_keep_the_order(tmp_path):
+    file_paths = [tmp_path / f"{i:02d}.pdf" for i in range(20)]
+    for file_path in file_paths:
+        file_path.touch()
+    pipeline = get_echo_pipeline(
+        {str(path): f"text-of-{path.name} word" for path in file_paths}
+    )
+    expected = [{"company": f"text-of-{path.name}"} for path in file_paths]
+
+    # the echo model answers after a random latency, i.e. in a random order
+    assert list(pipeline.predict_many(file_paths, max_workers=4)) == expected
+    assert pipeline.predict_directory(tmp_path, max_workers=4) == expected
+    assert 1 < pipeline.model.max_in_flight <= 4
+
+
+def test_predict_subdocuments_keeps_the_order():
+    text = get_document(SROIE_VALUES, {}, 2000)
+    pipeline = get_echo_pipeline({"document.pdf": text}, max_subdocument_workers=4)
+    subdocuments = pipeline.get_subdocuments(text)
+    assert len(subdocuments) > 4
+
+    # the echo model answers after a random latency, i.e. in a random order
+    assert pipeline.get_model_output(text) == [
+        " " + subdocument.split()[0] for subdocument in subdocuments
+    ]
+    assert 1 < pipeline.model.max_in_flight <= 4
+
+
+def test_apredict_many_keeps_the_order_and_limits_the_documents_in_flight():
+    file_paths = [f"{i}.pdf" for i in range(20)]
+    pipeline = get_echo_pipeline({path: f"text-of-{path} word" for path in file_paths})
+
+    predictions = pipeline.predict_many_async(file_paths, max_concurrent_documents=3)
+
+    assert predictions == [{"company": f"text-of-{path}"} for path in file_paths]
+    assert pipeline.model.max_in_flight == 3
+    assert pipeline.model.in_flight == 0
+
+
+def test_aget_model_output_sends_all_subdocuments_at_once():
+    text = get_document(SROIE_VALUES, {}, 1000)
+    pipeline = get_echo_pipeline({"document.pdf": text})
+    subdocuments = pipeline.get_subdocuments(text)
+
+    model_output = asyncio.run(pipeline.aget_model_output(text))
+
+    assert model_output == [
+        " " + subdocument.split()[0] for subdocument in subdocuments
+    ]
+    assert pipeline.model.max_in_flight == len(subdocuments)
+    assert pipeline.stats == {"completions": len(subdocuments), "saved_completions": 0}
+
+
+@pytest.mark.parametrize("shrink_prompts", [False, True])
+def test_apredict_with_model_output_matches_predict(shrink_prompts):
+    keys, values = KLEISTER_CHARITY_CONSTANTS.prompt_keys, KLEISTER_CHARITY_VALUES
+    text = get_document(values, {key: 50 + 100 * i for i, key in enumerate(keys)}, 1000)
+    pipeline = get_pipeline(
+        keys,
+        values,
+        PARSERS.KLEISTER_CHARITY_PARSER(),
+        text,
+        shrink_prompts=shrink_prompts,
+        max_subdocument_workers=2,
+    )
+
+    async def run():
+        return await pipeline.apredict_with_model_output("document.pdf")
+
+    # the raw outputs depend on which subdocument finishes first (with shrink_prompts)
+    assert asyncio.run(run())[1] == pipeline.predict("document.pdf")
+
+
+@pytest.mark.parametrize(
+    "long_document_handling_variant",
+    [
+        LONG_DOCUMENT_HANDLING_VARIANTS.TRUNCATE_END,
+        LONG_DOCUMENT_HANDLING_VARIANTS.TRUNCATE_START,
+        LONG_DOCUMENT_HANDLING_VARIANTS.TRUNCATE_MIDDLE,
+        LONG_DOCUMENT_HANDLING_VARIANTS.SPLIT_TO_SUBDOCUMENTS,
+        LONG_DOCUMENT_HANDLING_VARIANTS.RETRIEVE_CHUNKS,
+    ],
+)
+def test_rate_limiter_takes_the_number_of_tokens_from_the_pipeline(
+    monkeypatch, long_document_handling_variant
+):
+    text = get_document(SROIE_VALUES, {}, 1000)
+    rate_limiter = RateLimiter(tokens_per_minute=10**9)
+    pipeline = get_echo_pipeline(
+        {"document.pdf": text},
+        model=RateLimitedLargeLanguageModel(EchoModel(150), rate_limiter),
+        long_document_handling_variant=long_document_handling_variant,
+        max_subdocument_workers=4,
+        retrieval_chunk_length=10,
+    )
+    number_of_tokens = sum(map(get_number_of_tokens, pipeline.get_model_inputs(text)))
+
+    tokenized_texts = []
+    tokenizer = TOKENIZERS.GPT2_TOKENIZER_FAST
+    monkeypatch.setattr(
+        vars(TOKENIZERS)["GPT2_TOKENIZER_FAST"],
+        "value",
+        lambda text, **kwargs: tokenized_texts.append(text)
+        or tokenizer(text, **kwargs),
+    )
+    pipeline.get_model_output(text)
+    asyncio.run(pipeline.aget_model_output(text))
+
+    # the model inputs aren't tokenized again (TRUNCATE_MIDDLE and RETRIEVE_CHUNKS count the marker)
+    assert set(tokenized_texts) <= {text, TRUNCATION_MARKER}
+    # exact, or a bit more where the TRUNCATION_MARKER merges with the tokens around it
+    assert 2 * number_of_tokens <= rate_limiter.tokens <= 1.1 * 2 * number_of_tokens
+
+
+class FailingEchoModel(EchoModel):
+    """
+    Like the EchoModel, but raises for the documents that start with one of the failing words.
+    """
+
+    def __init__(self, failing: set, max_input_tokens: int = 150):
+        super().__init__(max_input_tokens)
+        self.failing = failing
+
+    def predict(self, input: str) -> str:
+        if input.split()[0] in self.failing:
+            raise ConnectionError("API down")
+        return super().predict(input)
+
+
+def test_predict_journaled_records_failures_and_resumes(tmp_path):
+    file_paths = [f"{i}.pdf" for i in range(6)]
+    texts = {path: f"text-of-{path} word" for path in file_paths}
+    journal_path = tmp_path / "run.journal.jsonl"
+    model = FailingEchoModel({"text-of-2.pdf", "text-of-4.pdf"})
+    pipeline = get_echo_pipeline(texts, model=model)
+
+    predictions = pipeline.predict_journaled(
+        file_paths[:5], RunJournal(journal_path), max_workers=3
+    )
+    expected = [{"company": f"text-of-{path}"} for path in file_paths]
+    assert predictions == [expected[0], expected[1], None, expected[3], None]
+    assert model.calls == 3
+
+    # a new run (with the API up again) reads the journal written by the first one
+    journal = RunJournal(journal_path)
+    assert journal.failed == ["2.pdf", "4.pdf"]
+    assert journal.records["2.pdf"]["error"] == "ConnectionError: API down"
+    model.failing = set()
+    model.calls = 0
+
+    predictions = pipeline.predict_journaled(
+        file_paths, journal, retry_failed_only=True, max_workers=3
+    )
+    # the new document was never attempted, so it isn't retried
+    assert predictions == expected[:5] + [None]
+    assert model.calls == 2
+
+    predictions = pipeline.predict_journaled(file_paths, journal, max_workers=3)
+    assert predictions == expected
+    assert model.calls == 3  # only the new document
+    assert sorted(RunJournal(journal_path).completed) == file_paths
+
+
+def test_router_sends_every_document_to_the_cheapest_model_that_fits():
+    small, large = EchoModel(max_input_tokens=100), EchoModel(max_input_tokens=300)
+    texts = {
+        "short.pdf": get_document(SROIE_VALUES, {}, 20),
+        "medium.pdf": get_document(SROIE_VALUES, {}, 150),
+        "long.pdf": get_document(SROIE_VALUES, {}, 1000),
+    }
+    pipeline = RouterLLMPipeline(
+        keys=SROIE_CONSTANTS.prompt_keys,
+        routes=[
+            (large, ModelProfile(cost_per_1k_tokens=0.02)),
+            (small, ModelProfile(cost_per_1k_tokens=0.005)),
+        ],
+        pdf_to_text_model=FakePDFToTextModel(texts),
+        prompt_variant=PROMPT_VARIANTS.NEUTRAL,
+        long_document_handling_variant=LONG_DOCUMENT_HANDLING_VARIANTS.SPLIT_TO_SUBDOCUMENTS,
+        parser=PARSERS.DICT_PARSER(),
+        shots=None,
+    )
+
+    assert pipeline.get_subdocuments_and_model(texts["short.pdf"]) == (
+        [texts["short.pdf"]],
+        small,
+    )
+    assert pipeline.get_subdocuments_and_model(texts["medium.pdf"]) == (
+        [texts["medium.pdf"]],
+        large,
+    )
+    # too long for both models -> split for the one with the largest context
+    subdocuments, model = pipeline.get_subdocuments_and_model(texts["long.pdf"])
+    assert model is large
+    assert len(subdocuments) > 1
+    # both models have the same repr, but every route has its own counter
+    assert pipeline.stats["routed_documents"] == [2, 1]
+
+    predictions = list(pipeline.predict_many(list(texts)))
+    assert predictions == [{"company": "word0"}] * 3
+    assert (small.calls, large.calls) == (1, 1 + len(subdocuments))
+    assert pipeline.stats["routed_documents"] == [4, 2]
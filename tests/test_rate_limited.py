@@ -0,0 +1,46 @@
+import asyncio
+import time
+
+from uni_kie.models.rate_limited import RateLimiter, TokenBucket, get_rate_limiter
+
+
+def test_token_bucket_waits_for_refill():
+    bucket = TokenBucket(capacity=10, refill_per_second=100)
+    assert bucket.reserve(10) == 0.0
+    # the bucket is empty now, 5 tokens take 0.05s to refill
+    assert 0.04 < bucket.reserve(5) <= 0.05
+    # reservations queue up behind each other
+    assert 0.09 < bucket.reserve(5) <= 0.1
+
+
+def test_rate_limiter_budgets_requests_and_tokens():
+    rate_limiter = RateLimiter(requests_per_minute=600, tokens_per_minute=6000)
+    for _ in range(600):
+        rate_limiter.acquire(1)  # within both quotas, no waiting
+
+    start = time.perf_counter()
+    rate_limiter.acquire(
+        1
+    )  # the request quota is used up, refills 10 requests per second
+    assert time.perf_counter() - start >= 0.09
+
+    rate_limiter = RateLimiter(tokens_per_minute=6000)
+    rate_limiter.acquire(6000)
+    assert 0.9 < rate_limiter._reserve(100) <= 1.0
+    assert rate_limiter.stats()["requests"] == 2
+
+
+def test_rate_limiter_is_shared_across_asyncio_tasks():
+    rate_limiter = RateLimiter(requests_per_minute=6000)  # 100 requests per second
+
+    async def run():
+        start = time.perf_counter()
+        await asyncio.gather(*(rate_limiter.aacquire(1) for _ in range(6010)))
+        return time.perf_counter() - start
+
+    assert asyncio.run(run()) >= 0.09
+
+
+def test_get_rate_limiter_returns_the_same_instance_per_name():
+    assert get_rate_limiter("test", requests_per_minute=60) is get_rate_limiter("test")
+    assert get_rate_limiter("test") is not get_rate_limiter("other test")
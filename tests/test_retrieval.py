@@ -0,0 +1,34 @@
+from uni_kie.kleister_charity_constants import KLEISTER_CHARITY_CONSTANTS
+from uni_kie.retrieval import BM25, ChunkRetriever
+
+CHUNKS = [
+    "Trustees report for the members of the society",
+    "Charity Registration No 1155074",
+    "The volunteers organised a summer fete",
+    "Total Incone 10,348,000 and Expenditure 9,415,000",
+    "Year Ended 31 March 2016",
+]
+
+
+def test_bm25_ranks_chunks_with_rare_query_terms_first():
+    scores = BM25(CHUNKS).get_scores("volunteers fete")
+    assert scores.argmax() == 2
+    assert scores[0] == 0
+
+
+def test_chunk_retriever_finds_synonyms_and_ocr_errors():
+    retriever = ChunkRetriever(synonyms=KLEISTER_CHARITY_CONSTANTS.SYNONYMS)
+    scores = retriever.get_scores(CHUNKS, ["Charity Number", "Annual Income"])
+    assert scores["Charity Number"].argmax() == 1
+    assert (
+        scores["Annual Income"].argmax() == 3
+    )  # "Incone" is a fuzzy match of "Income"
+
+
+def test_chunk_retriever_selects_best_chunks_within_budget_in_document_order():
+    retriever = ChunkRetriever(synonyms=KLEISTER_CHARITY_CONSTANTS.SYNONYMS)
+    keys = ["Period End Date", "Charity Number", "Annual Spending"]
+
+    assert retriever.select(CHUNKS, [10] * 5, keys, top_k=1, budget=100) == [1, 3, 4]
+    # only the best chunks of the first two keys fit
+    assert retriever.select(CHUNKS, [10] * 5, keys, top_k=1, budget=20) == [1, 4]
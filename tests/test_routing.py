@@ -0,0 +1,44 @@
+import pytest
+
+from uni_kie.constants import ROUTING_OBJECTIVES
+from uni_kie.models.model import LargeLanguageModel
+from uni_kie.models.routing import ModelProfile, select_model
+
+
+class FakeModel(LargeLanguageModel):
+    def __init__(self, max_input_tokens):
+        super().__init__()
+        self.max_input_tokens = max_input_tokens
+        self.max_generated_tokens = 256
+
+
+LARGE = FakeModel(3840)
+SMALL = FakeModel(1792)
+ROUTES = [
+    (LARGE, ModelProfile(cost_per_1k_tokens=0.02, seconds_per_1k_tokens=2)),
+    (SMALL, ModelProfile(cost_per_1k_tokens=0.005, seconds_per_1k_tokens=4)),
+]
+
+
+@pytest.mark.parametrize(
+    "number_of_input_tokens, routing_objective, expected",
+    [
+        (1000, ROUTING_OBJECTIVES.COST, SMALL),
+        (1000, ROUTING_OBJECTIVES.LATENCY, LARGE),
+        (1792, ROUTING_OBJECTIVES.COST, SMALL),
+        (1793, ROUTING_OBJECTIVES.COST, LARGE),
+        (3841, ROUTING_OBJECTIVES.COST, None),
+    ],
+)
+def test_select_model_picks_the_best_model_that_fits(
+    number_of_input_tokens, routing_objective, expected
+):
+    assert select_model(ROUTES, number_of_input_tokens, routing_objective) is expected
+
+
+def test_model_profile_counts_generated_tokens():
+    profile = ModelProfile(
+        cost_per_1k_tokens=0.02, seconds_per_request=1, seconds_per_1k_tokens=2
+    )
+    assert profile.get_cost(1500) == pytest.approx(0.03)
+    assert profile.get_latency(1500) == pytest.approx(4)
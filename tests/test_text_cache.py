@@ -0,0 +1,70 @@
+import shutil
+
+from uni_kie import PATH_DATA
+from uni_kie.cache import SQLiteCache
+from uni_kie.pdf_to_text import pdf_to_text
+from uni_kie.pdf_to_text.ocr.ocr import AbstractOCRModel, _group_consecutive
+from uni_kie.pdf_to_text.pdf_to_text import PyMuPDFWrapper
+
+SAMPLE_PDF = PATH_DATA / "own_sample_invoice.pdf"
+
+
+def test_pymupdf_wrapper_skips_extraction_of_cached_files(tmp_path, monkeypatch):
+    cache = SQLiteCache(tmp_path / "text.sqlite")
+    text = PyMuPDFWrapper(text_cache=cache).get_text(SAMPLE_PDF)
+
+    def fail(*args, **kwargs):
+        raise AssertionError("cached pages must not be extracted again")
+
+    monkeypatch.setattr(pdf_to_text, "_extract_pages", fail)
+    monkeypatch.setattr(pdf_to_text.PyMuPDF, "open", fail)
+
+    # same content under another name is a hit as well
+    copy_path = tmp_path / "copy.pdf"
+    shutil.copy(SAMPLE_PDF, copy_path)
+    wrapper = PyMuPDFWrapper(text_cache=cache)
+    assert wrapper.get_text(copy_path) == text
+    assert wrapper.stats["cached_pages"] == wrapper.stats["pages"]
+
+
+def test_text_cache_key_depends_on_extractor_configuration(tmp_path):
+    cache = SQLiteCache(tmp_path / "text.sqlite")
+    PyMuPDFWrapper(text_cache=cache).get_text(SAMPLE_PDF)
+
+    wrapper = PyMuPDFWrapper(ocr_coverage_threshold=0.9, text_cache=cache)
+    wrapper.get_text(SAMPLE_PDF)
+    assert wrapper.stats["cached_pages"] == 0
+
+
+class FakeOCRModel(AbstractOCRModel):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.ocr_calls = []
+
+    def _count_pages(self, file_path):
+        return 5
+
+    def ocr_pages(self, file_path, first_page, last_page):
+        self.ocr_calls.append((first_page, last_page))
+        return [f"page {page}" for page in range(first_page, last_page + 1)]
+
+
+def test_ocr_model_only_ocrs_pages_that_are_not_cached(tmp_path):
+    cache = SQLiteCache(tmp_path / "text.sqlite")
+    ocr_model = FakeOCRModel(batch_size=2, text_cache=cache)
+    file_hash = ocr_model._hash_file(SAMPLE_PDF)
+    ocr_model._set_cached_pages(file_hash, 5, {2: "page 2", 3: "page 3"})
+
+    text = ocr_model.get_text(SAMPLE_PDF)
+
+    assert text == "".join(f"page {page}\n" for page in range(1, 6))
+    assert ocr_model.ocr_calls == [(1, 1), (4, 5)]
+
+    ocr_model.ocr_calls = []
+    assert ocr_model.get_text(SAMPLE_PDF) == text
+    assert ocr_model.ocr_calls == []
+
+
+def test_group_consecutive():
+    assert _group_consecutive([1, 2, 3, 5], 2) == [(1, 2), (3, 3), (5, 5)]
+    assert _group_consecutive([], 4) == []
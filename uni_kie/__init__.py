@@ -10,6 +10,7 @@ PATH_TESTS = ROOT / "tests"
 PATH_UNI_KIE = ROOT / "uni_kie"
 PATH_DATA = PATH_UNI_KIE / "datasets"
 PATH_LOGS = ROOT / "logs"
+PATH_CACHE = ROOT / ".cache"
 
 
 if not PATH_LOGS.is_dir():
@@ -1,17 +1,32 @@
 import json
 import shutil
 from datetime import datetime
+from pathlib import Path
 
 from constants import MODELS, NER_TAGGERS, PARSERS, PDF_TO_TEXT_MODELS, PROMPT_VARIANTS
-from pipeline import BaselinePipeline, LLMPipeline
-
-from uni_kie import __version__, create_logger
-from uni_kie.constants import LONG_DOCUMENT_HANDLING_VARIANTS
+from pipeline import BaselinePipeline, LLMPipeline, RouterLLMPipeline
+
+from uni_kie import PATH_CACHE, __version__, create_logger
+from uni_kie.cache import SQLiteCache
+from uni_kie.constants import (
+    LONG_DOCUMENT_HANDLING_VARIANTS,
+    ROUTING_OBJECTIVES,
+    SUBDOCUMENT_ORDERS,
+)
+from uni_kie.journal import RunJournal
 from uni_kie.kleister_charity_constants import (
     KLEISTER_CHARITY_CONSTANTS,
     PATH_KLEISTER_CHARITY,
 )
+from uni_kie.models.adaptive_concurrency import (
+    AdaptiveConcurrencyLargeLanguageModel,
+    AIMDController,
+)
 from uni_kie.models.baseline import BaselineModel, KleisterCharitySpecificBaselineModel
+from uni_kie.models.cached import CachedLargeLanguageModel
+from uni_kie.models.rate_limited import RateLimitedLargeLanguageModel, get_rate_limiter
+from uni_kie.models.routing import ModelProfile
+from uni_kie.retrieval import ChunkRetriever
 from uni_kie.sroie_constants import PATH_SROIE, SROIE_CONSTANTS
 
 logger = create_logger(__name__)
@@ -30,6 +45,7 @@ if __name__ == "__main__":
         ner_tagger=NER_TAGGERS.SPACY_WEB_SM,
         error_percentage=0.18,
         allowed_entity_range=40,
+        max_workers=1,
     )
 
     # KLEISTER_CHARITY
@@ -37,10 +53,29 @@ if __name__ == "__main__":
     #     keys=KLEISTER_CHARITY_CONSTANTS.prompt_keys,
     #     shots=KLEISTER_CHARITY_CONSTANTS.SHOTS,  # or None
     #     model=MODELS.GPT.Davinci(),
+    #     # re-use completions of earlier runs (read_only=True for reproducible benchmark runs)
+    #     # model=CachedLargeLanguageModel(
+    #     #     MODELS.GPT.Davinci(), SQLiteCache(PATH_CACHE / "completions.sqlite")
+    #     # ),
+    #     # stay within the provider's quotas (shared by all workers of the process)
+    #     # model=RateLimitedLargeLanguageModel(
+    #     #     MODELS.GPT.Davinci(),
+    #     #     get_rate_limiter("openai", requests_per_minute=3000, tokens_per_minute=250000),
+    #     # ),
+    #     # let the number of requests in flight follow the capacity of the backend
+    #     # model=AdaptiveConcurrencyLargeLanguageModel(MODELS.GPT.NeoX(), AIMDController()),
     #     pdf_to_text_model=PDF_TO_TEXT_MODELS.KLEISTER_CHARITY_WRAPPER(split="test-A"),
     #     prompt_variant=PROMPT_VARIANTS.NEUTRAL,
     #     long_document_handling_variant=LONG_DOCUMENT_HANDLING_VARIANTS.SPLIT_TO_SUBDOCUMENTS,
+    #     # or send only the chunks around the (fuzzily matched) keys and their synonyms in a single completion
+    #     # long_document_handling_variant=LONG_DOCUMENT_HANDLING_VARIANTS.RETRIEVE_CHUNKS,
+    #     # retriever=ChunkRetriever(synonyms=KLEISTER_CHARITY_CONSTANTS.SYNONYMS),
     #     parser=PARSERS.KLEISTER_CHARITY_PARSER(),
+    #     max_workers=8,  # number of documents in flight at the same time
+    #     max_subdocument_workers=4,  # number of subdocuments of a document in flight at the same time
+    #     early_exit=True,  # stop sending subdocuments once every key has a value
+    #     subdocument_order=SUBDOCUMENT_ORDERS.FIRST_AND_LAST_FIRST,
+    #     shrink_prompts=True,  # later subdocuments are only asked for the keys that are still missing
     # )
 
     path = (
@@ -50,6 +85,23 @@ if __name__ == "__main__":
         / f"{now}_{pipeline}.tsv"
     )
 
+    # KLEISTER_CHARITY with every document sent to the cheapest model whose context fits it
+    # (the prices are per 1000 tokens, measure the latencies of your own deployment)
+    # pipeline = RouterLLMPipeline(
+    #     keys=KLEISTER_CHARITY_CONSTANTS.prompt_keys,
+    #     shots=KLEISTER_CHARITY_CONSTANTS.SHOTS,
+    #     routes=[
+    #         (MODELS.GPT.Davinci(), ModelProfile(cost_per_1k_tokens=0.02)),
+    #         (MODELS.GPT.NeoX(), ModelProfile(cost_per_1k_tokens=0.005)),
+    #     ],
+    #     routing_objective=ROUTING_OBJECTIVES.COST,
+    #     pdf_to_text_model=PDF_TO_TEXT_MODELS.KLEISTER_CHARITY_WRAPPER(split="test-A"),
+    #     prompt_variant=PROMPT_VARIANTS.NEUTRAL,
+    #     long_document_handling_variant=LONG_DOCUMENT_HANDLING_VARIANTS.SPLIT_TO_SUBDOCUMENTS,
+    #     parser=PARSERS.KLEISTER_CHARITY_PARSER(),
+    #     max_workers=8,
+    # )
+
     # SROIE
     # pipeline = LLMPipeline(
     #     keys=SROIE_CONSTANTS.prompt_keys,
@@ -61,9 +113,14 @@ if __name__ == "__main__":
     #     # shots=SROIE_CONSTANTS.SHOTS[0:2],
     #     # model=MODELS.GPT.Davinci(),
     #     pdf_to_text_model=PDF_TO_TEXT_MODELS.SROIE_WRAPPER(split="test"),
+    #     # own OCR with a text cache, so that re-runs with another prompt or model skip the OCR
+    #     # pdf_to_text_model=PDF_TO_TEXT_MODELS.SROIE_WRAPPER_OWN_OCR(
+    #     #     split="test", text_cache=SQLiteCache(PATH_CACHE / "text.sqlite")
+    #     # ),
     #     prompt_variant=PROMPT_VARIANTS.NEUTRAL,
     #     long_document_handling_variant=LONG_DOCUMENT_HANDLING_VARIANTS.SPLIT_TO_SUBDOCUMENTS,
     #     parser=PARSERS.DICT_PARSER(),
+    #     max_workers=8,  # number of documents in flight at the same time
     # )
 
     # folder_path = (
@@ -81,26 +138,35 @@ if __name__ == "__main__":
         f"Searching for keys: {pipeline.keys}",
     )
 
+    filenames = list(pipeline.pdf_to_text_model.data["filename"])
+
+    # to resume a crashed run set this to the path of its .tsv (the journal is next to it)
+    resume_path = None
+    retry_failed_only = (
+        False  # only re-run the documents that failed in the resumed run
+    )
+    if resume_path is not None:
+        path = Path(resume_path)
+    journal = RunJournal(path.with_name(f"{path.name}.journal.jsonl"))
+    logger.info(f"Using journal {journal.path}")
+
     # KLEISTER CHARITY
+    # predictions are returned in input order, so the TSV stays line-aligned with in_extended.tsv
+    predictions = pipeline.predict_journaled(
+        filenames, journal, retry_failed_only=retry_failed_only
+    )
+    # or without journal, with all documents in flight on a single event loop (needs aiohttp)
+    # predictions = pipeline.predict_many_async(filenames, max_concurrent_documents=256)
     with open(path, "w") as f:
-        for i in range(len(pipeline.pdf_to_text_model.data)):
-            logger.info(f"Predicting document {i}...")
-            prediction = pipeline.predict(
-                pipeline.pdf_to_text_model.data.iloc[i]["filename"]
-            )
+        for i, prediction in enumerate(predictions):
             logger.info(f"Final prediction for document {i}: {prediction}")
-            f.write(f"{prediction}\n")
-            print(f"Progress: {i+1}/{len(pipeline.pdf_to_text_model.data)}")
+            f.write(f"{prediction if prediction is not None else ''}\n")
 
     # SROIE
-    # for i in range(len(pipeline.pdf_to_text_model.data)):
-    #     logger.info(f"Predicting document {i}...")
-    #     prediction = pipeline.predict(
-    #         pipeline.pdf_to_text_model.data.iloc[i]["filename"]
-    #     )
+    # for i, prediction in enumerate(pipeline.predict_many(filenames)):
     #     logger.info(f"Final prediction for document {i}: {prediction}")
 
-    #     filename = pipeline.pdf_to_text_model.data.iloc[i]["filename"]
+    #     filename = filenames[i]
     #     stem = filename.stem
     #     stem += ".txt"
     #     folder_path.mkdir(parents=True, exist_ok=True)
@@ -108,8 +174,36 @@ if __name__ == "__main__":
     #     with open(folder_path / stem, "w") as f:
     #         f.write(json.dumps(prediction, indent=4))
 
-    #     print(f"Progress: {i+1}/{len(pipeline.pdf_to_text_model.data)}")
+    #     print(f"Progress: {i+1}/{len(filenames)}")
     # shutil.make_archive(folder_path, "zip", folder_path)
 
+    # run metrics, logged and saved next to the predictions
+    metrics = {}
+    if isinstance(pipeline, LLMPipeline):
+        metrics["pipeline"] = pipeline.stats
+    if pipeline.pdf_to_text_model.text_cache is not None:
+        metrics["text_cache"] = pipeline.pdf_to_text_model.text_cache.stats()
+    # the wrappers (cache, rate limiter, controller) of every model of a RouterLLMPipeline
+    models = (
+        [model for model, _ in pipeline.routes]
+        if isinstance(pipeline, RouterLLMPipeline)
+        else [pipeline.model]
+    )
+    for i, model in enumerate(models):
+        prefix = f"route_{i}_" if len(models) > 1 else ""
+        if isinstance(model, CachedLargeLanguageModel):
+            metrics[f"{prefix}completion_cache"] = model.cache.stats()
+        rate_limiter = getattr(model, "rate_limiter", None)
+        if rate_limiter is not None:
+            metrics[f"{prefix}rate_limiter"] = rate_limiter.stats()
+        controller = getattr(model, "controller", None)
+        if controller is not None:
+            metrics[f"{prefix}concurrency_controller"] = controller.stats()
+    for name, stats in metrics.items():
+        logger.info(f"{name} stats: {stats}")
+    if len(metrics) > 0:
+        with open(path.with_name(f"{path.name}.metrics.json"), "w") as f:
+            json.dump(metrics, f, indent=4)
+
     logger.info("================== DONE ==================")
     print("======================== DONE ============================")
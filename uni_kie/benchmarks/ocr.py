@@ -0,0 +1,47 @@
+"""
+Compares the per-page OCR time of the OCR models on a (not searchable) PDF.
+
+Usage: python -m uni_kie.benchmarks.ocr [--file path/to/file.pdf] [--repeats 3]
+"""
+import argparse
+import statistics
+import time
+
+from uni_kie import PATH_DATA
+from uni_kie.pdf_to_text.ocr.tesseract import Tesseract
+
+
+def get_ocr_models() -> dict:
+    ocr_models = {"Tesseract (subprocess per page)": Tesseract()}
+    try:
+        from uni_kie.pdf_to_text.ocr.tesseract_api import TesseractAPI
+
+        ocr_models["TesseractAPI (in-process engine)"] = TesseractAPI()
+    except ImportError as e:
+        print(f"Skipping TesseractAPI: {e}")
+    return ocr_models
+
+
+def main():
+    argument_parser = argparse.ArgumentParser(description=__doc__)
+    argument_parser.add_argument(
+        "--file", default=PATH_DATA / "own_sample_invoice_NOT_SEARCHABLE.pdf"
+    )
+    argument_parser.add_argument("--repeats", type=int, default=3)
+    args = argument_parser.parse_args()
+
+    print(f"{'model':<40} {'per page [s]':>12} {'total [s]':>10}")
+    for name, ocr_model in get_ocr_models().items():
+        number_of_pages = ocr_model._count_pages(args.file)
+        timings = []
+        for _ in range(args.repeats):
+            start = time.perf_counter()
+            ocr_model.get_text(args.file)
+            timings.append(time.perf_counter() - start)
+
+        total = statistics.median(timings)
+        print(f"{name:<40} {total / number_of_pages:>12.3f} {total:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
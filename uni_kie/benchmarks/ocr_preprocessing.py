@@ -0,0 +1,75 @@
+"""
+Measures the OCR wall time and text quality of Tesseract with and without the
+ImagePreprocessor on the SROIE test receipts.
+
+The text quality is the Levenshtein ratio (0..1, case and whitespace insensitive)
+between the OCR output and the OCR text that comes with the dataset.
+
+Usage: python -m uni_kie.benchmarks.ocr_preprocessing [--limit 50]
+"""
+import argparse
+import time
+
+import Levenshtein
+import numpy as np
+
+from uni_kie.pdf_to_text.ocr.preprocessing import ImagePreprocessor
+from uni_kie.pdf_to_text.ocr.tesseract import Tesseract
+from uni_kie.pdf_to_text.pdf_to_text import SroieWrapper
+
+
+def normalize(text: str) -> str:
+    return " ".join(text.lower().split())
+
+
+def get_ocr_models() -> dict:
+    return {
+        "raw": Tesseract(),
+        "grayscale+binarize": Tesseract(
+            preprocessor=ImagePreprocessor(crop_margins=False, max_side=None)
+        ),
+        "full preprocessing": Tesseract(preprocessor=ImagePreprocessor()),
+        "full preprocessing, max_side=1600": Tesseract(
+            preprocessor=ImagePreprocessor(max_side=1600)
+        ),
+        "full preprocessing + deskew": Tesseract(
+            preprocessor=ImagePreprocessor(deskew=True)
+        ),
+    }
+
+
+def main():
+    argument_parser = argparse.ArgumentParser(description=__doc__)
+    argument_parser.add_argument("--limit", type=int, default=50)
+    args = argument_parser.parse_args()
+
+    sroie = SroieWrapper()
+    file_paths = list(sroie.data["filename"])[: args.limit]
+
+    print(
+        f"{'variant':<36} {'per image [s]':>13} {'pixels':>8} {'quality':>8} {'min quality':>12}"
+    )
+    for name, ocr_model in get_ocr_models().items():
+        timings, pixels, qualities = [], [], []
+        for file_path in file_paths:
+            start = time.perf_counter()
+            text = ocr_model.get_text(file_path)
+            timings.append(time.perf_counter() - start)
+
+            image = ocr_model._convert_pdf_to_images(file_path)[0]
+            if ocr_model.preprocessor is not None:
+                image = ocr_model.preprocessor(image)
+            pixels.append(image.shape[0] * image.shape[1])
+
+            qualities.append(
+                Levenshtein.ratio(normalize(text), normalize(sroie.get_text(file_path)))
+            )
+
+        print(
+            f"{name:<36} {np.mean(timings):>13.3f} {np.mean(pixels) / 1e6:>7.2f}M "
+            f"{np.mean(qualities):>8.3f} {np.min(qualities):>12.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
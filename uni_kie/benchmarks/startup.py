@@ -0,0 +1,66 @@
+"""
+Measures the cold-start time of the pipeline, i.e. the time from starting a fresh
+Python process until the first model input is ready to be sent.
+
+Every stage runs in its own subprocess so that nothing is imported/cached already.
+
+Usage: python -m uni_kie.benchmarks.startup [--repeats 5]
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+
+from uni_kie import ROOT
+
+STAGES = {
+    "import uni_kie.constants": "import uni_kie.constants",
+    "import uni_kie.pipeline": "import uni_kie.pipeline",
+    "load GPT2 tokenizer": (
+        "from uni_kie.constants import TOKENIZERS\nTOKENIZERS.GPT2_TOKENIZER_FAST"
+    ),
+    "first model input (prompt + tokenized document)": (
+        "from uni_kie.constants import PROMPT_VARIANTS, TOKENIZERS\n"
+        "from uni_kie.kleister_charity_constants import KLEISTER_CHARITY_CONSTANTS\n"
+        "prompt = PROMPT_VARIANTS.NEUTRAL(\n"
+        "    prompt_keys=KLEISTER_CHARITY_CONSTANTS.prompt_keys,\n"
+        "    shots=KLEISTER_CHARITY_CONSTANTS.SHOTS,\n"
+        ")\n"
+        "text = KLEISTER_CHARITY_CONSTANTS.SHOTS[0]['input']\n"
+        "TOKENIZERS.GPT2_TOKENIZER_FAST(text, return_offsets_mapping=True)\n"
+        "prompt.get_model_input(text)"
+    ),
+}
+
+TIMER = (
+    "import time\n"
+    "start = time.perf_counter()\n"
+    "{code}\n"
+    "print(time.perf_counter() - start)\n"
+)
+
+
+def time_stage(code: str) -> float:
+    output = subprocess.run(
+        [sys.executable, "-c", TIMER.format(code=code)],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+def main():
+    argument_parser = argparse.ArgumentParser(description=__doc__)
+    argument_parser.add_argument("--repeats", type=int, default=5)
+    args = argument_parser.parse_args()
+
+    print(f"{'stage':<50} {'median [s]':>10} {'min [s]':>10}")
+    for name, code in STAGES.items():
+        timings = [time_stage(code) for _ in range(args.repeats)]
+        print(f"{name:<50} {statistics.median(timings):>10.3f} {min(timings):>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+import hashlib
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Optional, Union
+
+from uni_kie import create_logger
+
+logger = create_logger(__name__)
+
+
+class SQLiteCache:
+    """
+    A persistent, content-addressed key-value store backed by a single SQLite file.
+
+    Keys are the sha256 of a namespace (e.g. the __repr__ of a model, which contains
+    all of its sampling parameters) and the exact content (e.g. the prompt). Entries are
+    evicted least-recently-used first once the stored values exceed max_size_bytes.
+
+    The cache can be shared by all threads of a process (one connection, guarded by a lock).
+
+    :param path: path of the SQLite file (parent folders are created)
+    :param max_size_bytes: upper bound for the summed size of all stored values (None -> unbounded)
+    :param read_only: never write to the cache (neither new entries nor access times), e.g. for reproducible benchmark runs
+    """
+
+    def __init__(
+        self,
+        path: Union[str, Path],
+        max_size_bytes: Optional[int] = 1024**3,
+        read_only: bool = False,
+    ):
+        self.path = Path(path)
+        self.max_size_bytes = max_size_bytes
+        self.read_only = read_only
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+        if self.read_only:
+            if not self.path.is_file():
+                raise FileNotFoundError(
+                    f"Read-only cache {self.path} does not exist. Run once without read_only to fill it."
+                )
+            self._connection = sqlite3.connect(
+                f"file:{self.path}?mode=ro", uri=True, check_same_thread=False
+            )
+        else:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._connection = sqlite3.connect(
+                str(self.path), check_same_thread=False, timeout=30
+            )
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                "key TEXT PRIMARY KEY, "
+                "value TEXT NOT NULL, "
+                "size INTEGER NOT NULL, "
+                "last_accessed REAL NOT NULL)"
+            )
+            self._connection.execute(
+                "CREATE INDEX IF NOT EXISTS cache_last_accessed ON cache (last_accessed)"
+            )
+            self._connection.commit()
+
+        self._size_bytes = self._get_size_bytes()
+
+    def __repr__(self):
+        return (
+            f"{self.__class__.__name__}(path={self.path}, read_only={self.read_only})"
+        )
+
+    def __len__(self):
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+
+    @staticmethod
+    def make_key(namespace: str, content: str) -> str:
+        return hashlib.sha256(f"{namespace}\x00{content}".encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT value FROM cache WHERE key = ?", (key,)
+            ).fetchone()
+
+            if row is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            if not self.read_only:
+                self._connection.execute(
+                    "UPDATE cache SET last_accessed = ? WHERE key = ?",
+                    (time.time(), key),
+                )
+                self._connection.commit()
+            return row[0]
+
+    def set(self, key: str, value: str) -> None:
+        if self.read_only:
+            return
+
+        size = len(value.encode("utf-8"))
+        with self._lock:
+            previous = self._connection.execute(
+                "SELECT size FROM cache WHERE key = ?", (key,)
+            ).fetchone()
+            self._connection.execute(
+                "INSERT OR REPLACE INTO cache (key, value, size, last_accessed) VALUES (?, ?, ?, ?)",
+                (key, value, size, time.time()),
+            )
+            self._size_bytes += size - (previous[0] if previous else 0)
+
+            if (
+                self.max_size_bytes is not None
+                and self._size_bytes > self.max_size_bytes
+            ):
+                self._evict()
+            self._connection.commit()
+
+    def _get_size_bytes(self) -> int:
+        with self._lock:
+            return self._connection.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM cache"
+            ).fetchone()[0]
+
+    def _evict(self) -> None:
+        """
+        Deletes the least recently used entries until the cache fits into max_size_bytes.
+
+        Has to be called while holding self._lock.
+        """
+        # other processes may have written to the same file, so we don't trust the running total here
+        self._size_bytes = self._connection.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM cache"
+        ).fetchone()[0]
+
+        rows = self._connection.execute(
+            "SELECT key, size FROM cache ORDER BY last_accessed ASC"
+        )
+        keys_to_delete = []
+        for key, size in rows:
+            if self._size_bytes <= self.max_size_bytes:
+                break
+            keys_to_delete.append((key,))
+            self._size_bytes -= size
+
+        self._connection.executemany("DELETE FROM cache WHERE key = ?", keys_to_delete)
+        self.evictions += len(keys_to_delete)
+        logger.info(f"Evicted {len(keys_to_delete)} entries from {self.path}")
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups > 0 else 0.0,
+            "evictions": self.evictions,
+            "entries": len(self),
+            "size_bytes": self._size_bytes,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    argument_parser = argparse.ArgumentParser(
+        description="Prints the stats (entries, size) of one or more cache files, "
+        "e.g. python -m uni_kie.cache .cache/text.sqlite .cache/completions.sqlite"
+    )
+    argument_parser.add_argument("paths", nargs="+")
+    args = argument_parser.parse_args()
+
+    for path in args.paths:
+        cache = SQLiteCache(path, read_only=True)
+        print(f"{path}: {cache.stats()}")
+        cache.close()
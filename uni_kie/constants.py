@@ -1,52 +1,54 @@
-from transformers import GPT2TokenizerFast
+from uni_kie.registry import LazyAttribute, lazy_import, load_pretrained_tokenizer
 
-from uni_kie.models.flan_t5 import FLAN_T5
-from uni_kie.models.gpt import GPT3_Davinci, GPT_NeoX
-from uni_kie.parsers.parser import DictParser, KleisterCharityParser
-from uni_kie.pdf_to_text.pdf_to_text import (
-    KleisterCharityWrapper,
-    PyMuPDFWrapper,
-    SroieWrapper,
-    SroieWrapperOwnOCR,
-)
-from uni_kie.prompts.prompts import NeutralPrompt
+# NOTE: everything that pulls in a heavy dependency (transformers, openai, spacy, PyMuPDF, ...) is
+# a LazyAttribute, i.e. it is only imported when it is accessed for the first time.
 
 
 class OCR_MODELS:
     TESSERACT = "TESSERACT"
 
 
+class RASTERIZERS:
+    PDF2IMAGE = "PDF2IMAGE"  # poppler (pdftoppm) subprocess per document
+    PY_MU_PDF = "PY_MU_PDF"  # in-process PyMuPDF pixmaps
+
+
 class PROMPT_VARIANTS:
-    NEUTRAL = NeutralPrompt
+    NEUTRAL = lazy_import("uni_kie.prompts.prompts", "NeutralPrompt")
 
 
 class MODELS:
     BASELINE = "BASELINE"
-    FLAN_T5 = FLAN_T5
+    FLAN_T5 = lazy_import("uni_kie.models.flan_t5", "FLAN_T5")
 
     class GPT:
-        NeoX = GPT_NeoX
-        Davinci = GPT3_Davinci
+        NeoX = lazy_import("uni_kie.models.gpt", "GPT_NeoX")
+        Davinci = lazy_import("uni_kie.models.gpt", "GPT3_Davinci")
 
 
 class PDF_TO_TEXT_MODELS:
-    PY_MU_PDF = PyMuPDFWrapper
-    KLEISTER_CHARITY_WRAPPER = KleisterCharityWrapper
-    SROIE_WRAPPER = SroieWrapper
-    SROIE_WRAPPER_OWN_OCR = SroieWrapperOwnOCR
+    PY_MU_PDF = lazy_import("uni_kie.pdf_to_text.pdf_to_text", "PyMuPDFWrapper")
+    KLEISTER_CHARITY_WRAPPER = lazy_import(
+        "uni_kie.pdf_to_text.pdf_to_text", "KleisterCharityWrapper"
+    )
+    SROIE_WRAPPER = lazy_import("uni_kie.pdf_to_text.pdf_to_text", "SroieWrapper")
+    SROIE_WRAPPER_OWN_OCR = lazy_import(
+        "uni_kie.pdf_to_text.pdf_to_text", "SroieWrapperOwnOCR"
+    )
 
 
 class PARSERS:
-    KLEISTER_CHARITY_PARSER = KleisterCharityParser
-    DICT_PARSER = DictParser
+    KLEISTER_CHARITY_PARSER = lazy_import(
+        "uni_kie.parsers.parser", "KleisterCharityParser"
+    )
+    DICT_PARSER = lazy_import("uni_kie.parsers.parser", "DictParser")
 
 
 class TOKENIZERS:
-    # TODO: speed this up, it costs a lot of time to load this. cache this maybe in a smarter way?
-    GPT2_TOKENIZER_FAST = GPT2TokenizerFast.from_pretrained(
-        "gpt2"
+    # loaded once per process on first access (from the local huggingface cache if possible)
+    GPT2_TOKENIZER_FAST = LazyAttribute(
+        lambda: load_pretrained_tokenizer("gpt2")
     )  # this is the same tokenizer that openai uses for their instructGPT model family
-    a = 1
 
 
 class NER_TAGGERS:
@@ -64,3 +66,16 @@ class LONG_DOCUMENT_HANDLING_VARIANTS:
     TRUNCATE_START = "TRUNCATE_START"
     TRUNCATE_MIDDLE = "TRUNCATE_MIDDLE"
     SPLIT_TO_SUBDOCUMENTS = "SPLIT_TO_SUBDOCUMENTS"
+    RETRIEVE_CHUNKS = "RETRIEVE_CHUNKS"  # only the chunks that are most relevant for the keys (one completion)
+
+
+class SUBDOCUMENT_ORDERS:
+    # order in which the subdocuments are sent to the model if early_exit is used
+    IN_ORDER = "IN_ORDER"  # first to last page
+    FIRST_AND_LAST_FIRST = "FIRST_AND_LAST_FIRST"  # first, last, second, second to last, ... (cover page and the final pages early)
+
+
+class ROUTING_OBJECTIVES:
+    # what RouterLLMPipeline minimizes when several models fit a document
+    COST = "COST"
+    LATENCY = "LATENCY"
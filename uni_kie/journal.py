@@ -0,0 +1,131 @@
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Union
+
+from uni_kie import create_logger
+
+logger = create_logger(__name__)
+
+
+class RunJournal:
+    """
+    An append-only JSONL ledger of a batch run.
+
+    Every finished document gets one line with its raw model output and final prediction
+    ("status": "done") or with the error that was raised ("status": "failed"). Lines are
+    flushed and fsync'ed immediately, so a crash never loses a completion that was already
+    paid for. If a document appears multiple times (e.g. failed and then retried), the
+    last line wins.
+
+    :param path: path of the JSONL file (created if it doesn't exist, appended to otherwise)
+    """
+
+    DONE = "done"
+    FAILED = "failed"
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self.records: Dict[str, dict] = {}
+        self._starts_with_newline = False
+        self._load()
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(path={self.path})"
+
+    def _load(self) -> None:
+        if not self.path.is_file():
+            return
+
+        with open(self.path, "r") as f:
+            lines = f.readlines()
+            # a crash during a write may have left a partial line, the next record must start on a new line
+            self._starts_with_newline = len(lines) > 0 and not lines[-1].endswith("\n")
+            for line in lines:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:  # last line may be cut off by a crash
+                    logger.info(f"Skipping corrupt line in {self.path}: {line}")
+                    continue
+                self.records[record["filename"]] = record
+
+        logger.info(
+            f"Loaded journal {self.path}: {len(self.completed)} done, {len(self.failed)} failed"
+        )
+
+    def _append(self, record: dict) -> None:
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, "a") as f:
+                if self._starts_with_newline:
+                    f.write("\n")
+                    self._starts_with_newline = False
+                f.write(json.dumps(record) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            self.records[record["filename"]] = record
+
+    @property
+    def completed(self) -> List[str]:
+        return [
+            filename
+            for filename, record in self.records.items()
+            if record["status"] == self.DONE
+        ]
+
+    @property
+    def failed(self) -> List[str]:
+        return [
+            filename
+            for filename, record in self.records.items()
+            if record["status"] == self.FAILED
+        ]
+
+    def record_done(
+        self, file_path: Union[str, Path], model_output: Any, prediction: Any
+    ) -> None:
+        self._append(
+            {
+                "filename": str(file_path),
+                "status": self.DONE,
+                "model_output": model_output,
+                "prediction": prediction,
+            }
+        )
+
+    def record_failed(self, file_path: Union[str, Path], error: Exception) -> None:
+        self._append(
+            {
+                "filename": str(file_path),
+                "status": self.FAILED,
+                "error": f"{error.__class__.__name__}: {error}",
+            }
+        )
+
+    def get_pending(
+        self, file_paths: List[Union[str, Path]], retry_failed_only: bool = False
+    ) -> List[Union[str, Path]]:
+        """
+        Returns the file_paths that still have to be predicted (in the given order).
+
+        :param retry_failed_only: only return documents whose last attempt failed (and not the ones never attempted)
+        """
+        if retry_failed_only:
+            failed = set(self.failed)
+            return [file_path for file_path in file_paths if str(file_path) in failed]
+
+        completed = set(self.completed)
+        return [
+            file_path for file_path in file_paths if str(file_path) not in completed
+        ]
+
+    def get_prediction(self, file_path: Union[str, Path]) -> Optional[Any]:
+        """
+        Returns the prediction of a finished document or None if it isn't done (yet).
+        """
+        record = self.records.get(str(file_path))
+        if record is None or record["status"] != self.DONE:
+            return None
+        return record["prediction"]
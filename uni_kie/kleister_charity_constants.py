@@ -28,6 +28,25 @@ class KLEISTER_CHARITY_CONSTANTS:
         "test-A": PATH_KLEISTER_CHARITY_TEST,
     }
 
+    # alternative names of the keys in the documents, e.g. "Period End", "Year Ended", ...
+    # (used by the KleisterCharitySpecificBaselineModel and to retrieve the relevant parts of long documents)
+    SYNONYMS = {
+        "Charity Name": ["Charity Name"],
+        "Charity Number": [
+            "Charity Number",
+            "Charity Registration No",
+            "Charity No",
+        ],
+        "Annual Income": ["Annual Income", "Income", "Total Income"],
+        "Period End Date": ["Period End Date", "Period End", "Year Ended"],
+        "Annual Spending": [
+            "Annual Spending",
+            "Spending",
+            "Total Spending",
+            "Expenditure",
+        ],
+    }
+
     SHOTS = [
         {
             "input": "Ushaw Moor Pre-School/Childcare\nDurham Road\nUshaw Moor\nDurham\nDH7 7LF\nTelephone 01913737536\nAnnual General Meeting\nOctober\nAttending meeting: Catherine Winn, Julie Davison, Lindsley Davison, Deborah\nMellis, Megan Bowery, Nikki Lowerson, Karen Smith, Janice Laight,\nKayleigh Hughes, Abbie Syers\nApologies from Lynsey Everett.\nUp date on school situation:\nMr Truman has left the school after a along absent, and a new head is now in\nposition, Mrs Maughan has had a chat with Julie, and the girls from the pre-\nschool are more optimistic with the future links between us. As the school have\na new head they will be due an ofsted and Mrs Maughan has put this as her\npriority but has already invited our children to attend their Christmas\nactivities.\nOther ideas included: Stay and play days, with parents and shared outdoor\nactivities.\nPre-School:\nKaren reported the pre-school had now used up all their childcare spaces and\nwould not be taking any September starters from the childcare setting. As the\npre-school taking children doing 3o hours per week number of spaces were less.\nJulie is concerned about turning these younger away may have a impact on next\nyear's intake.\nChildcare:\nLindsley has concerns about the number of children using the childcare during\nthe school holidays, as some days there are more staff than children. Catherine\nreminded the staff that they should take their due holidays outside of term\ntime when the numbers are low. It was agreed that we would monitor the\nsituation and maybe change opening hours.\nNext staff meeting to be arranged\nAgenda: Christmas activities",
@@ -0,0 +1,241 @@
+import asyncio
+import threading
+import time
+from collections import deque
+from typing import List, Optional
+
+import numpy as np
+
+from uni_kie import create_logger
+from uni_kie.models import http
+from uni_kie.models.model import LargeLanguageModel, LargeLanguageModelWrapper
+
+logger = create_logger(__name__)
+
+
+class AIMDController:
+    """
+    Adaptive limit for the number of concurrent requests to a backend (additive increase,
+    multiplicative decrease, like TCP congestion control).
+
+    - every successful request raises the limit by increase / limit, i.e. by about increase
+      per round of limit requests, as long as the latency is stable
+    - a 429 or 503 response, or a p95 latency above latency_tolerance times the baseline
+      (i.e. the backend starts queueing), multiplies the limit by decrease_factor
+
+    The baseline is the lowest p95 latency of the last latency_window requests, so it follows
+    the latency when it settles at a new level (e.g. when a run moves on from short documents
+    to long subdocuments): the limit is decreased once and grows again as soon as the new
+    latency has been stable for latency_window requests. While the latency is rising the
+    limit isn't increased.
+
+    After a decrease the limit isn't decreased again for one p95 latency, so that the requests
+    that were already in flight when the backend got overloaded only count once. A rise of the
+    latency only leads to another decrease if it rises by another factor of latency_tolerance.
+
+    Can be shared by threads (acquire/release) and asyncio tasks (aacquire/release).
+
+    :param initial_limit: limit to start with
+    :param min_limit: the limit never drops below this
+    :param max_limit: the limit never rises above this
+    :param increase: additive increase per round of limit requests
+    :param decrease_factor: multiplicative decrease on throttling or rising latency
+    :param latency_window: number of most recent latencies the p95 (and the baseline) is computed on
+    :param latency_tolerance: p95 / baseline above which the latency counts as rising
+    """
+
+    def __init__(
+        self,
+        initial_limit: int = 4,
+        min_limit: int = 1,
+        max_limit: int = 256,
+        increase: float = 1.0,
+        decrease_factor: float = 0.5,
+        latency_window: int = 50,
+        latency_tolerance: float = 2.0,
+    ):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.increase = increase
+        self.decrease_factor = decrease_factor
+        self.latency_tolerance = latency_tolerance
+        self.limit = float(initial_limit)
+        self.in_flight = 0
+        self.latencies = deque(maxlen=latency_window)
+        self.p95_latencies = deque(
+            maxlen=latency_window
+        )  # the baseline is their minimum
+        self._decreased_at_p95_latency: Optional[float] = None
+        self.history: List[dict] = []  # every change of the (integer) limit
+        self._no_decrease_until = 0.0
+        self._condition = threading.Condition()
+        self._async_waiters = deque()  # (loop, future) of waiting asyncio tasks
+        self._record_history("initial")
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(min_limit={self.min_limit}, max_limit={self.max_limit}, increase={self.increase}, decrease_factor={self.decrease_factor})"
+
+    def _record_history(self, reason: str) -> None:
+        self.history.append(
+            {"time": time.time(), "limit": int(self.limit), "reason": reason}
+        )
+        logger.info(f"Concurrency limit {int(self.limit)} ({reason})")
+
+    def _set_limit(self, limit: float, reason: str) -> None:
+        """
+        Has to be called while holding self._condition.
+        """
+        previous_limit = int(self.limit)
+        self.limit = min(max(limit, self.min_limit), self.max_limit)
+        if int(self.limit) != previous_limit:
+            self._record_history(reason)
+        if int(self.limit) > previous_limit:
+            self._wake_up()
+
+    def _wake_up(self) -> None:
+        """
+        Wakes up waiting threads and tasks. Has to be called while holding self._condition.
+        """
+        self._condition.notify_all()
+        while self._async_waiters:
+            loop, future = self._async_waiters.popleft()
+            loop.call_soon_threadsafe(
+                lambda future=future: future.done() or future.set_result(None)
+            )
+
+    def acquire(self) -> None:
+        """
+        Blocks until one more request is allowed to be in flight.
+        """
+        with self._condition:
+            while self.in_flight >= int(self.limit):
+                self._condition.wait()
+            self.in_flight += 1
+
+    async def aacquire(self) -> None:
+        """
+        Coroutine version of acquire.
+        """
+        while True:
+            with self._condition:
+                if self.in_flight < int(self.limit):
+                    self.in_flight += 1
+                    return
+                loop = asyncio.get_running_loop()
+                future = loop.create_future()
+                self._async_waiters.append((loop, future))
+            await future
+
+    def release(self, latency: Optional[float] = None) -> None:
+        """
+        Frees the slot of a finished request and records its latency (None if it failed).
+        """
+        with self._condition:
+            self.in_flight -= 1
+            if latency is not None:
+                self._record_latency(latency)
+            self._wake_up()
+
+    def _get_p95_latency(self) -> Optional[float]:
+        if len(self.latencies) < 10:  # too few latencies for a meaningful p95
+            return None
+        return float(np.percentile(self.latencies, 95))
+
+    def _get_baseline_p95_latency(self) -> Optional[float]:
+        return min(self.p95_latencies) if self.p95_latencies else None
+
+    def _record_latency(self, latency: float) -> None:
+        """
+        Has to be called while holding self._condition.
+        """
+        self.latencies.append(latency)
+        p95_latency = self._get_p95_latency()
+        if p95_latency is not None:
+            self.p95_latencies.append(p95_latency)
+            baseline_p95_latency = self._get_baseline_p95_latency()
+            if p95_latency > self.latency_tolerance * baseline_p95_latency:
+                # the latency is rising, but a rise that already led to a decrease only counts once
+                if (
+                    self._decreased_at_p95_latency is None
+                    or p95_latency
+                    > self.latency_tolerance * self._decreased_at_p95_latency
+                ) and self._decrease("rising p95 latency"):
+                    self._decreased_at_p95_latency = p95_latency
+                return
+            self._decreased_at_p95_latency = None
+
+        self._set_limit(self.limit + self.increase / int(self.limit), "stable latency")
+
+    def _decrease(self, reason: str) -> bool:
+        """
+        Returns whether the limit was decreased (i.e. not in the cooldown of an earlier decrease).
+
+        Has to be called while holding self._condition.
+        """
+        now = time.monotonic()
+        if now < self._no_decrease_until:
+            return False
+        self._no_decrease_until = now + (
+            self._get_p95_latency() or self._get_baseline_p95_latency() or 0.0
+        )
+        self._set_limit(self.limit * self.decrease_factor, reason)
+        return True
+
+    def record_throttled(self, status_code: int) -> None:
+        """
+        Called for every 429 or 503 response of the backend.
+        """
+        with self._condition:
+            self._decrease(f"throttled ({status_code})")
+
+    def stats(self) -> dict:
+        with self._condition:
+            return {
+                "limit": int(self.limit),
+                "in_flight": self.in_flight,
+                "p95_latency": self._get_p95_latency(),
+                "baseline_p95_latency": self._get_baseline_p95_latency(),
+                "history": list(self.history),
+            }
+
+
+class AdaptiveConcurrencyLargeLanguageModel(LargeLanguageModelWrapper):
+    """
+    Wraps any LargeLanguageModel so that at most controller.limit of its requests are
+    in flight at the same time. The limit adapts to the capacity of the backend (see
+    AIMDController), so the pipeline can run with a generous max_workers (or many
+    asyncio documents) and the controller decides how many requests are actually sent.
+
+    The controller sees every 429/503 response, also the ones that are retried by
+    uni_kie.models.http, through http.throttle_listener.
+    """
+
+    def __init__(self, model: LargeLanguageModel, controller: AIMDController):
+        super().__init__(model)
+        self.controller = controller
+
+    def predict(self, input: str) -> str:
+        self.controller.acquire()
+        token = http.throttle_listener.set(self.controller.record_throttled)
+        latency = None
+        try:
+            start = time.perf_counter()
+            prediction = self.model.predict(input)
+            latency = time.perf_counter() - start
+            return prediction
+        finally:  # failed requests don't count towards the latency
+            http.throttle_listener.reset(token)
+            self.controller.release(latency)
+
+    async def apredict(self, input: str) -> str:
+        await self.controller.aacquire()
+        token = http.throttle_listener.set(self.controller.record_throttled)
+        latency = None
+        try:
+            start = time.perf_counter()
+            prediction = await self.model.apredict(input)
+            latency = time.perf_counter() - start
+            return prediction
+        finally:  # failed requests don't count towards the latency
+            http.throttle_listener.reset(token)
+            self.controller.release(latency)
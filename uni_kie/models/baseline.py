@@ -2,16 +2,37 @@ import sys
 from typing import List, Optional, Tuple
 
 import regex
-import spacy
 from Levenshtein import distance
 
 from uni_kie import create_logger
 from uni_kie.constants import NER_TAGGERS
+from uni_kie.kleister_charity_constants import KLEISTER_CHARITY_CONSTANTS
 from uni_kie.models.model import AbstractModel
+from uni_kie.registry import load_spacy_model
 
 logger = create_logger(__name__)
 
 
+def get_best_match_span(
+    text: str, key: str, error_percentage: float
+) -> Optional[Tuple[int, int]]:
+    """
+    Returns the best match for the key in the text with some fuzziness
+    (i.e. we limit the levenshtein distance) of the best match.
+
+    (?b) -> BESTMATCH
+    (?i) -> IGNORECASE
+    {e<n} -> up to n errors (subs, inserts, dels). if more -> None
+    (1) -> the span of the best match
+    """
+    key_length = len(key)
+    max_errors = round(key_length * error_percentage)
+    match_span = regex.search(f"(?b)(?i)({key}){{e<{max_errors}}}", text)
+
+    if match_span:
+        return match_span.span(1)
+
+
 class AbstractBaselineModel(AbstractModel):
     def __init__(
         self,
@@ -25,8 +46,10 @@ class AbstractBaselineModel(AbstractModel):
         self.allowed_entity_range = allowed_entity_range
 
         try:
-            self.nlp = spacy.load(ner_tagger)
+            self.nlp = load_spacy_model(ner_tagger)
         except OSError:
+            import spacy
+
             print(
                 f"Missing model. Installing {ner_tagger}. You will need to restart the \
                 Python process after installation."
@@ -49,21 +72,7 @@ class AbstractBaselineModel(AbstractModel):
             raise NotImplementedError
 
     def get_best_match_span(self, text: str, key: str) -> Optional[Tuple[int, int]]:
-        """
-        Returns the best match for the key in the text with some fuzziness
-        (i.e. we limit the levenshtein distance) of the best match.
-
-        (?b) -> BESTMATCH
-        (?i) -> IGNORECASE
-        {e<n} -> up to n errors (subs, inserts, dels). if more -> None
-        (1) -> the span of the best match
-        """
-        key_length = len(key)
-        max_errors = round(key_length * self.error_percentage)
-        match_span = regex.search(f"(?b)(?i)({key}){{e<{max_errors}}}", text)
-
-        if match_span:
-            return match_span.span(1)
+        return get_best_match_span(text, key, self.error_percentage)
 
 
 class BaselineModel(AbstractBaselineModel):
@@ -202,22 +211,7 @@ class KleisterCharitySpecificBaselineModel(AbstractBaselineModel):
             error_percentage=error_percentage,
             allowed_entity_range=allowed_entity_range,
         )
-        self.synonyms = {
-            "Charity Name": ["Charity Name"],
-            "Charity Number": [
-                "Charity Number",
-                "Charity Registration No",
-                "Charity No",
-            ],
-            "Annual Income": ["Annual Income", "Income", "Total Income"],
-            "Period End Date": ["Period End Date", "Period End", "Year Ended"],
-            "Annual Spending": [
-                "Annual Spending",
-                "Spending",
-                "Total Spending",
-                "Expenditure",
-            ],
-        }
+        self.synonyms = KLEISTER_CHARITY_CONSTANTS.SYNONYMS
         self.type_validation = {
             "Address (post town)": ["GPE", "LOC"],
             "Address (post code)": [],  # uses regex
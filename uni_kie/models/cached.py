@@ -0,0 +1,45 @@
+from uni_kie import create_logger
+from uni_kie.cache import SQLiteCache
+from uni_kie.models.model import LargeLanguageModel, LargeLanguageModelWrapper
+
+logger = create_logger(__name__)
+
+
+class CachedLargeLanguageModel(LargeLanguageModelWrapper):
+    """
+    Wraps any LargeLanguageModel (GPT3_Davinci, GPT_NeoX, FLAN_T5, ...) and
+    stores its completions in a SQLiteCache.
+
+    The key is the __repr__ of the wrapped model (which contains all sampling
+    parameters) plus the exact prompt, so changing e.g. the temperature never
+    returns a stale completion.
+    """
+
+    def __init__(self, model: LargeLanguageModel, cache: SQLiteCache):
+        super().__init__(model)
+        self.cache = cache
+
+    def predict(self, input: str) -> str:
+        key = self.cache.make_key(repr(self.model), input)
+        cached_prediction = self.cache.get(key)
+        if cached_prediction is not None:
+            logger.info("Using cached completion")
+            return cached_prediction
+
+        prediction = self.model.predict(input)
+        if prediction is not None:  # don't cache failed completions
+            self.cache.set(key, prediction)
+        return prediction
+
+    async def apredict(self, input: str) -> str:
+        # the SQLite lookups are local and fast, only the completion itself is awaited
+        key = self.cache.make_key(repr(self.model), input)
+        cached_prediction = self.cache.get(key)
+        if cached_prediction is not None:
+            logger.info("Using cached completion")
+            return cached_prediction
+
+        prediction = await self.model.apredict(input)
+        if prediction is not None:  # don't cache failed completions
+            self.cache.set(key, prediction)
+        return prediction
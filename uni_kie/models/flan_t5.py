@@ -1,12 +1,8 @@
-import json
 import os
 
-import boto3
-import requests
-from sagemaker.serializers import JSONSerializer
-
 from uni_kie import create_logger
-from uni_kie.models.model import LargeLanguageModel
+from uni_kie.models.http import apost_json, post_json
+from uni_kie.models.model import LargeLanguageModel, ModelAPIError
 from uni_kie.prompts.prompts import STOP_KEY
 
 logger = create_logger(__name__)
@@ -33,8 +29,8 @@ class FLAN_T5(LargeLanguageModel):
     def __repr__(self):
         return f"Flan_T5(max_input_tokens={self.max_input_tokens}, temperature={self.temperature}, top_p={self.top_p}, top_k={self.top_k})"
 
-    def predict(self, input: str) -> str:
-        data = {
+    def _get_request_data(self, input: str) -> dict:
+        return {
             "inputs": input,
             "parameters": {
                 "do_sample": False,  # equivalent to temperature=0
@@ -47,20 +43,20 @@ class FLAN_T5(LargeLanguageModel):
             },
         }
 
-        response = requests.post(
-            self.endpoint_url,
-            headers=self.headers,
-            json=data,
-        )
-
-        if response.status_code != 200:
-            logger.info(f"Error: {response.status_code}")
-            logger.info(f"Error: {response.text}")
-            raise Exception("Error: " + str(response.status_code))
-
-        resp = response.json()
+    @staticmethod
+    def _parse_response(resp: list) -> str:
         try:
             return resp[0]["generated_text"]
-        except KeyError:
-            print(resp)
+        except (KeyError, IndexError, TypeError):
             logger.info(f"Error: {resp}")
+            raise ModelAPIError(f"Error: {resp}")
+
+    def predict(self, input: str) -> str:
+        resp = post_json(self.endpoint_url, self.headers, self._get_request_data(input))
+        return self._parse_response(resp)
+
+    async def apredict(self, input: str) -> str:
+        resp = await apost_json(
+            self.endpoint_url, self.headers, self._get_request_data(input)
+        )
+        return self._parse_response(resp)
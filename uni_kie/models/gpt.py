@@ -1,12 +1,14 @@
 import os
-import sys
 
 import openai
-import requests
 
-from uni_kie.models.model import LargeLanguageModel
+from uni_kie import create_logger
+from uni_kie.models.http import apost_json, post_json
+from uni_kie.models.model import LargeLanguageModel, ModelAPIError
 from uni_kie.prompts.prompts import STOP_KEY
 
+logger = create_logger(__name__)
+
 
 class GPT3_Davinci(LargeLanguageModel):
     def __init__(self):
@@ -28,18 +30,42 @@ class GPT3_Davinci(LargeLanguageModel):
     def __repr__(self):
         return f"GPT3_Davinci(max_input_tokens={self.max_input_tokens}, temperature={self.temperature}, top_p={self.top_p}, presence_penalty={self.presence_penalty}, frequency_penalty={self.frequency_penalty})"
 
+    def _get_request_data(self, prompt: str) -> dict:
+        return {
+            "model": "text-davinci-003",
+            "prompt": prompt,
+            "temperature": self.temperature,
+            "top_p": self.top_p,
+            "max_tokens": self.max_generated_tokens,
+            "presence_penalty": self.presence_penalty,
+            "frequency_penalty": self.frequency_penalty,
+            "stop": self.stop,
+        }
+
+    def _get_url_and_headers(self) -> tuple:
+        # the completions REST endpoint is called directly (instead of openai.Completion.create)
+        # so that the requests go through the shared session and its retries
+        return f"{openai.api_base}/completions", {
+            "Authorization": f"Bearer {openai.api_key}"
+        }
+
+    @staticmethod
+    def _parse_response(resp: dict) -> str:
+        try:
+            return resp["choices"][0]["text"]
+        except (KeyError, IndexError, TypeError):
+            logger.info(f"Error: {resp}")
+            raise ModelAPIError(f"Error: {resp}")
+
     def predict(self, prompt: str) -> str:
-        response = openai.Completion.create(
-            model="text-davinci-003",
-            prompt=prompt,
-            temperature=self.temperature,
-            top_p=self.top_p,
-            max_tokens=self.max_generated_tokens,
-            presence_penalty=self.presence_penalty,
-            frequency_penalty=self.frequency_penalty,
-            stop=self.stop,
-        )["choices"][0]["text"]
-        return response
+        url, headers = self._get_url_and_headers()
+        resp = post_json(url, headers, self._get_request_data(prompt))
+        return self._parse_response(resp)
+
+    async def apredict(self, prompt: str) -> str:
+        url, headers = self._get_url_and_headers()
+        resp = await apost_json(url, headers, self._get_request_data(prompt))
+        return self._parse_response(resp)
 
 
 class GPT_NeoX(LargeLanguageModel):
@@ -61,23 +87,37 @@ class GPT_NeoX(LargeLanguageModel):
     def __repr__(self):
         return f"GPT_NeoX(max_input_tokens={self.max_input_tokens}, temperature={self.temperature}, top_p={self.top_p}, top_k={self.top_k}, presence_penalty={self.presence_penalty}, frequency_penalty={self.frequency_penalty})"
 
+    def _get_request_data(self, prompt: str) -> dict:
+        return {
+            "prompt": prompt,
+            "temperature": self.temperature,
+            "top_p": self.top_p,
+            "max_tokens": self.max_generated_tokens,
+            "presence_penalty": self.presence_penalty,
+            "frequency_penalty": self.frequency_penalty,
+            "stop": self.stop,
+        }
+
+    @staticmethod
+    def _parse_response(resp: dict) -> str:
+        try:
+            return resp["text"]
+        except (KeyError, TypeError):
+            logger.info(f"Error: {resp}")
+            raise ModelAPIError(f"Error: {resp}")
+
     def predict(self, prompt: str) -> str:
-        response = requests.post(
+        resp = post_json(
             self.api_url + "/v1/engines/" + self.api_engine + "/completions",
-            headers={"Authorization": "Bearer " + self.api_key},
-            json={
-                "prompt": prompt,
-                "temperature": self.temperature,
-                "top_p": self.top_p,
-                "max_tokens": self.max_generated_tokens,
-                "presence_penalty": self.presence_penalty,
-                "frequency_penalty": self.frequency_penalty,
-                "stop": self.stop,
-            },
+            {"Authorization": "Bearer " + self.api_key},
+            self._get_request_data(prompt),
         )
-        resp = response.json()
-        try:
-            return resp["text"]
-        except KeyError:
-            print(resp)
-            sys.exit(1)
+        return self._parse_response(resp)
+
+    async def apredict(self, prompt: str) -> str:
+        resp = await apost_json(
+            self.api_url + "/v1/engines/" + self.api_engine + "/completions",
+            {"Authorization": "Bearer " + self.api_key},
+            self._get_request_data(prompt),
+        )
+        return self._parse_response(resp)
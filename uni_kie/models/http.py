@@ -0,0 +1,231 @@
+import asyncio
+import contextvars
+import json
+import random
+import threading
+import time
+import weakref
+from typing import Any, Callable, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from uni_kie import create_logger
+from uni_kie.models.model import (
+    ModelAPIError,
+    ModelRateLimitError,
+    ModelServerError,
+    ModelTimeoutError,
+)
+
+try:
+    import aiohttp
+except ImportError:  # a dependency of uni_kie, but only needed for LargeLanguageModel.apredict
+    aiohttp = None
+
+logger = create_logger(__name__)
+
+# upper bound for the number of open (keep-alive) connections per host of the sync session
+# and for the number of open connections of the async session (per event loop)
+MAX_CONNECTIONS = 256
+
+CONNECT_TIMEOUT = 10  # seconds until the TCP/TLS connection has to be established
+READ_TIMEOUT = 120  # seconds between two bytes of the response (generating 256 tokens can take a while)
+
+MAX_RETRIES = (
+    5  # retries after the first attempt, i.e. at most MAX_RETRIES + 1 requests
+)
+BACKOFF_BASE = 1.0  # seconds, the backoff doubles with every retry ...
+BACKOFF_MAX = 60.0  # ... up to this many seconds
+
+MAX_ERROR_BODY_LENGTH = (
+    500  # characters of a response body that end up in an error message
+)
+
+_SESSION = None
+_SESSION_LOCK = threading.Lock()
+
+# an aiohttp session is bound to the event loop it was created in, so there is one per loop
+_ASYNC_SESSIONS = weakref.WeakKeyDictionary()
+
+
+def get_session() -> requests.Session:
+    """
+    Returns the keep-alive session that all backends (and all threads) share, so that
+    a connection (and its TLS handshake) is re-used for many requests.
+    """
+    global _SESSION
+    with _SESSION_LOCK:
+        if _SESSION is None:
+            adapter = HTTPAdapter(pool_connections=16, pool_maxsize=MAX_CONNECTIONS)
+            _SESSION = requests.Session()
+            _SESSION.mount("https://", adapter)
+            _SESSION.mount("http://", adapter)
+        return _SESSION
+
+
+def get_async_session() -> "aiohttp.ClientSession":
+    """
+    Returns the keep-alive session of the running event loop that all backends share.
+
+    Has to be called from within a coroutine.
+    """
+    if aiohttp is None:
+        raise ImportError(
+            "The async model clients (apredict, apredict_many, predict_many_async) need aiohttp, "
+            "a dependency of uni_kie. Install it with `poetry install` or `pip install aiohttp`."
+        )
+
+    loop = asyncio.get_running_loop()
+    session = _ASYNC_SESSIONS.get(loop)
+    if session is None or session.closed:
+        session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=MAX_CONNECTIONS)
+        )
+        _ASYNC_SESSIONS[loop] = session
+    return session
+
+
+async def close_async_session() -> None:
+    """
+    Closes the session of the running event loop (call it before the loop is closed).
+    """
+    session = _ASYNC_SESSIONS.pop(asyncio.get_running_loop(), None)
+    if session is not None:
+        await session.close()
+
+
+# called with the status code of every 429 and 503 response (including the ones that are retried),
+# set by AdaptiveConcurrencyLargeLanguageModel around its calls (a ContextVar, so it's per thread and per task)
+throttle_listener: contextvars.ContextVar[
+    Optional[Callable[[int], None]]
+] = contextvars.ContextVar("throttle_listener", default=None)
+
+
+def _notify_throttled(status_code: int) -> None:
+    if status_code in (429, 503):
+        listener = throttle_listener.get()
+        if listener is not None:
+            listener(status_code)
+
+
+def is_retryable(status_code: int) -> bool:
+    return status_code == 429 or 500 <= status_code < 600
+
+
+def get_backoff_delay(attempt: int, retry_after: Optional[str] = None) -> float:
+    """
+    Seconds to wait before retry number attempt (0-based): exponential backoff with full
+    jitter (so that many clients that failed at the same time don't retry at the same time),
+    but at least as long as the server asked for in its Retry-After header.
+    """
+    delay = random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2**attempt))
+    if retry_after is not None:
+        try:
+            delay = max(delay, float(retry_after))
+        except ValueError:  # Retry-After can also be an HTTP date, we ignore that
+            pass
+    return delay
+
+
+def raise_for_status(status_code: int, response_text: str) -> None:
+    """
+    Raises the ModelAPIError subclass that corresponds to an unsuccessful status code.
+    """
+    if 200 <= status_code < 300:
+        return
+
+    logger.info(f"Error: {status_code} {response_text}")
+    if status_code == 429:
+        raise ModelRateLimitError(f"Error: {status_code} {response_text}", status_code)
+    if 500 <= status_code < 600:
+        raise ModelServerError(f"Error: {status_code} {response_text}", status_code)
+    raise ModelAPIError(f"Error: {status_code} {response_text}", status_code)
+
+
+def decode_json(status_code: int, response_text: str) -> Any:
+    """
+    Decodes the body of a successful response, raises ModelAPIError if it isn't JSON
+    (e.g. the HTML error page of a proxy or a load balancer).
+    """
+    try:
+        return json.loads(response_text)
+    except json.JSONDecodeError as e:
+        body = response_text[:MAX_ERROR_BODY_LENGTH]
+        if len(response_text) > MAX_ERROR_BODY_LENGTH:
+            body += "..."
+        logger.info(f"Error: {status_code} response is not JSON: {body}")
+        raise ModelAPIError(
+            f"Error: {status_code} response is not JSON: {body}", status_code
+        ) from e
+
+
+def post_json(
+    url: str,
+    headers: dict,
+    data: Any,
+    max_retries: int = MAX_RETRIES,
+    timeout: Tuple[float, float] = (CONNECT_TIMEOUT, READ_TIMEOUT),
+) -> Any:
+    """
+    Posts data (as JSON) to url through the shared session and returns the decoded response.
+
+    429, 5xx, timeouts and connection errors are retried with jittered exponential backoff.
+    Raises ModelRateLimitError, ModelServerError, ModelTimeoutError or ModelAPIError
+    (any other unsuccessful status code, which is never retried, or a body that isn't JSON).
+    """
+    for attempt in range(max_retries + 1):
+        try:
+            response = get_session().post(
+                url, headers=headers, json=data, timeout=timeout
+            )
+        except (requests.Timeout, requests.ConnectionError) as e:
+            if attempt == max_retries:
+                raise ModelTimeoutError(f"Error: {e}") from e
+            delay = get_backoff_delay(attempt)
+            logger.info(f"{e.__class__.__name__}, retrying in {delay:.1f}s")
+        else:
+            _notify_throttled(response.status_code)
+            if not is_retryable(response.status_code) or attempt == max_retries:
+                raise_for_status(response.status_code, response.text)
+                return decode_json(response.status_code, response.text)
+            delay = get_backoff_delay(attempt, response.headers.get("Retry-After"))
+            logger.info(f"Status {response.status_code}, retrying in {delay:.1f}s")
+        time.sleep(delay)
+
+
+async def apost_json(
+    url: str,
+    headers: dict,
+    data: Any,
+    max_retries: int = MAX_RETRIES,
+    timeout: Tuple[float, float] = (CONNECT_TIMEOUT, READ_TIMEOUT),
+) -> Any:
+    """
+    Coroutine version of post_json (through the async session of the running event loop).
+    """
+    session = get_async_session()
+    client_timeout = aiohttp.ClientTimeout(
+        sock_connect=timeout[0], sock_read=timeout[1]
+    )
+    for attempt in range(max_retries + 1):
+        try:
+            async with session.post(
+                url, headers=headers, json=data, timeout=client_timeout
+            ) as response:
+                status_code = response.status
+                response_text = await response.text()
+                retry_after = response.headers.get("Retry-After")
+        except (asyncio.TimeoutError, aiohttp.ClientConnectionError) as e:
+            if attempt == max_retries:
+                raise ModelTimeoutError(f"Error: {e!r}") from e
+            delay = get_backoff_delay(attempt)
+            logger.info(f"{e.__class__.__name__}, retrying in {delay:.1f}s")
+        else:
+            _notify_throttled(status_code)
+            if not is_retryable(status_code) or attempt == max_retries:
+                raise_for_status(status_code, response_text)
+                return decode_json(status_code, response_text)
+            delay = get_backoff_delay(attempt, retry_after)
+            logger.info(f"Status {status_code}, retrying in {delay:.1f}s")
+        await asyncio.sleep(delay)
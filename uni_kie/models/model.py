@@ -1,3 +1,37 @@
+import asyncio
+from typing import Optional
+
+
+class ModelAPIError(Exception):
+    """
+    Raised by a LargeLanguageModel if the API of the backend didn't return a completion.
+
+    :param status_code: HTTP status code of the response (None if there was no response)
+    """
+
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class ModelRateLimitError(ModelAPIError):
+    """
+    The backend still answered 429 (too many requests) after all retries.
+    """
+
+
+class ModelServerError(ModelAPIError):
+    """
+    The backend still answered with a 5xx status code after all retries.
+    """
+
+
+class ModelTimeoutError(ModelAPIError):
+    """
+    The backend couldn't be reached or didn't answer in time, even after all retries.
+    """
+
+
 class AbstractModel:
     def __init__(self):
         pass
@@ -15,7 +49,48 @@ class LargeLanguageModel(AbstractModel):
         self.max_input_tokens: int
 
     def __repr__(self):
-        return super().__repr__
+        return super().__repr__()
 
     def predict(self, input: str) -> str:
         raise NotImplementedError
+
+    async def apredict(self, input: str) -> str:
+        """
+        Coroutine version of predict, so that many requests can be in flight on a single event loop.
+
+        Backends with a native async client override this, the default runs the blocking
+        predict in the default thread pool of the event loop.
+        """
+        return await asyncio.get_running_loop().run_in_executor(
+            None, self.predict, input
+        )
+
+
+class LargeLanguageModelWrapper(LargeLanguageModel):
+    """
+    Base class of the models that wrap another LargeLanguageModel to add something around
+    its predict/apredict (a cache, a rate limit, a concurrency limit, ...).
+
+    The __repr__ is the one of the wrapped model so that prediction files are named the same
+    with and without the wrapper. Every other attribute (max_input_tokens, max_generated_tokens,
+    temperature, ...) is taken from the wrapped model.
+    """
+
+    def __init__(self, model: LargeLanguageModel):
+        super().__init__()
+        self.model = model
+
+    def __repr__(self):
+        return repr(self.model)
+
+    def __getattr__(self, name):
+        # only called for attributes the wrapper doesn't have itself
+        if name == "model":
+            raise AttributeError(name)
+        return getattr(self.model, name)
+
+    def predict(self, input: str) -> str:
+        return self.model.predict(input)
+
+    async def apredict(self, input: str) -> str:
+        return await self.model.apredict(input)
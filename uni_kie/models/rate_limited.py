@@ -0,0 +1,196 @@
+import asyncio
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+
+from uni_kie import create_logger
+from uni_kie.constants import TOKENIZERS
+from uni_kie.models.model import LargeLanguageModel, LargeLanguageModelWrapper
+
+logger = create_logger(__name__)
+
+# the number of tokens of the input of the current predict/apredict call if the caller already counted them
+# (e.g. LLMPipeline), set with known_number_of_input_tokens (a ContextVar, so it's per thread and per task)
+number_of_input_tokens: contextvars.ContextVar[Optional[int]] = contextvars.ContextVar(
+    "number_of_input_tokens", default=None
+)
+
+
+@contextmanager
+def known_number_of_input_tokens(number_of_tokens: Optional[int]) -> Iterator[None]:
+    """
+    The model calls in this context (in the current thread or task) take number_of_tokens
+    as the number of tokens of their input instead of tokenizing it (None -> tokenize).
+    """
+    token = number_of_input_tokens.set(number_of_tokens)
+    try:
+        yield
+    finally:
+        number_of_input_tokens.reset(token)
+
+
+class TokenBucket:
+    """
+    A thread-safe token bucket that holds at most capacity tokens and is refilled
+    with refill_per_second tokens per second.
+
+    reserve takes the tokens right away (the bucket may go into debt) and returns how long
+    the caller has to wait until they would have been available. Waiting happens outside of
+    the lock, so threads and asyncio tasks can share the same bucket and are served in the
+    order in which they reserved.
+    """
+
+    def __init__(self, capacity: float, refill_per_second: float):
+        self.capacity = capacity
+        self.refill_per_second = refill_per_second
+        self._tokens = capacity
+        self._last_refill = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount: float) -> float:
+        """
+        Takes amount tokens and returns the number of seconds to wait before using them.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(
+                self.capacity,
+                self._tokens + (now - self._last_refill) * self.refill_per_second,
+            )
+            self._last_refill = now
+            self._tokens -= amount
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.refill_per_second
+
+
+class RateLimiter:
+    """
+    Budgets requests and tokens per minute (the two quotas of the providers) with one
+    TokenBucket each. Both buckets can take a full minute worth of quota at once.
+
+    :param requests_per_minute: request quota (None -> unlimited)
+    :param tokens_per_minute: token quota, prompt plus generated tokens (None -> unlimited)
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: Optional[float] = None,
+        tokens_per_minute: Optional[float] = None,
+    ):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._request_bucket = (
+            TokenBucket(requests_per_minute, requests_per_minute / 60)
+            if requests_per_minute is not None
+            else None
+        )
+        self._token_bucket = (
+            TokenBucket(tokens_per_minute, tokens_per_minute / 60)
+            if tokens_per_minute is not None
+            else None
+        )
+        self.requests = 0
+        self.tokens = 0
+        self.waited_seconds = 0.0
+        self._stats_lock = threading.Lock()
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(requests_per_minute={self.requests_per_minute}, tokens_per_minute={self.tokens_per_minute})"
+
+    def _reserve(self, number_of_tokens: int) -> float:
+        delay = 0.0
+        if self._request_bucket is not None:
+            delay = max(delay, self._request_bucket.reserve(1))
+        if self._token_bucket is not None:
+            delay = max(delay, self._token_bucket.reserve(number_of_tokens))
+        with self._stats_lock:
+            self.requests += 1
+            self.tokens += number_of_tokens
+            self.waited_seconds += delay
+        if delay > 0:
+            logger.info(f"Rate limited, waiting {delay:.1f}s")
+        return delay
+
+    def acquire(self, number_of_tokens: int) -> None:
+        """
+        Blocks until a request with number_of_tokens tokens fits into both quotas.
+        """
+        delay = self._reserve(number_of_tokens)
+        if delay > 0:
+            time.sleep(delay)
+
+    async def aacquire(self, number_of_tokens: int) -> None:
+        """
+        Coroutine version of acquire (doesn't block the event loop).
+        """
+        delay = self._reserve(number_of_tokens)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def stats(self) -> dict:
+        return {
+            "requests": self.requests,
+            "tokens": self.tokens,
+            "waited_seconds": self.waited_seconds,
+        }
+
+
+_RATE_LIMITERS: Dict[str, RateLimiter] = {}
+_RATE_LIMITERS_LOCK = threading.Lock()
+
+
+def get_rate_limiter(
+    name: str,
+    requests_per_minute: Optional[float] = None,
+    tokens_per_minute: Optional[float] = None,
+) -> RateLimiter:
+    """
+    Returns the process-wide RateLimiter of a quota (e.g. "openai" or "textsynth"),
+    creating it on first use. All models (and pipelines) that draw from the same
+    quota should use the same name.
+    """
+    with _RATE_LIMITERS_LOCK:
+        if name not in _RATE_LIMITERS:
+            _RATE_LIMITERS[name] = RateLimiter(
+                requests_per_minute=requests_per_minute,
+                tokens_per_minute=tokens_per_minute,
+            )
+        return _RATE_LIMITERS[name]
+
+
+class RateLimitedLargeLanguageModel(LargeLanguageModelWrapper):
+    """
+    Wraps any LargeLanguageModel and waits in front of every predict/apredict
+    until the request fits into the requests and tokens per minute quotas of
+    the rate_limiter, so that concurrent workers run at the quota ceiling
+    instead of running into 429s.
+
+    The number of tokens of a request is the GPT-2 token count of the input plus
+    max_generated_tokens of the model (the providers count the requested completion).
+    The input is only tokenized if the caller didn't pass its token count down
+    (see known_number_of_input_tokens).
+
+    Wrap it in a CachedLargeLanguageModel (not the other way around) so that cached
+    completions don't use up the quota.
+    """
+
+    def __init__(self, model: LargeLanguageModel, rate_limiter: RateLimiter):
+        super().__init__(model)
+        self.rate_limiter = rate_limiter
+
+    def _get_number_of_tokens(self, input: str) -> int:
+        number_of_tokens = number_of_input_tokens.get()
+        if number_of_tokens is None:
+            number_of_tokens = len(TOKENIZERS.GPT2_TOKENIZER_FAST(input)["input_ids"])
+        return number_of_tokens + getattr(self.model, "max_generated_tokens", 0)
+
+    def predict(self, input: str) -> str:
+        self.rate_limiter.acquire(self._get_number_of_tokens(input))
+        return self.model.predict(input)
+
+    async def apredict(self, input: str) -> str:
+        await self.rate_limiter.aacquire(self._get_number_of_tokens(input))
+        return await self.model.apredict(input)
@@ -0,0 +1,87 @@
+from typing import List, Optional, Tuple
+
+from uni_kie import create_logger
+from uni_kie.constants import ROUTING_OBJECTIVES
+from uni_kie.models.model import LargeLanguageModel
+
+logger = create_logger(__name__)
+
+
+class ModelProfile:
+    """
+    Price and speed of a model, used to route a document to the cheapest (or fastest)
+    model whose context window fits the whole document.
+
+    :param cost_per_1k_tokens: price of 1000 tokens (input plus generated tokens)
+    :param seconds_per_request: latency of a request regardless of its length (network, queueing, ...)
+    :param seconds_per_1k_tokens: additional latency per 1000 tokens (input plus generated tokens)
+    """
+
+    def __init__(
+        self,
+        cost_per_1k_tokens: float = 0.0,
+        seconds_per_request: float = 0.0,
+        seconds_per_1k_tokens: float = 0.0,
+    ):
+        self.cost_per_1k_tokens = cost_per_1k_tokens
+        self.seconds_per_request = seconds_per_request
+        self.seconds_per_1k_tokens = seconds_per_1k_tokens
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(cost_per_1k_tokens={self.cost_per_1k_tokens}, seconds_per_request={self.seconds_per_request}, seconds_per_1k_tokens={self.seconds_per_1k_tokens})"
+
+    def get_cost(self, number_of_tokens: int) -> float:
+        return self.cost_per_1k_tokens * number_of_tokens / 1000
+
+    def get_latency(self, number_of_tokens: int) -> float:
+        return (
+            self.seconds_per_request
+            + self.seconds_per_1k_tokens * number_of_tokens / 1000
+        )
+
+
+def select_route(
+    routes: List[Tuple[LargeLanguageModel, ModelProfile]],
+    number_of_input_tokens: int,
+    routing_objective: ROUTING_OBJECTIVES = ROUTING_OBJECTIVES.COST,
+) -> Optional[int]:
+    """
+    Returns the index (in routes) of the model whose max_input_tokens fit number_of_input_tokens
+    with the lowest expected cost (ROUTING_OBJECTIVES.COST, latency breaks ties) or latency
+    (ROUTING_OBJECTIVES.LATENCY, cost breaks ties). The expected number of tokens of a request
+    is number_of_input_tokens plus max_generated_tokens of the model. Remaining ties go to
+    the model that comes first in routes.
+
+    Returns None if the input doesn't fit into any of the models.
+    """
+    candidates = []
+    for i, (model, profile) in enumerate(routes):
+        if number_of_input_tokens > model.max_input_tokens:
+            continue
+        number_of_tokens = number_of_input_tokens + getattr(
+            model, "max_generated_tokens", 0
+        )
+        cost = profile.get_cost(number_of_tokens)
+        latency = profile.get_latency(number_of_tokens)
+        if routing_objective == ROUTING_OBJECTIVES.LATENCY:
+            candidates.append(((latency, cost), i))
+        elif routing_objective == ROUTING_OBJECTIVES.COST:
+            candidates.append(((cost, latency), i))
+        else:
+            raise NotImplementedError(f"{routing_objective} is not implemented yet.")
+
+    if len(candidates) == 0:
+        return None
+    return min(candidates, key=lambda candidate: candidate[0])[1]
+
+
+def select_model(
+    routes: List[Tuple[LargeLanguageModel, ModelProfile]],
+    number_of_input_tokens: int,
+    routing_objective: ROUTING_OBJECTIVES = ROUTING_OBJECTIVES.COST,
+) -> Optional[LargeLanguageModel]:
+    """
+    Returns the model of the route select_route picks (None if the input doesn't fit into any of the models).
+    """
+    route = select_route(routes, number_of_input_tokens, routing_objective)
+    return None if route is None else routes[route][0]
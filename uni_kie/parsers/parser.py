@@ -199,7 +199,9 @@ class DictParser(Parser):
         return super().__repr__()
 
     @staticmethod
-    def parse_model_output(model_output: str, prompt_keys: List[str]) -> dict:
+    def parse_model_output(
+        model_output: str, prompt_keys: List[str], use_gold_keys: bool = True
+    ) -> dict:
         """
         Assumes that the value for a key is whatever comes after it and before the next key (independent of line breaks). Also
         assumes that model_output is ordered according to gold_keys.
@@ -215,6 +217,9 @@ class DictParser(Parser):
         separating the key-value pairs. If a value for a key is an empty string or "null", the key-value pair is left out.
 
         This is important because not every key can be found in the document.
+
+        For SROIE the returned dict uses the gold keys, unless use_gold_keys is False (e.g. to compare
+        the output of several subdocuments key by key, see DictParser.to_gold_keys).
         """
         if model_output is None:
             logger.info("WARNING: Model output is None")
@@ -286,14 +291,25 @@ class DictParser(Parser):
             if value is None:
                 continue
 
-            if prompt_keys == SROIE_CONSTANTS.prompt_keys:
-                # use the gold keys instead of the prompt keys
-                out[SROIE_CONSTANTS.prompt_key_to_gold_key[prompt_key[:-1]]] = value
-            else:
-                out[prompt_key[:-1]] = value  # remove trailing colon from prompt key
+            out[prompt_key[:-1]] = value  # remove trailing colon from prompt key
 
+        if use_gold_keys:
+            return DictParser.to_gold_keys(out, prompt_keys)
         return out
 
+    @staticmethod
+    def to_gold_keys(parsed_output: dict, prompt_keys: List[str]) -> dict:
+        """
+        Renames the keys of a dict parsed with use_gold_keys=False to the gold keys (only for SROIE,
+        other datasets use the prompt keys).
+        """
+        if prompt_keys == SROIE_CONSTANTS.prompt_keys:
+            return {
+                SROIE_CONSTANTS.prompt_key_to_gold_key[key]: value
+                for key, value in parsed_output.items()
+            }
+        return parsed_output
+
     @staticmethod
     def parse_model_outputs_to_json(model_outputs: List[dict], model_name: str) -> None:
         """
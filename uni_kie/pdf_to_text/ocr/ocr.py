@@ -1,22 +1,248 @@
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from functools import partial
 from pathlib import Path
+from typing import List, Optional
 
+import fitz as PyMuPDF
+import numpy as np
 import pdf2image
+from PIL import Image
 
-from uni_kie.pdf_to_text.pdf_to_text import AbstractPDFToTextModel
+from uni_kie.cache import SQLiteCache
+from uni_kie.constants import RASTERIZERS
+from uni_kie.pdf_to_text.ocr.preprocessing import ImagePreprocessor
+from uni_kie.pdf_to_text.pdf_to_text import PYMUPDF_LOCK, AbstractPDFToTextModel
+
+
+def _group_consecutive(page_numbers: List[int], max_group_size: int) -> List[tuple]:
+    """
+    Groups sorted page numbers into (first_page, last_page) runs of consecutive pages
+    with at most max_group_size pages each, e.g. [1, 2, 3, 5] -> [(1, 2), (3, 3), (5, 5)] for 2.
+    """
+    groups = []
+    for page_number in page_numbers:
+        if (
+            groups
+            and groups[-1][1] == page_number - 1
+            and groups[-1][1] - groups[-1][0] + 1 < max_group_size
+        ):
+            groups[-1] = (groups[-1][0], page_number)
+        else:
+            groups.append((page_number, page_number))
+    return groups
 
 
 class AbstractOCRModel(AbstractPDFToTextModel):
-    def __init__(self):
-        super().__init__()
+    """
+    Renders the pages of a PDF (or loads an image file, e.g. a SROIE receipt) and runs OCR on them.
+
+    Pages are rendered and OCR'd in batches of batch_size pages, so the peak memory is
+    bounded by the batch size (times the number of processes) instead of the page count.
+
+    :param dpi: resolution the pages are rendered with
+    :param batch_size: number of pages that are rendered (and held in memory) at once
+    :param processes: number of worker processes that render and OCR batches in parallel (None or 1 -> serial)
+    :param rasterizer: RASTERIZERS.PDF2IMAGE (poppler subprocess, PIL images) or RASTERIZERS.PY_MU_PDF
+        (in-process PyMuPDF pixmaps handed to the OCR as numpy arrays, so rendering needs no file I/O;
+        whether the OCR itself does depends on the model, see Tesseract.ocr_image)
+    :param grayscale: render the pages in grayscale instead of RGB
+    :param preprocessor: optional ImagePreprocessor that every page goes through before the OCR
+    :param text_cache: see AbstractPDFToTextModel, only pages that aren't cached yet are rendered and OCR'd
+    """
+
+    IMAGE_SUFFIXES = {".jpg", ".jpeg", ".png", ".tif", ".tiff", ".bmp"}
+
+    def __init__(
+        self,
+        dpi: int = 300,
+        batch_size: int = 4,
+        processes: Optional[int] = None,
+        rasterizer: RASTERIZERS = RASTERIZERS.PDF2IMAGE,
+        grayscale: bool = False,
+        preprocessor: Optional[ImagePreprocessor] = None,
+        text_cache: Optional[SQLiteCache] = None,
+    ):
+        super().__init__(text_cache=text_cache)
+        self.dpi = dpi
+        self.batch_size = batch_size
+        self.processes = processes
+        self.rasterizer = rasterizer
+        self.grayscale = grayscale
+        self.preprocessor = preprocessor
+        self._executor = None
+        self._executor_lock = threading.Lock()
 
     def __repr__(self):
+        if self.preprocessor is not None:
+            return f"{super().__repr__()}_preprocessed"
         return super().__repr__()
 
-    def _convert_pdf_to_images(self, file_path: Path):
-        return pdf2image.convert_from_path(file_path, dpi=300)
+    def __getstate__(self):
+        # the model itself is sent to the worker processes, its pool and cache connection aren't
+        state = self.__dict__.copy()
+        state["_executor"] = None
+        state["text_cache"] = None
+        del state["_executor_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._executor_lock = threading.Lock()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        # pipeline threads may OCR their first documents at the same time, they share one pool
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.processes)
+            return self._executor
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def _get_cache_namespace(self) -> str:
+        return (
+            f"{self.__class__.__name__}(dpi={self.dpi}, rasterizer={self.rasterizer}, "
+            f"grayscale={self.grayscale}, preprocessor={self.preprocessor!r})"
+        )
+
+    def _is_image(self, file_path: Path) -> bool:
+        return Path(file_path).suffix.lower() in self.IMAGE_SUFFIXES
+
+    def _count_pages(self, file_path: Path) -> int:
+        if self._is_image(file_path):
+            return 1
+        if self.rasterizer == RASTERIZERS.PY_MU_PDF:
+            with PYMUPDF_LOCK, PyMuPDF.open(file_path) as doc:
+                return doc.page_count
+        return pdf2image.pdfinfo_from_path(file_path)["Pages"]
+
+    def _convert_pdf_to_images(
+        self,
+        file_path: Path,
+        first_page: Optional[int] = None,
+        last_page: Optional[int] = None,
+        hold_pymupdf_lock: bool = True,
+    ) -> list:
+        """
+        Renders the pages first_page to last_page (1-based, inclusive) or all pages if not given.
+
+        Returns PIL images (PDF2IMAGE) or numpy arrays of shape (height, width, 3) or (height, width)
+        if grayscale (PY_MU_PDF). Image files are returned as a single numpy array.
+
+        :param hold_pymupdf_lock: see ocr_pages
+        """
+        if self._is_image(file_path):
+            with Image.open(file_path) as image:
+                return [np.asarray(image.convert("L" if self.grayscale else "RGB"))]
+
+        if self.rasterizer == RASTERIZERS.PY_MU_PDF:
+            return self._render_pages_with_pymupdf(
+                file_path, first_page, last_page, hold_pymupdf_lock
+            )
+
+        return pdf2image.convert_from_path(
+            file_path,
+            dpi=self.dpi,
+            first_page=first_page,
+            last_page=last_page,
+            grayscale=self.grayscale,
+        )
+
+    def _render_pages_with_pymupdf(
+        self,
+        file_path: Path,
+        first_page: Optional[int] = None,
+        last_page: Optional[int] = None,
+        hold_pymupdf_lock: bool = True,
+    ) -> List[np.ndarray]:
+        colorspace = PyMuPDF.csGRAY if self.grayscale else PyMuPDF.csRGB
+        images = []
+        lock = PYMUPDF_LOCK if hold_pymupdf_lock else nullcontext()
+        with lock, PyMuPDF.open(file_path) as doc:
+            first_page = first_page or 1
+            last_page = last_page or doc.page_count
+            for page_number in range(first_page - 1, last_page):
+                pixmap = doc[page_number].get_pixmap(
+                    dpi=self.dpi, colorspace=colorspace, alpha=False
+                )
+                image = np.frombuffer(pixmap.samples, dtype=np.uint8).reshape(
+                    pixmap.height, pixmap.width, pixmap.n
+                )
+                images.append(image[:, :, 0] if pixmap.n == 1 else image)
+        return images
 
     def get_text(self, file_path: Path) -> str:
         return self.ocr(file_path)
 
+    def ocr_pages(
+        self,
+        file_path: Path,
+        first_page: int,
+        last_page: int,
+        hold_pymupdf_lock: bool = True,
+    ) -> List[str]:
+        """
+        Renders, preprocesses (if a preprocessor is set) and OCRs the pages first_page to last_page (1-based, inclusive).
+
+        :param hold_pymupdf_lock: whether PyMuPDF is used under PYMUPDF_LOCK. False in the worker processes,
+            which are single-threaded and must not touch the lock: a forked worker inherits it in the state
+            it had in the parent, i.e. possibly held by another thread (and then never released).
+        """
+        images = self._convert_pdf_to_images(
+            file_path,
+            first_page=first_page,
+            last_page=last_page,
+            hold_pymupdf_lock=hold_pymupdf_lock,
+        )
+        if self.preprocessor is not None:
+            images = [self.preprocessor(image) for image in images]
+        return [self.ocr_image(image) for image in images]
+
     def ocr(self, file_path: Path) -> str:
+        file_hash = self._hash_file(file_path) if self.text_cache is not None else None
+        number_of_pages = self._get_cached_number_of_pages(file_hash)
+        if number_of_pages is None:
+            number_of_pages = self._count_pages(file_path)
+
+        page_texts = self._get_cached_pages(file_hash, range(1, number_of_pages + 1))
+        missing_pages = [
+            page_number
+            for page_number in range(1, number_of_pages + 1)
+            if page_number not in page_texts
+        ]
+        batches = _group_consecutive(missing_pages, self.batch_size)
+        first_pages = [first_page for first_page, _ in batches]
+        last_pages = [last_page for _, last_page in batches]
+
+        if self.processes is None or self.processes <= 1:
+            batch_texts = map(
+                self.ocr_pages, [file_path] * len(first_pages), first_pages, last_pages
+            )
+        else:
+            batch_texts = self._get_executor().map(
+                partial(self.ocr_pages, hold_pymupdf_lock=False),
+                [file_path] * len(first_pages),
+                first_pages,
+                last_pages,
+            )
+
+        ocr_texts = {
+            page_number: page_text
+            for page_number, page_text in zip(
+                missing_pages, (text for batch in batch_texts for text in batch)
+            )
+        }
+        self._set_cached_pages(file_hash, number_of_pages, ocr_texts)
+        page_texts.update(ocr_texts)
+
+        return "".join(
+            page_texts[page_number] + "\n"
+            for page_number in range(1, number_of_pages + 1)
+        )
+
+    def ocr_image(self, image) -> str:
         raise NotImplementedError
@@ -0,0 +1,136 @@
+from typing import Optional
+
+import cv2
+import numpy as np
+
+
+class ImagePreprocessor:
+    """
+    Optional OpenCV stage in front of the OCR models that makes the images cheaper
+    (and usually easier) to OCR.
+
+    The steps are applied in this order:
+    1. grayscale: convert RGB to a single channel
+    2. max_side: downscale (never upscale) so that the longer side has at most max_side pixels
+    3. deskew: rotate the page so that the text lines are horizontal (only skews up to max_skew_angle degrees),
+       off by default: the skew is estimated from the minimum area rectangle around *all* content, so logos,
+       borders and stamps (common on receipts) throw it off, and it hasn't been measured on SROIE yet
+       (see uni_kie.benchmarks.ocr_preprocessing)
+    4. crop_margins: cut off the empty margins around the content (keeping margin pixels)
+    5. binarize: Otsu thresholding to black text on white background
+
+    :param grayscale: see above
+    :param binarize: see above
+    :param deskew: see above
+    :param crop_margins: see above
+    :param max_side: see above (None -> no downscaling)
+    :param max_skew_angle: larger detected skews are assumed to be wrong and aren't corrected
+    :param margin: number of pixels that are kept around the content when cropping
+    """
+
+    def __init__(
+        self,
+        grayscale: bool = True,
+        binarize: bool = True,
+        deskew: bool = False,
+        crop_margins: bool = True,
+        max_side: Optional[int] = 2500,
+        max_skew_angle: float = 10.0,
+        margin: int = 10,
+    ):
+        self.grayscale = grayscale
+        self.binarize = binarize
+        self.deskew = deskew
+        self.crop_margins = crop_margins
+        self.max_side = max_side
+        self.max_skew_angle = max_skew_angle
+        self.margin = margin
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(grayscale={self.grayscale}, binarize={self.binarize}, deskew={self.deskew}, crop_margins={self.crop_margins}, max_side={self.max_side}, max_skew_angle={self.max_skew_angle}, margin={self.margin})"
+
+    def __call__(self, image) -> np.ndarray:
+        """
+        Takes a PIL image or a numpy array (RGB or grayscale) and returns a numpy array.
+        """
+        image = np.asarray(image)
+
+        if self.grayscale and image.ndim == 3:
+            image = cv2.cvtColor(image, cv2.COLOR_RGB2GRAY)
+
+        if self.max_side is not None and max(image.shape[:2]) > self.max_side:
+            scale = self.max_side / max(image.shape[:2])
+            image = cv2.resize(
+                image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA
+            )
+
+        if self.deskew:
+            image = self._deskew(image)
+
+        if self.crop_margins:
+            image = self._crop_margins(image)
+
+        if self.binarize:
+            gray_image = (
+                image if image.ndim == 2 else cv2.cvtColor(image, cv2.COLOR_RGB2GRAY)
+            )
+            _, image = cv2.threshold(
+                gray_image, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU
+            )
+
+        return image
+
+    @staticmethod
+    def _get_foreground_mask(image: np.ndarray) -> np.ndarray:
+        """
+        Returns a binary mask where the (dark) content is 255 and the (light) background is 0.
+        """
+        gray_image = (
+            image if image.ndim == 2 else cv2.cvtColor(image, cv2.COLOR_RGB2GRAY)
+        )
+        _, mask = cv2.threshold(
+            gray_image, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU
+        )
+        return mask
+
+    def _get_skew_angle(self, image: np.ndarray) -> float:
+        """
+        Angle (in degrees, counter-clockwise) of the minimum area rectangle around the content.
+        """
+        points = cv2.findNonZero(self._get_foreground_mask(image))
+        if points is None:  # empty page
+            return 0.0
+
+        (_, _), (width, height), angle = cv2.minAreaRect(points)
+        # depending on the OpenCV version the angle is in [-90, 0) or (0, 90], map it to (-45, 45]
+        if angle > 45:
+            angle -= 90
+        elif angle <= -45:
+            angle += 90
+        return angle
+
+    def _deskew(self, image: np.ndarray) -> np.ndarray:
+        angle = self._get_skew_angle(image)
+        if abs(angle) < 0.1 or abs(angle) > self.max_skew_angle:
+            return image
+
+        height, width = image.shape[:2]
+        rotation = cv2.getRotationMatrix2D((width / 2, height / 2), angle, 1.0)
+        return cv2.warpAffine(
+            image,
+            rotation,
+            (width, height),
+            flags=cv2.INTER_CUBIC,
+            borderMode=cv2.BORDER_REPLICATE,
+        )
+
+    def _crop_margins(self, image: np.ndarray) -> np.ndarray:
+        points = cv2.findNonZero(self._get_foreground_mask(image))
+        if points is None:  # empty page
+            return image
+
+        x, y, width, height = cv2.boundingRect(points)
+        return image[
+            max(y - self.margin, 0) : y + height + self.margin,
+            max(x - self.margin, 0) : x + width + self.margin,
+        ]
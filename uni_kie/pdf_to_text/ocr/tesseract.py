@@ -1,21 +1,41 @@
-from pathlib import Path
+from typing import Optional
 
 import pytesseract
 
+from uni_kie.cache import SQLiteCache
+from uni_kie.constants import RASTERIZERS
 from uni_kie.pdf_to_text.ocr.ocr import AbstractOCRModel
+from uni_kie.pdf_to_text.ocr.preprocessing import ImagePreprocessor
 
 
 class Tesseract(AbstractOCRModel):
-    def __init__(self):
-        super().__init__()
+    def __init__(
+        self,
+        dpi: int = 300,
+        batch_size: int = 4,
+        processes: Optional[int] = None,
+        rasterizer: RASTERIZERS = RASTERIZERS.PDF2IMAGE,
+        grayscale: bool = False,
+        preprocessor: Optional[ImagePreprocessor] = None,
+        text_cache: Optional[SQLiteCache] = None,
+    ):
+        super().__init__(
+            dpi=dpi,
+            batch_size=batch_size,
+            processes=processes,
+            rasterizer=rasterizer,
+            grayscale=grayscale,
+            preprocessor=preprocessor,
+            text_cache=text_cache,
+        )
 
     def __repr__(self):
         return super().__repr__()
 
-    def ocr(self, file_path: Path) -> str:
-        images = self._convert_pdf_to_images(file_path)
-        ocr_string = ""
-        for image in images:
-            ocr_string += pytesseract.image_to_string(image) + "\n"
-
-        return ocr_string
+    def ocr_image(self, image) -> str:
+        """
+        pytesseract writes every image to a temporary PNG file and runs the tesseract binary on it
+        in a subprocess, even if the page was rendered in memory (RASTERIZERS.PY_MU_PDF). Use
+        TesseractAPI (tesserocr) to OCR the images in memory.
+        """
+        return pytesseract.image_to_string(image)
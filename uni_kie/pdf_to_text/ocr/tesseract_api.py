@@ -0,0 +1,95 @@
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+import numpy as np
+
+from uni_kie.cache import SQLiteCache
+from uni_kie.constants import RASTERIZERS
+from uni_kie.pdf_to_text.ocr.ocr import AbstractOCRModel
+from uni_kie.pdf_to_text.ocr.preprocessing import ImagePreprocessor
+
+try:
+    import tesserocr
+except ImportError:  # optional dependency, only needed for TesseractAPI
+    tesserocr = None
+
+# one engine per thread (and therefore per worker process), created once and re-used for every page
+_ENGINES = threading.local()
+
+
+def _get_engine(lang: str):
+    engine = getattr(_ENGINES, "engine", None)
+    if engine is None:
+        engine = tesserocr.PyTessBaseAPI(lang=lang)
+        _ENGINES.engine = engine
+    return engine
+
+
+class TesseractAPI(AbstractOCRModel):
+    """
+    Same as Tesseract but calls libtesseract in-process (through tesserocr) instead of
+    forking a tesseract subprocess and writing a temporary image file for every page.
+
+    Every worker process initialises its engine once when it starts and passes the
+    images to it in memory.
+
+    Needs the optional dependency tesserocr (pip install tesserocr).
+
+    :param lang: language(s) of the tesseract model, e.g. "eng" or "eng+deu"
+    """
+
+    def __init__(
+        self,
+        dpi: int = 300,
+        batch_size: int = 4,
+        processes: Optional[int] = None,
+        rasterizer: RASTERIZERS = RASTERIZERS.PY_MU_PDF,
+        grayscale: bool = True,
+        preprocessor: Optional[ImagePreprocessor] = None,
+        text_cache: Optional[SQLiteCache] = None,
+        lang: str = "eng",
+    ):
+        if tesserocr is None:
+            raise ImportError(
+                "TesseractAPI needs tesserocr. Install it with `pip install tesserocr`."
+            )
+        super().__init__(
+            dpi=dpi,
+            batch_size=batch_size,
+            processes=processes,
+            rasterizer=rasterizer,
+            grayscale=grayscale,
+            preprocessor=preprocessor,
+            text_cache=text_cache,
+        )
+        self.lang = lang
+
+    def __repr__(self):
+        return super().__repr__()
+
+    def _get_cache_namespace(self) -> str:
+        return f"{super()._get_cache_namespace()}(lang={self.lang})"
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.processes,
+                initializer=_get_engine,  # pre-initialise the engine of every worker
+                initargs=(self.lang,),
+            )
+        return self._executor
+
+    def ocr_image(self, image) -> str:
+        engine = _get_engine(self.lang)
+        if isinstance(image, np.ndarray):
+            # raw pixels straight from the PyMuPDF pixmap, no encoding to an image format
+            image = np.ascontiguousarray(image)
+            height, width = image.shape[:2]
+            bytes_per_pixel = 1 if image.ndim == 2 else image.shape[2]
+            engine.SetImageBytes(
+                image.tobytes(), width, height, bytes_per_pixel, width * bytes_per_pixel
+            )
+        else:
+            engine.SetImage(image)
+        return engine.GetUTF8Text()
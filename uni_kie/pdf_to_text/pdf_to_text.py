@@ -1,10 +1,18 @@
+import hashlib
+import mmap
+import os
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
-from typing import Union
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
 
 import fitz as PyMuPDF
 import numpy as np
 import pandas as pd
 
+from uni_kie import PATH_CACHE
+from uni_kie.cache import SQLiteCache
 from uni_kie.kleister_charity_constants import KLEISTER_CHARITY_CONSTANTS
 from uni_kie.sroie_constants import (
     PATH_SROIE_TEST,
@@ -12,10 +20,22 @@ from uni_kie.sroie_constants import (
     SROIE_CONSTANTS,
 )
 
+# PyMuPDF is not thread-safe, so every use of it in this process (e.g. from the worker threads
+# of AbstractPipeline._map or the thread pool of the asyncio path) has to hold this lock.
+# The worker processes of PyMuPDFWrapper and AbstractOCRModel are single-threaded and must not
+# take it: a forked worker inherits the lock as it was in the parent, possibly held by another thread.
+PYMUPDF_LOCK = threading.Lock()
+
 
 class AbstractPDFToTextModel:
-    def __init__(self):
-        pass
+    """
+    :param text_cache: optional SQLiteCache that stores the extracted text of every page, keyed by
+        the content hash of the file, the page number and the extractor configuration (see
+        _get_cache_namespace), so that unchanged files are never extracted twice
+    """
+
+    def __init__(self, text_cache: Optional[SQLiteCache] = None):
+        self.text_cache = text_cache
 
     def __repr__(self):
         return self.__class__.__name__
@@ -23,15 +43,163 @@ class AbstractPDFToTextModel:
     def get_text(self, file_path: Union[Path, str]) -> str:
         raise NotImplementedError
 
+    def _get_cache_namespace(self) -> str:
+        """
+        Everything that changes the extracted text (engine, DPI, flags, ...).
+        Subclasses add their own configuration.
+        """
+        return repr(self)
+
+    @staticmethod
+    def _hash_file(file_path: Union[Path, str]) -> str:
+        file_hash = hashlib.sha256()
+        with open(file_path, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                file_hash.update(block)
+        return file_hash.hexdigest()
+
+    def _get_cached_number_of_pages(self, file_hash: Optional[str]) -> Optional[int]:
+        if self.text_cache is None:
+            return None
+        number_of_pages = self.text_cache.get(
+            self.text_cache.make_key(self._get_cache_namespace(), file_hash)
+        )
+        return int(number_of_pages) if number_of_pages is not None else None
+
+    def _get_cached_pages(
+        self, file_hash: Optional[str], page_numbers: Iterable[int]
+    ) -> Dict[int, str]:
+        """
+        Returns the cached text of those of page_numbers that are in the cache.
+        """
+        if self.text_cache is None:
+            return {}
+
+        namespace = self._get_cache_namespace()
+        cached_pages = {}
+        for page_number in page_numbers:
+            text = self.text_cache.get(
+                self.text_cache.make_key(namespace, f"{file_hash}:{page_number}")
+            )
+            if text is not None:
+                cached_pages[page_number] = text
+        return cached_pages
+
+    def _set_cached_pages(
+        self, file_hash: Optional[str], number_of_pages: int, texts: Dict[int, str]
+    ) -> None:
+        if self.text_cache is None:
+            return
+
+        namespace = self._get_cache_namespace()
+        for page_number, text in texts.items():
+            self.text_cache.set(
+                self.text_cache.make_key(namespace, f"{file_hash}:{page_number}"), text
+            )
+        self.text_cache.set(
+            self.text_cache.make_key(namespace, file_hash), str(number_of_pages)
+        )
+
+
+def _page_needs_ocr(page: PyMuPDF.Page, ocr_coverage_threshold: float) -> bool:
+    """
+    A page only needs OCR if it has no text layer at all (e.g. a scan) or if images
+    cover at least ocr_coverage_threshold of its area (e.g. a scan with a few searchable
+    annotations). Born-digital pages without images never need OCR.
+    """
+    images = page.get_image_info()
+    if len(images) == 0:
+        return False
+
+    if page.get_text("text").strip() == "":
+        return True
+
+    page_area = page.rect.get_area()
+    image_area = sum(
+        (PyMuPDF.Rect(image["bbox"]) & page.rect).get_area() for image in images
+    )
+    return page_area > 0 and image_area / page_area >= ocr_coverage_threshold
+
+
+def _extract_page_text(
+    page: PyMuPDF.Page, ocr_coverage_threshold: float
+) -> Tuple[str, bool]:
+    """
+    Returns the text of the page and whether OCR was used for it.
+    """
+    if _page_needs_ocr(page, ocr_coverage_threshold):
+        # full=False only OCRs the image regions of the page, the text layer is used as is
+        partial_tp = page.get_textpage_ocr(flags=0, full=False)
+        return page.get_text(textpage=partial_tp, sort=True) + "\n", True
+
+    return page.get_text(sort=True) + "\n", False
+
+
+def _extract_pages(
+    file_path: Union[Path, str],
+    filetype: Optional[str],
+    page_numbers: List[int],
+    ocr_coverage_threshold: float,
+) -> List[Tuple[str, bool]]:
+    """
+    Extracts the text of some pages of a document.
+
+    Module-level (and opening the document itself) so that it can run in a worker process.
+    """
+    with PyMuPDF.open(file_path, filetype=filetype) as doc:
+        return [
+            _extract_page_text(doc[page_number], ocr_coverage_threshold)
+            for page_number in page_numbers
+        ]
+
 
 class PyMuPDFWrapper(AbstractPDFToTextModel):
-    def __init__(self):
-        super().__init__()
+    """
+    :param processes: number of worker processes that extract (or OCR) pages in parallel (None or 1 -> serial)
+    :param pages_per_task: number of consecutive pages a worker process extracts at once
+    :param ocr_coverage_threshold: pages with a text layer are only OCR'd if images cover at least this fraction of the page
+    :param text_cache: see AbstractPDFToTextModel
+    """
+
+    def __init__(
+        self,
+        processes: Optional[int] = None,
+        pages_per_task: int = 4,
+        ocr_coverage_threshold: float = 0.5,
+        text_cache: Optional[SQLiteCache] = None,
+    ):
+        super().__init__(text_cache=text_cache)
+        self.processes = processes
+        self.pages_per_task = pages_per_task
+        self.ocr_coverage_threshold = ocr_coverage_threshold
+        self.stats = {"pages": 0, "ocr_pages": 0, "cached_pages": 0}
+        self._stats_lock = threading.Lock()
+        self._executor = None
+        self._executor_lock = threading.Lock()
 
     def __repr__(self):
         return super().__repr__()
 
-    def get_text(self, file_path: Union[Path, str], filetype: str) -> str:
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.processes)
+            return self._executor
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def _get_cache_namespace(self) -> str:
+        return (
+            f"PyMuPDF-{PyMuPDF.VersionBind}"
+            f"(ocr_coverage_threshold={self.ocr_coverage_threshold})"
+        )
+
+    def get_text(
+        self, file_path: Union[Path, str], filetype: Optional[str] = None
+    ) -> str:
         """
         Extracts text from a PDF file using PY_MU_PDF.
 
@@ -39,17 +207,113 @@ class PyMuPDFWrapper(AbstractPDFToTextModel):
         if it's not searchable it runs TesseractOCR on the PDF and returns the text.
 
         This includes the optimal handling of e.g. a PDF that is generally searchable but has a few pages that are
-        not searchable or has images with text that are not searchable.
+        not searchable or has images with text that are not searchable: only pages without a text layer or
+        mostly covered by images (see ocr_coverage_threshold) go through OCR, all other pages are extracted
+        at native PyMuPDF speed. self.stats counts the pages, the OCR'd pages and the pages
+        that were taken from the text cache.
+
+        If self.processes > 1 the pages are extracted in parallel (and reassembled in page order).
+        Otherwise the extraction holds PYMUPDF_LOCK, i.e. it is safe (but serialised) if get_text
+        is called from several threads at once.
 
         :param file_path:
         :return:
         """
-        with PyMuPDF.open(file_path, filetype=filetype) as doc:
-            text = ""
-            for page in doc:
-                partial_tp = page.get_textpage_ocr(flags=0, full=False)
-                text += page.get_text(textpage=partial_tp, sort=True) + "\n"
-        return text
+        return self.get_texts([file_path], filetype=filetype)[0]
+
+    def get_texts(
+        self, file_paths: List[Union[Path, str]], filetype: Optional[str] = None
+    ) -> List[str]:
+        """
+        Extracts the texts of multiple documents. The pages of all documents are
+        distributed over the worker processes at once, so a directory of PDFs keeps
+        all cores busy even if every single PDF is short.
+
+        Returns the texts in the order of file_paths.
+
+        Pages that are in the text cache are not extracted again (if all pages of a
+        document are cached, the document isn't even opened).
+        """
+        file_hashes, numbers_of_pages, cached_pages_per_document = [], [], []
+        tasks_per_document = []
+        for file_path in file_paths:
+            file_hash = (
+                self._hash_file(file_path) if self.text_cache is not None else None
+            )
+            number_of_pages = self._get_cached_number_of_pages(file_hash)
+            if number_of_pages is None:
+                with PYMUPDF_LOCK, PyMuPDF.open(file_path, filetype=filetype) as doc:
+                    number_of_pages = doc.page_count
+
+            cached_pages = self._get_cached_pages(file_hash, range(number_of_pages))
+            missing_page_numbers = [
+                page_number
+                for page_number in range(number_of_pages)
+                if page_number not in cached_pages
+            ]
+
+            file_hashes.append(file_hash)
+            numbers_of_pages.append(number_of_pages)
+            cached_pages_per_document.append(cached_pages)
+            tasks_per_document.append(
+                [
+                    (
+                        file_path,
+                        filetype,
+                        missing_page_numbers[i : i + self.pages_per_task],
+                        self.ocr_coverage_threshold,
+                    )
+                    for i in range(0, len(missing_page_numbers), self.pages_per_task)
+                ]
+            )
+
+        if self.processes is None or self.processes <= 1:
+            with PYMUPDF_LOCK:
+                pages_per_document = [
+                    [page for task in tasks for page in _extract_pages(*task)]
+                    for tasks in tasks_per_document
+                ]
+        else:
+            executor = self._get_executor()
+            futures_per_document = [
+                [executor.submit(_extract_pages, *task) for task in tasks]
+                for tasks in tasks_per_document
+            ]
+            pages_per_document = [
+                [page for future in futures for page in future.result()]
+                for futures in futures_per_document
+            ]
+
+        texts = []
+        for file_hash, number_of_pages, cached_pages, tasks, pages in zip(
+            file_hashes,
+            numbers_of_pages,
+            cached_pages_per_document,
+            tasks_per_document,
+            pages_per_document,
+        ):
+            missing_page_numbers = [
+                page_number for task in tasks for page_number in task[2]
+            ]
+            extracted_pages = {
+                page_number: text
+                for page_number, (text, _) in zip(missing_page_numbers, pages)
+            }
+            self._set_cached_pages(file_hash, number_of_pages, extracted_pages)
+
+            all_pages = {**cached_pages, **extracted_pages}
+            texts.append(
+                "".join(
+                    all_pages[page_number] for page_number in range(number_of_pages)
+                )
+            )
+
+            with self._stats_lock:
+                self.stats["pages"] += number_of_pages
+                self.stats["ocr_pages"] += sum(ocr_used for _, ocr_used in pages)
+                self.stats["cached_pages"] += len(cached_pages)
+
+        return texts
 
 
 class KleisterCharityWrapper(AbstractPDFToTextModel):
@@ -58,10 +322,32 @@ class KleisterCharityWrapper(AbstractPDFToTextModel):
     that is already provided with the dataset.
     """
 
-    def __init__(self, split: str = "dev-0"):
+    COLUMNS = ["filename", "text_best_cleaned"]  # the only columns we ever use
+
+    def __init__(
+        self, split: str = "dev-0", memory_map_texts: bool = False, chunksize: int = 64
+    ):
+        """
+        :param split: the split of the dataset ("dev-0" or "test-A")
+        :param memory_map_texts: don't keep the texts in memory but stream them into a file in PATH_CACHE
+            and memory-map it, so the memory usage doesn't grow with the size of the split
+        :param chunksize: number of rows that are read at once when streaming in_extended.tsv
+        """
         super().__init__()
         self.split = split
-        self.data = self._load_data()
+        self.memory_map_texts = memory_map_texts
+        self.chunksize = chunksize
+        self.path = KLEISTER_CHARITY_CONSTANTS.split_to_path[self.split]
+        self.text_store_path = PATH_CACHE / f"kleister_charity_{self.split}_texts.bin"
+        self._text_store = None
+
+        if self.memory_map_texts:
+            self.data = self._load_data_memory_mapped()
+        else:
+            self.data = self._load_data()
+            self._text_by_filename = dict(
+                zip(self.data["filename"], self.data["text_best_cleaned"])
+            )
 
     def __repr__(self):
         return super().__repr__()
@@ -69,16 +355,83 @@ class KleisterCharityWrapper(AbstractPDFToTextModel):
     def _load_data(self) -> pd.DataFrame:
         print(f">>>>>>>>>>>>>> LOADING {self.split} SET")
 
-        data = pd.read_csv(
-            KLEISTER_CHARITY_CONSTANTS.split_to_path[self.split], sep="\t"
-        )
+        data = pd.read_csv(self.path, sep="\t", usecols=self.COLUMNS)
         return data
 
+    def iter_chunks(self, chunksize: Optional[int] = None) -> Iterator[pd.DataFrame]:
+        """
+        Streams in_extended.tsv (only the columns we need) in DataFrames of chunksize rows.
+        """
+        yield from pd.read_csv(
+            self.path,
+            sep="\t",
+            usecols=self.COLUMNS,
+            chunksize=chunksize or self.chunksize,
+        )
+
+    def _load_data_memory_mapped(self) -> pd.DataFrame:
+        """
+        Streams the texts into self.text_store_path (utf-8, one after the other) and
+        memory-maps that file. Only the filenames and the byte offsets of the texts
+        are kept in memory.
+
+        The texts are written to a new temporary file that is memory-mapped and only then
+        moved to self.text_store_path, so runs that start at the same time never truncate
+        a file another run has memory-mapped (each keeps its own copy until it exits).
+        """
+        print(f">>>>>>>>>>>>>> LOADING {self.split} SET (memory-mapped)")
+
+        filenames = []
+        offsets = [0]
+        self.text_store_path.parent.mkdir(parents=True, exist_ok=True)
+        fd, temporary_path = tempfile.mkstemp(
+            dir=self.text_store_path.parent,
+            prefix=f"{self.text_store_path.name}.",
+            suffix=".tmp",
+        )
+        try:
+            with open(fd, "wb") as f:
+                for chunk in self.iter_chunks():
+                    for filename, text in zip(
+                        chunk["filename"], chunk["text_best_cleaned"]
+                    ):
+                        # empty texts are read as NaN
+                        encoded_text = (text if isinstance(text, str) else "").encode(
+                            "utf-8"
+                        )
+                        f.write(encoded_text)
+                        filenames.append(filename)
+                        offsets.append(offsets[-1] + len(encoded_text))
+
+            if offsets[-1] > 0:  # an empty file can't be memory-mapped
+                with open(temporary_path, "rb") as f:
+                    self._text_store = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            os.replace(temporary_path, self.text_store_path)
+        except BaseException:
+            os.unlink(temporary_path)
+            raise
+
+        self._offset_by_filename = {
+            filename: (offsets[i], offsets[i + 1])
+            for i, filename in enumerate(filenames)
+        }
+        return pd.DataFrame({"filename": filenames})
+
     def get_text(self, file_path: Union[Path, str]) -> str:
-        text = self.data.loc[
-            self.data["filename"] == file_path, "text_best_cleaned"
-        ].values[0]
-        return text
+        if self.memory_map_texts:
+            start, end = self._offset_by_filename[str(file_path)]
+            if start == end:
+                return ""
+            return self._text_store[start:end].decode("utf-8")
+
+        return self._text_by_filename[str(file_path)]
+
+    def iter_documents(self) -> Iterator[Tuple[str, str]]:
+        """
+        Yields (filename, text) in the order of in_extended.tsv.
+        """
+        for filename in self.data["filename"]:
+            yield filename, self.get_text(filename)
 
 
 class SroieWrapper(AbstractPDFToTextModel):
@@ -87,16 +440,38 @@ class SroieWrapper(AbstractPDFToTextModel):
     that is already provided with the dataset.
     """
 
-    def __init__(self, split: str = "test"):
+    def __init__(
+        self, split: str = "test", use_cache: bool = True, max_workers: int = 8
+    ):
+        """
+        :param split: the split of the dataset (only "test" has OCR boxes)
+        :param use_cache: load the parsed OCR boxes from (and save them to) a binary cache in PATH_CACHE
+        :param max_workers: number of threads that read and parse the OCR box files
+        """
         super().__init__()
         self.split = split
+        self.use_cache = use_cache
+        self.max_workers = max_workers
+        self.cache_path = PATH_CACHE / f"sroie_{self.split}_ocr_boxes.npz"
         self.data = self._load_data()
+        self._text_by_filename = dict(
+            zip(self.data["filename"], self.data["text_sroie_ocr"])
+        )
 
     def __repr__(self):
         return super().__repr__()
 
-    def _load_file_ocr(self, path: Path):
+    @staticmethod
+    def _load_file_ocr(path: Path) -> Tuple[str, str, np.ndarray]:
+        """
+        Parses a single OCR box file where each line looks like
+        x1,y1,x2,y2,x3,y3,x4,y4,text
+
+        Returns the stem of the corresponding input image, the text (one line per box)
+        and the coordinates of the boxes as an int32 array of shape (number of lines, 8).
+        """
         line_list = []
+        box_list = []
 
         with open(path, "r", errors="ignore") as f:
             for line in f.read().splitlines():
@@ -108,53 +483,155 @@ class SroieWrapper(AbstractPDFToTextModel):
                     split_lines[8:]
                 )  # text may contain commas so we have to rejoin accordingly
                 line_list.append(text)
+                box_list.append([int(coordinate) for coordinate in split_lines[:8]])
 
         combined_text = "\n".join([line for line in line_list])
-        path = path.parent.parent / "input" / path.stem.replace("ocr_boxes", "input")
-        path = path.with_suffix(".jpg")
+        boxes = np.array(box_list, dtype=np.int32).reshape(-1, 8)
+        return path.stem.replace("ocr_boxes", "input"), combined_text, boxes
 
-        dataframe = pd.DataFrame(
-            data=[[path, combined_text]], columns=["filename", "text_sroie_ocr"]
-        )
-        return dataframe
+    @staticmethod
+    def _get_fingerprint(paths: List[Path]) -> str:
+        """
+        Changes whenever an OCR box file is added, removed or modified.
+        """
+        fingerprint = hashlib.sha256()
+        for path in paths:
+            stat = path.stat()
+            fingerprint.update(
+                f"{path.name}:{stat.st_mtime_ns}:{stat.st_size}\n".encode()
+            )
+        return fingerprint.hexdigest()
+
+    def _load_cache(self, fingerprint: str) -> Optional[Tuple[np.ndarray, ...]]:
+        if not self.cache_path.is_file():
+            return None
+
+        with np.load(self.cache_path) as cache:
+            if str(cache["fingerprint"]) != fingerprint:
+                print(f">>>>>>>>>>>>>> OCR BOXES CHANGED, REBUILDING {self.cache_path}")
+                return None
+            return cache["stems"], cache["texts"], cache["boxes"], cache["offsets"]
+
+    def _save_cache(
+        self,
+        fingerprint: str,
+        stems: np.ndarray,
+        texts: np.ndarray,
+        boxes: np.ndarray,
+        offsets: np.ndarray,
+    ) -> None:
+        self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.cache_path.with_suffix(".tmp")
+        with open(tmp_path, "wb") as f:
+            np.savez(
+                f,
+                fingerprint=np.array(fingerprint),
+                stems=stems,
+                texts=texts,
+                boxes=boxes,
+                offsets=offsets,
+            )
+        # atomic, so a crash never leaves a half-written cache behind
+        os.replace(tmp_path, self.cache_path)
 
     def _load_data(self) -> pd.DataFrame:
-        print(f">>>>>>>>>>>>>> LOADING {self.split} SET")
-
-        data_path = list(PATH_SROIE_TEST_OCR.iterdir())
+        """
+        Returns a DataFrame with the columns filename (path of the input image),
+        text_sroie_ocr and boxes (int32 array of shape (number of lines, 8) per receipt).
 
-        data = pd.DataFrame(columns=["filename", "text_sroie_ocr"])
-        for path in data_path:
-            row = self._load_file_ocr(path)  # a pandas dataframe with one row
-            data = pd.concat([data, row], ignore_index=True)
+        All boxes are stored in one contiguous array, the boxes of a row are a view into it.
+        """
+        print(f">>>>>>>>>>>>>> LOADING {self.split} SET")
 
+        data_paths = sorted(PATH_SROIE_TEST_OCR.iterdir())
+        fingerprint = self._get_fingerprint(data_paths)
+
+        cached = self._load_cache(fingerprint) if self.use_cache else None
+        if cached is not None:
+            stems, texts, boxes, offsets = cached
+        else:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                parsed_files = list(executor.map(self._load_file_ocr, data_paths))
+
+            stems = np.array([stem for stem, _, _ in parsed_files])
+            texts = np.array([text for _, text, _ in parsed_files])
+            offsets = np.cumsum(
+                [0] + [len(file_boxes) for _, _, file_boxes in parsed_files]
+            )
+            boxes = np.concatenate(
+                [file_boxes for _, _, file_boxes in parsed_files]
+                or [np.empty((0, 8), dtype=np.int32)]
+            )
+            if self.use_cache:
+                self._save_cache(fingerprint, stems, texts, boxes, offsets)
+
+        data = pd.DataFrame(
+            {
+                "filename": [
+                    (PATH_SROIE_TEST / str(stem)).with_suffix(".jpg") for stem in stems
+                ],
+                "text_sroie_ocr": [str(text) for text in texts],
+                # without any files, np.split would still return one (empty) array
+                "boxes": np.split(boxes, offsets[1:-1]) if len(stems) > 0 else [],
+            }
+        )
         return data
 
     def get_text(self, file_path: Union[Path, str]) -> str:
-        text = self.data.loc[
-            self.data["filename"] == file_path, "text_sroie_ocr"
-        ].values[0]
-        return text
+        return self._text_by_filename[Path(file_path)]
+
+    def iter_documents(self) -> Iterator[Tuple[Path, str]]:
+        """
+        Yields (filename, text) in the order in which the files were loaded.
+        """
+        yield from self._text_by_filename.items()
 
 
 class SroieWrapperOwnOCR(PyMuPDFWrapper):
     """
     A wrapper of the SROIE dataset which in turn uses PyMuPDFWrapper
     to extract the text from the JPG files.
+
+    :param ocr_model: optional OCR model (e.g. Tesseract(preprocessor=ImagePreprocessor())) that
+        OCRs the JPG files instead of the built-in OCR of PyMuPDF (it has its own text_cache)
+    :param text_cache: see AbstractPDFToTextModel
     """
 
-    def __init__(self, split: str = "test"):
-        super().__init__()
+    def __init__(
+        self,
+        split: str = "test",
+        processes: Optional[int] = None,
+        ocr_model: Optional[AbstractPDFToTextModel] = None,
+        text_cache: Optional[SQLiteCache] = None,
+    ):
+        super().__init__(processes=processes, text_cache=text_cache)
         self.split = split
+        self.ocr_model = ocr_model
         self.data = self._load_data()
 
     def __repr__(self):
+        if self.ocr_model is not None:
+            return f"{super().__repr__()}_{self.ocr_model}"
         return super().__repr__()
 
     def get_text(self, file_path: Union[Path, str]) -> str:
-        text = super().get_text(file_path, filetype="jpg")
+        text = self.get_texts([file_path])[0]
         return text
 
+    def get_texts(
+        self, file_paths: List[Union[Path, str]], filetype: str = "jpg"
+    ) -> List[str]:
+        if self.ocr_model is not None:
+            return [self.ocr_model.get_text(file_path) for file_path in file_paths]
+        return super().get_texts(file_paths, filetype=filetype)
+
+    def iter_documents(self) -> Iterator[Tuple[Path, str]]:
+        """
+        Yields (filename, text), running the OCR lazily one image at a time.
+        """
+        for file_path in self.data:
+            yield file_path, self.get_text(file_path)
+
     def _load_data(self) -> list:  # just a list of file names (absolute path)
         print(f">>>>>>>>>>>>>> LOADING {self.split} SET")
         data = list(PATH_SROIE_TEST.iterdir())
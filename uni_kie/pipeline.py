@@ -1,5 +1,18 @@
+import asyncio
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from pathlib import Path
-from typing import List, Optional, Union
+from typing import (
+    Any,
+    Callable,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Tuple,
+    Union,
+)
 
 from uni_kie import create_logger
 from uni_kie.constants import (
@@ -8,16 +21,26 @@ from uni_kie.constants import (
     NER_TAGGERS,
     PARSERS,
     PROMPT_VARIANTS,
+    ROUTING_OBJECTIVES,
+    SUBDOCUMENT_ORDERS,
     TOKENIZERS,
 )
+from uni_kie.journal import RunJournal
 from uni_kie.models.baseline import AbstractBaselineModel, BaselineModel
+from uni_kie.models.http import close_async_session
 from uni_kie.models.model import AbstractModel, LargeLanguageModel
+from uni_kie.models.rate_limited import known_number_of_input_tokens
+from uni_kie.models.routing import ModelProfile, select_route
 from uni_kie.parsers.parser import Parser
 from uni_kie.pdf_to_text.pdf_to_text import AbstractPDFToTextModel
 from uni_kie.prompts.prompts import Prompt
+from uni_kie.retrieval import ChunkRetriever
 
 logger = create_logger(__name__)
 
+# put in place of the cut out part(s) of the document with TRUNCATE_MIDDLE and RETRIEVE_CHUNKS
+TRUNCATION_MARKER = "\n[...]\n"
+
 
 class AbstractPipeline:
     def __init__(
@@ -26,18 +49,113 @@ class AbstractPipeline:
         model: AbstractModel,
         pdf_to_text_model: AbstractPDFToTextModel,
         parser: Parser,
+        max_workers: int = 1,
     ):
         self.keys = keys
         self.model = model
         self.pdf_to_text_model = pdf_to_text_model
         self.parser = parser
+        self.max_workers = max_workers
 
-    def predict(self, file_path: Union[str, Path]) -> dict:
-        raise NotImplementedError
+    def predict(self, file_path: Union[str, Path]) -> Union[dict, str]:
+        return self.predict_with_model_output(file_path)[1]
 
-    def predict_directory(self, directory_path: Union[str, Path]) -> List[dict]:
+    def predict_with_model_output(
+        self, file_path: Union[str, Path]
+    ) -> Tuple[Any, Union[dict, str]]:
+        """
+        Returns the raw model output and the parsed output (i.e. the prediction).
+        """
         raise NotImplementedError
 
+    def _map(
+        self,
+        function: Callable,
+        file_paths: Iterable[Union[str, Path]],
+        max_workers: Optional[int] = None,
+    ) -> Iterator:
+        """
+        Applies function to every file_path with a pool of worker threads and yields
+        the results in the order of file_paths.
+        """
+        max_workers = max_workers or self.max_workers
+        if max_workers == 1:
+            yield from map(function, file_paths)
+            return
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            yield from executor.map(function, file_paths)
+
+    def predict_many(
+        self,
+        file_paths: Iterable[Union[str, Path]],
+        max_workers: Optional[int] = None,
+    ) -> Iterator[Union[dict, str]]:
+        """
+        Predicts multiple documents with a pool of worker threads.
+
+        The predictions are yielded in the order of file_paths (not in the order in which
+        they finish) so that e.g. the lines of a Kleister Charity TSV stay aligned with in_extended.tsv.
+
+        :param file_paths: the documents to predict
+        :param max_workers: number of documents that are predicted concurrently (defaults to self.max_workers)
+        """
+        yield from self._map(self.predict, file_paths, max_workers=max_workers)
+
+    def predict_journaled(
+        self,
+        file_paths: List[Union[str, Path]],
+        journal: RunJournal,
+        retry_failed_only: bool = False,
+        max_workers: Optional[int] = None,
+    ) -> List[Optional[Union[dict, str]]]:
+        """
+        Like predict_many but records every finished (or failed) document in the journal
+        and skips the documents the journal already contains as done. An error in one
+        document doesn't stop the run.
+
+        Returns the predictions of *all* file_paths in their order (None for documents
+        that failed or were skipped).
+
+        :param retry_failed_only: only predict the documents whose last attempt failed
+        """
+        pending = journal.get_pending(file_paths, retry_failed_only=retry_failed_only)
+        logger.info(
+            f"{len(file_paths) - len(pending)} documents already done, predicting {len(pending)}"
+        )
+
+        def predict_and_record(file_path: Union[str, Path]) -> None:
+            try:
+                model_output, prediction = self.predict_with_model_output(file_path)
+            except Exception as e:
+                logger.exception(f"Prediction failed for {file_path}")
+                journal.record_failed(file_path, e)
+            else:
+                journal.record_done(file_path, model_output, prediction)
+
+        for i, _ in enumerate(
+            self._map(predict_and_record, pending, max_workers=max_workers)
+        ):
+            print(f"Progress: {i+1}/{len(pending)}")
+
+        if len(journal.failed) > 0:
+            logger.info(
+                f"{len(journal.failed)} documents failed, see {journal.path} (retry with retry_failed_only=True)"
+            )
+
+        return [journal.get_prediction(file_path) for file_path in file_paths]
+
+    def predict_directory(
+        self, directory_path: Union[str, Path], max_workers: Optional[int] = None
+    ) -> Union[List[dict], List[str]]:
+        """
+        Predicts all files in a directory (sorted by filename).
+        """
+        file_paths = sorted(
+            path for path in Path(directory_path).iterdir() if path.is_file()
+        )
+        return list(self.predict_many(file_paths, max_workers=max_workers))
+
 
 class LLMPipeline(AbstractPipeline):
     """
@@ -58,6 +176,14 @@ class LLMPipeline(AbstractPipeline):
         long_document_handling_variant: LONG_DOCUMENT_HANDLING_VARIANTS,
         parser: Parser,
         shots: Optional[List[str]],
+        max_workers: int = 1,
+        max_subdocument_workers: int = 1,
+        early_exit: bool = False,
+        subdocument_order: SUBDOCUMENT_ORDERS = SUBDOCUMENT_ORDERS.IN_ORDER,
+        shrink_prompts: bool = False,
+        retriever: Optional[ChunkRetriever] = None,
+        retrieval_chunk_length: int = 128,
+        retrieval_top_k: int = 2,
     ):
         """
         Initializes the inference pipeline.
@@ -68,22 +194,53 @@ class LLMPipeline(AbstractPipeline):
         :param prompt_variant: prompt variant to be used
         :param long_document_handling_variant: how to handle long documents
         :param parser: parser to be used
+        :param max_workers: number of documents that are predicted concurrently in predict_many
+        :param max_subdocument_workers: number of subdocuments of a single document that are sent to the model concurrently
+        :param early_exit: parse the output of every subdocument as it arrives and stop sending further subdocuments
+            to the model once every key has a value (self.stats counts the saved completions)
+        :param subdocument_order: order in which the subdocuments are sent to the model if early_exit is used
+        :param shrink_prompts: prompt every subdocument only for the keys that the subdocuments before it left null
+            (implies early_exit, the partial outputs are merged by get_parsed_output)
+        :param retriever: scores the chunks of long documents with RETRIEVE_CHUNKS (defaults to a ChunkRetriever
+            without synonyms, use e.g. ChunkRetriever(synonyms=KLEISTER_CHARITY_CONSTANTS.SYNONYMS))
+        :param retrieval_chunk_length: number of tokens of a chunk with RETRIEVE_CHUNKS
+        :param retrieval_top_k: maximum number of chunks per key with RETRIEVE_CHUNKS
         """
         super().__init__(
-            keys=keys, model=model, pdf_to_text_model=pdf_to_text_model, parser=parser
+            keys=keys,
+            model=model,
+            pdf_to_text_model=pdf_to_text_model,
+            parser=parser,
+            max_workers=max_workers,
         )
         self.prompt_variant = prompt_variant(prompt_keys=keys, shots=shots)
         self.long_document_handling_variant = long_document_handling_variant
+        self.max_subdocument_workers = max_subdocument_workers
+        self.early_exit = early_exit
+        self.subdocument_order = subdocument_order
+        self.shrink_prompts = shrink_prompts
+        self.retriever = retriever or ChunkRetriever()
+        self.retrieval_chunk_length = retrieval_chunk_length
+        self.retrieval_top_k = retrieval_top_k
+        self.stats = {"completions": 0, "saved_completions": 0}
+        self._stats_lock = threading.Lock()
 
     def __repr__(self):
         return f"LLMPipeline(prompt_variant={self.prompt_variant}, model={self.model}, parser={self.parser}, shots={self.prompt_variant.shots})"
 
     def get_parsed_output(self, model_output: List[str], prompt_keys: List[str]) -> str:
+        """
+        Parses and merges the outputs of all subdocuments: keys that were only found in one
+        subdocument (e.g. with shrink_prompts) are taken as they are, keys with different values
+        in several subdocuments are unified by majority (earlier pages win ties).
+        """
         if (
             len(model_output) != 1
         ):  # doc was too long and subdoc handling chosen -> we have multiple model_outputs (one per subdoc)
             parsed_model_output = [
-                PARSERS.DICT_PARSER.parse_model_output(model_output, prompt_keys)
+                PARSERS.DICT_PARSER.parse_model_output(
+                    model_output, prompt_keys, use_gold_keys=False
+                )
                 for model_output in model_output
             ]
 
@@ -117,7 +274,7 @@ class LLMPipeline(AbstractPipeline):
                     logger.info(f"Unified value {unified_dict[key]}")
 
             if isinstance(self.parser, PARSERS.DICT_PARSER):
-                return unified_dict
+                return PARSERS.DICT_PARSER.to_gold_keys(unified_dict, prompt_keys)
             elif isinstance(self.parser, PARSERS.KLEISTER_CHARITY_PARSER):
                 return self.parser._dict_to_kleister_charity(unified_dict, prompt_keys)
 
@@ -125,160 +282,699 @@ class LLMPipeline(AbstractPipeline):
             logger.info("No subdocs necessary")
             return self.parser.parse_model_output(model_output[0], prompt_keys)
 
-    def get_model_output(self, model_input: str) -> List[str]:
+    def predict_subdocuments(
+        self,
+        subdocuments: List[str],
+        model: Optional[LargeLanguageModel] = None,
+        numbers_of_tokens: Optional[List[int]] = None,
+    ) -> List[str]:
+        """
+        Sends the subdocuments of a single document to the model (defaults to self.model), at most
+        self.max_subdocument_workers at the same time.
+
+        The predictions are returned in the order of the subdocuments because
+        get_parsed_output prefers values from earlier pages.
+
+        :param numbers_of_tokens: the number of tokens of every model input if they are known (see _predict)
+        """
+        model = model or self.model
+        numbers_of_tokens = numbers_of_tokens or [None] * len(subdocuments)
+        max_workers = min(self.max_subdocument_workers, len(subdocuments))
+        if max_workers <= 1:
+            return [
+                self._predict(model, subdocument, number_of_tokens)
+                for subdocument, number_of_tokens in zip(
+                    subdocuments, numbers_of_tokens
+                )
+            ]
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return list(
+                executor.map(
+                    self._predict,
+                    [model] * len(subdocuments),
+                    subdocuments,
+                    numbers_of_tokens,
+                )
+            )
+
+    @staticmethod
+    def _predict(
+        model: LargeLanguageModel, model_input: str, number_of_tokens: Optional[int]
+    ) -> str:
+        """
+        model.predict(model_input), passing down the number of tokens of the model input (if known)
+        so that a RateLimitedLargeLanguageModel doesn't tokenize it again.
+        """
+        with known_number_of_input_tokens(number_of_tokens):
+            return model.predict(model_input)
+
+    @staticmethod
+    async def _apredict(
+        model: LargeLanguageModel, model_input: str, number_of_tokens: Optional[int]
+    ) -> str:
+        """
+        Coroutine version of _predict.
+        """
+        with known_number_of_input_tokens(number_of_tokens):
+            return await model.apredict(model_input)
+
+    def _get_subdocument_order(self, number_of_subdocuments: int) -> List[int]:
+        if self.subdocument_order == SUBDOCUMENT_ORDERS.FIRST_AND_LAST_FIRST:
+            order = []
+            for i in range((number_of_subdocuments + 1) // 2):
+                order.append(i)
+                if number_of_subdocuments - 1 - i != i:
+                    order.append(number_of_subdocuments - 1 - i)
+            return order
+        return list(range(number_of_subdocuments))
+
+    def _get_missing_keys(self, model_outputs: Iterable[str]) -> List[str]:
+        """
+        The keys (in the order of self.keys) that don't have a (non-null) value in any of the model outputs.
+        """
+        found_keys = set()
+        for model_output in model_outputs:
+            found_keys.update(
+                PARSERS.DICT_PARSER.parse_model_output(
+                    model_output, self.keys, use_gold_keys=False
+                )
+            )
+        return [key for key in self.keys if key not in found_keys]
+
+    def _get_subdocument_prompt_keys(
+        self, model_outputs: Iterable[str]
+    ) -> Optional[List[str]]:
+        """
+        The keys the next subdocument is prompted for: all keys (None) or, if
+        self.shrink_prompts, only the keys that the earlier subdocuments left null.
+        """
+        if not self.shrink_prompts:
+            return None
+        return self._get_missing_keys(model_outputs)
+
+    def _to_full_model_output(
+        self, model_output: Optional[str], prompt_keys: Optional[List[str]]
+    ) -> Optional[str]:
+        """
+        The prompt ends with the first key it asks for, so the output of a shrunk prompt starts with
+        the value of its first key. Prepending that key makes it parsable with all keys (just like
+        the output of a prompt for all keys), so it can be merged by get_parsed_output.
+        """
+        if model_output is None or not prompt_keys or prompt_keys[0] == self.keys[0]:
+            return model_output
+        return f"{prompt_keys[0]}:{model_output}"
+
+    def _record_completions(self, completions: int, subdocuments: int) -> None:
+        with self._stats_lock:
+            self.stats["completions"] += completions
+            self.stats["saved_completions"] += subdocuments - completions
+        if completions < subdocuments:
+            logger.info(
+                f"All keys found after {completions} of {subdocuments} subdocuments"
+            )
+
+    def predict_subdocuments_incrementally(
+        self,
+        subdocuments: List[str],
+        model: Optional[LargeLanguageModel] = None,
+        numbers_of_tokens: Optional[List[int]] = None,
+    ) -> List[str]:
+        """
+        Sends the subdocuments (without prompt) to the model (defaults to self.model) in self.subdocument_order, at most
+        self.max_subdocument_workers at the same time, parses every output as it arrives and
+        stops sending further subdocuments once every key has a value.
+
+        If self.shrink_prompts, every subdocument is only prompted for the keys that are still missing
+        when it is sent.
+
+        Returns the outputs of the subdocuments that were sent, in the order of the subdocuments.
+
+        :param numbers_of_tokens: the number of tokens of the model input (with the prompt for all keys)
+            of every subdocument if they are known (see _predict)
+        """
+        model = model or self.model
+        numbers_of_tokens = numbers_of_tokens or [None] * len(subdocuments)
+        order = self._get_subdocument_order(len(subdocuments))
+        model_outputs = {}
+        with ThreadPoolExecutor(
+            max_workers=max(1, self.max_subdocument_workers)
+        ) as executor:
+            in_flight = {}
+            while order or in_flight:
+                while order and len(in_flight) < max(1, self.max_subdocument_workers):
+                    i = order.pop(0)
+                    prompt_keys = self._get_subdocument_prompt_keys(
+                        model_outputs.values()
+                    )
+                    model_input = self.prompt_variant.get_model_input(
+                        subdocuments[i], prompt_keys=prompt_keys
+                    )
+                    future = executor.submit(
+                        self._predict, model, model_input, numbers_of_tokens[i]
+                    )
+                    in_flight[future] = (i, prompt_keys)
+
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    i, prompt_keys = in_flight.pop(future)
+                    model_outputs[i] = self._to_full_model_output(
+                        future.result(), prompt_keys
+                    )
+
+                if len(self._get_missing_keys(model_outputs.values())) == 0:
+                    order = []  # the subdocuments in flight are still collected
+
+        self._record_completions(len(model_outputs), len(subdocuments))
+        return [model_outputs[i] for i in sorted(model_outputs)]
+
+    async def apredict_subdocuments_incrementally(
+        self,
+        subdocuments: List[str],
+        model: Optional[LargeLanguageModel] = None,
+        numbers_of_tokens: Optional[List[int]] = None,
+    ) -> List[str]:
+        """
+        Coroutine version of predict_subdocuments_incrementally.
+        """
+        model = model or self.model
+        numbers_of_tokens = numbers_of_tokens or [None] * len(subdocuments)
+        order = self._get_subdocument_order(len(subdocuments))
+        model_outputs = {}
+        in_flight = {}
+        while order or in_flight:
+            while order and len(in_flight) < max(1, self.max_subdocument_workers):
+                i = order.pop(0)
+                prompt_keys = self._get_subdocument_prompt_keys(model_outputs.values())
+                model_input = self.prompt_variant.get_model_input(
+                    subdocuments[i], prompt_keys=prompt_keys
+                )
+                task = asyncio.ensure_future(
+                    self._apredict(model, model_input, numbers_of_tokens[i])
+                )
+                in_flight[task] = (i, prompt_keys)
+
+            done, _ = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                i, prompt_keys = in_flight.pop(task)
+                model_outputs[i] = self._to_full_model_output(
+                    task.result(), prompt_keys
+                )
+
+            if len(self._get_missing_keys(model_outputs.values())) == 0:
+                order = []
+
+        self._record_completions(len(model_outputs), len(subdocuments))
+        return [model_outputs[i] for i in sorted(model_outputs)]
+
+    @staticmethod
+    def _get_text_span(
+        text: str, offset_mapping: List[Tuple[int, int]], start: int, end: int
+    ) -> str:
+        """
+        Returns the part of text that corresponds to the tokens [start, end) using
+        the character offsets of the tokens (i.e. without decoding the tokens).
+
+        Whitespace between two tokens is kept with the earlier token.
         """
-        Gets the model's output for a given model_input.
+        start_char = offset_mapping[start][0]
+        end_char = offset_mapping[end][0] if end < len(offset_mapping) else len(text)
+        return text[start_char:end_char]
+
+    def get_model_inputs(self, text: str) -> List[str]:
+        """
+        Creates the model input(s) (prompt, shots and document) for a given document text,
+        one per subdocument (see get_subdocuments).
+        """
+        return [
+            self.prompt_variant.get_model_input(subdocument)
+            for subdocument in self.get_subdocuments(text)
+        ]
+
+    def get_subdocuments(
+        self, text: str, tokenized_document: Optional[Mapping[str, List]] = None
+    ) -> List[str]:
+        """
+        Returns the part(s) of the document text that are sent to the model (without prompt and shots).
 
         Includes handling of documents that are too long for the model
-        in which case multiple model outputs may be returned.
+        in which case multiple subdocuments may be returned.
+
+        The document is tokenized exactly once. The number of tokens of the model input is
+        computed from the pre-tokenized segments of the prompt variant (shots, start/end of
+        document and prompt text) and subdocuments are cut out of the text by character offsets.
+
+        :param tokenized_document: the output of tokenize(text), if the text was already tokenized
+        """
+        return [
+            subdocument
+            for subdocument, _ in self._get_subdocuments_with_number_of_tokens(
+                text, tokenized_document
+            )
+        ]
+
+    def _get_subdocuments_with_number_of_tokens(
+        self, text: str, tokenized_document: Optional[Mapping[str, List]] = None
+    ) -> List[Tuple[str, int]]:
+        """
+        get_subdocuments together with the number of tokens of every subdocument, which
+        follows from the tokenization of the document (i.e. without tokenizing them again).
+        It's an upper bound for subdocuments with a TRUNCATION_MARKER, whose tokens may
+        merge with the tokens around it.
         """
-        tokenized_model_input = TOKENIZERS.GPT2_TOKENIZER_FAST(model_input)
-        number_of_tokens_model_input = len(tokenized_model_input["input_ids"])
+        if tokenized_document is None:
+            tokenized_document = self.tokenize(text)
+        document_input_ids = tokenized_document["input_ids"]
+        offset_mapping = tokenized_document["offset_mapping"]
+        number_of_tokens_model_input = (
+            self.prompt_variant.get_model_input_number_of_tokens(
+                len(document_input_ids)
+            )
+        )
+
         if number_of_tokens_model_input > self.model.max_input_tokens:
             logger.info(
                 f"Document is too long for the model. Number of tokens: {number_of_tokens_model_input}. Max number of tokens: {self.model.max_input_tokens}."
             )
+            model_input_shots_length = (
+                self.prompt_variant.model_input_shots_number_of_tokens
+            )
+
+            if model_input_shots_length > 0.5 * self.model.max_input_tokens:
+                logger.info(
+                    f"model_input_shots_length is more than half of the model's max_input_tokens"
+                )
+
+            # the number of tokens of the document that fit next to the shots, start/end of document and prompt
+            subdocument_length = (
+                self.model.max_input_tokens
+                - self.prompt_variant.get_model_input_number_of_tokens(0)
+                - 1
+                - 5  # subtracting 5 to make sure that the model input is not too long
+            )
+            if subdocument_length <= 0:
+                raise ValueError(
+                    f"The shots and the prompt alone don't fit into the {self.model.max_input_tokens} input tokens of the model."
+                )
+
             if (
+                self.long_document_handling_variant
+                == LONG_DOCUMENT_HANDLING_VARIANTS.TRUNCATE_END
+            ):  # keep the beginning of the document
+                logger.info(
+                    f"Truncated document to its first {subdocument_length} tokens."
+                )
+                return [
+                    (
+                        self._get_text_span(
+                            text, offset_mapping, 0, subdocument_length
+                        ),
+                        subdocument_length,
+                    )
+                ]
+
+            elif (
+                self.long_document_handling_variant
+                == LONG_DOCUMENT_HANDLING_VARIANTS.TRUNCATE_START
+            ):  # keep the end of the document
+                logger.info(
+                    f"Truncated document to its last {subdocument_length} tokens."
+                )
+                return [
+                    (
+                        self._get_text_span(
+                            text,
+                            offset_mapping,
+                            len(document_input_ids) - subdocument_length,
+                            len(document_input_ids),
+                        ),
+                        subdocument_length,
+                    )
+                ]
+
+            elif (
                 self.long_document_handling_variant
                 == LONG_DOCUMENT_HANDLING_VARIANTS.TRUNCATE_MIDDLE
-            ):
-                raise NotImplementedError(
-                    "This doesn't handle prompt and shots correctly yet."
+            ):  # keep the beginning and the end of the document
+                remaining_length = subdocument_length - len(
+                    TOKENIZERS.GPT2_TOKENIZER_FAST(TRUNCATION_MARKER)["input_ids"]
+                )
+                start_length = (remaining_length + 1) // 2
+                end_length = remaining_length - start_length
+                logger.info(
+                    f"Truncated document to its first {start_length} and last {end_length} tokens."
+                )
+                return [
+                    (
+                        self._get_text_span(text, offset_mapping, 0, start_length)
+                        + TRUNCATION_MARKER
+                        + self._get_text_span(
+                            text,
+                            offset_mapping,
+                            len(document_input_ids) - end_length,
+                            len(document_input_ids),
+                        ),
+                        subdocument_length,
+                    )
+                ]
+
+            elif (
+                self.long_document_handling_variant
+                == LONG_DOCUMENT_HANDLING_VARIANTS.RETRIEVE_CHUNKS
+            ):  # keep the chunks that are most relevant for the keys
+                chunk_starts = range(
+                    0, len(document_input_ids), self.retrieval_chunk_length
                 )
-                # subtracting 5 to make sure that the model input is not too long
-                truncated_tokenized_model_input = (
-                    tokenized_model_input["input_ids"][
-                        : self.model.max_input_tokens // 2 - 5
-                    ]
-                    + tokenized_model_input["input_ids"][
-                        -self.model.max_input_tokens // 2 - 5 :
-                    ]
+                chunks = [
+                    self._get_text_span(
+                        text, offset_mapping, i, i + self.retrieval_chunk_length
+                    )
+                    for i in chunk_starts
+                ]
+                # every chunk may need a TRUNCATION_MARKER in front of it
+                truncation_marker_length = len(
+                    TOKENIZERS.GPT2_TOKENIZER_FAST(TRUNCATION_MARKER)["input_ids"]
                 )
-                truncated_model_input = TOKENIZERS.GPT2_TOKENIZER_FAST.decode(
-                    truncated_tokenized_model_input
+                if (
+                    self.retrieval_chunk_length + truncation_marker_length
+                    > subdocument_length
+                ):  # not a single chunk would be selected, i.e. the document would be empty
+                    raise ValueError(
+                        f"A chunk of retrieval_chunk_length={self.retrieval_chunk_length} tokens doesn't fit into the {subdocument_length} tokens that are left for the document next to the shots and the prompt."
+                    )
+                chunk_costs = [
+                    min(self.retrieval_chunk_length, len(document_input_ids) - i)
+                    + truncation_marker_length
+                    for i in chunk_starts
+                ]
+                selected = self.retriever.select(
+                    chunks,
+                    chunk_costs,
+                    self.keys,
+                    self.retrieval_top_k,
+                    subdocument_length,
                 )
-                return [self.model.predict(truncated_model_input)]
+
+                # adjacent chunks are put together as they are, gaps are marked
+                subdocument = ""
+                for j, chunk_index in enumerate(selected):
+                    if j > 0 and chunk_index != selected[j - 1] + 1:
+                        subdocument += TRUNCATION_MARKER
+                    subdocument += chunks[chunk_index]
+                # an upper bound, the first chunk and adjacent chunks have no TRUNCATION_MARKER in front of them
+                return [(subdocument, sum(chunk_costs[i] for i in selected))]
 
             elif (
                 self.long_document_handling_variant
                 == LONG_DOCUMENT_HANDLING_VARIANTS.SPLIT_TO_SUBDOCUMENTS
             ):
-                prompt_length = self.prompt_variant.prompt_number_of_tokens
-                model_input_shots_length = (
-                    self.prompt_variant.model_input_shots_number_of_tokens
+                overlap_no_tokens = (
+                    20  # how many tokens to overlap between subdocuments
                 )
+                if subdocument_length <= overlap_no_tokens:
+                    raise ValueError(
+                        f"The shots and the prompt alone don't fit into the {self.model.max_input_tokens} input tokens of the model (only {subdocument_length} tokens are left for a subdocument, but subdocuments overlap by {overlap_no_tokens} tokens)."
+                    )
 
-                if model_input_shots_length > 0.5 * self.model.max_input_tokens:
-                    logger.info(
-                        f"model_input_shots_length is more than half of the model's max_input_tokens"
+                subdocuments = [
+                    (
+                        self._get_text_span(
+                            text, offset_mapping, i, i + subdocument_length
+                        ),
+                        min(subdocument_length, len(document_input_ids) - i),
                     )
+                    for i in range(
+                        0,
+                        len(document_input_ids),
+                        subdocument_length - overlap_no_tokens,
+                    )
+                ]
 
-                overlap_no_tokens = (
-                    20  # how many tokens to overlap between subdocuments
-                )
+                logger.info(f"Split document into {len(subdocuments)} subdocuments.")
+                # for i, subdocument in enumerate(subdocuments):
+                #     logger.info(f"Subdocument {i}:\n{subdocument}")
 
-                # cut off the prompt from the model input
-                model_input_without_prompt_and_shots_input_ids = tokenized_model_input[
-                    "input_ids"
-                ][:-prompt_length]
+                return subdocuments
 
-                # cut off the model_input_shots (they are in front of the model input)
-                model_input_without_prompt_and_shots_input_ids = (
-                    model_input_without_prompt_and_shots_input_ids[
-                        model_input_shots_length:
-                    ]
-                )
+            raise NotImplementedError(
+                f"{self.long_document_handling_variant} is not implemented yet."
+            )
 
-                # cut off the self.prompt_variant.start_of_document and self.prompt_variant.end_of_document
-                if not (
-                    self.prompt_variant.start_of_document_number_of_tokens == 0
-                    and self.prompt_variant.end_of_document_number_of_tokens == 0
-                ):
-                    model_input_without_prompt_and_shots_input_ids = (
-                        model_input_without_prompt_and_shots_input_ids[
-                            self.prompt_variant.start_of_document_number_of_tokens :
-                        ]
-                    )
-                    if (
-                        self.prompt_variant.end_of_document_number_of_tokens > 0
-                    ):  # if it is 0 this would yield an empty list
-                        model_input_without_prompt_and_shots_input_ids = (
-                            model_input_without_prompt_and_shots_input_ids[
-                                : -self.prompt_variant.end_of_document_number_of_tokens
-                            ]
-                        )
-
-                subdocuments = []
-                for i in range(
-                    0,
-                    number_of_tokens_model_input,
-                    self.model.max_input_tokens
-                    - overlap_no_tokens
-                    - prompt_length
-                    - model_input_shots_length
-                    - self.prompt_variant.start_of_document_number_of_tokens
-                    - 1
-                    - self.prompt_variant.end_of_document_number_of_tokens
-                    - 5,  # subtracting 5 to make sure that the model input is not too long
-                ):
-                    subdocument = model_input_without_prompt_and_shots_input_ids[
-                        i : i
-                        + self.model.max_input_tokens
-                        - prompt_length
-                        - model_input_shots_length
-                        - self.prompt_variant.start_of_document_number_of_tokens
-                        - 1
-                        - self.prompt_variant.end_of_document_number_of_tokens
-                        - 5  # subtracting 5 to make sure that the model input is not too long
-                    ]
-                    subdocuments.append(subdocument)
+        return [(text, len(document_input_ids))]
 
-                subdocuments = [
-                    TOKENIZERS.GPT2_TOKENIZER_FAST.decode(subdocument)
-                    for subdocument in subdocuments
-                    if len(subdocument)
-                    > 0  # it can happen that the last subdocument is empty
-                ]
+    @staticmethod
+    def tokenize(text: str) -> Mapping[str, List]:
+        """
+        Tokenizes a document text, including the character offsets of the tokens (see _get_text_span).
+        """
+        return TOKENIZERS.GPT2_TOKENIZER_FAST(text, return_offsets_mapping=True)
 
-                subdocuments_with_prompt_and_shots = [
-                    self.prompt_variant.get_model_input(subdocument)
-                    for subdocument in subdocuments
-                ]
+    def get_subdocuments_and_model(
+        self, text: str
+    ) -> Tuple[List[str], LargeLanguageModel]:
+        """
+        Returns the subdocuments of a document text (see get_subdocuments) and the model they are sent to.
+        """
+        subdocuments, _, model = self._get_subdocuments_and_model(text)
+        return subdocuments, model
 
-                logger.info(
-                    f"Split document into {len(subdocuments_with_prompt_and_shots)} subdocuments."
-                )
-                # for i, subdocument in enumerate(subdocuments_with_prompt_and_shots):
-                #     logger.info(f"Subdocument {i}:\n{subdocument}")
+    def _get_subdocuments_and_model(
+        self, text: str
+    ) -> Tuple[List[str], List[int], LargeLanguageModel]:
+        """
+        get_subdocuments_and_model together with the number of tokens of the model input
+        (with the prompt for all keys) of every subdocument.
+        """
+        subdocuments, numbers_of_tokens = self._to_model_input_numbers_of_tokens(
+            self._get_subdocuments_with_number_of_tokens(text)
+        )
+        return subdocuments, numbers_of_tokens, self.model
 
-                subdocuments_predictions = [
-                    self.model.predict(subdocument)
-                    for subdocument in subdocuments_with_prompt_and_shots
-                ]
-                return subdocuments_predictions
+    def _to_model_input_numbers_of_tokens(
+        self, subdocuments: List[Tuple[str, int]]
+    ) -> Tuple[List[str], List[int]]:
+        """
+        Separates the subdocuments from their number of tokens and turns those into the number of tokens
+        of their model inputs (with the prompt for all keys).
+        """
+        return [subdocument for subdocument, _ in subdocuments], [
+            self.prompt_variant.get_model_input_number_of_tokens(number_of_tokens)
+            for _, number_of_tokens in subdocuments
+        ]
 
-        else:
-            prediction = self.model.predict(model_input)
+    def get_model_output(self, text: str) -> List[str]:
+        """
+        Gets the model's output for a given document text (one output per subdocument,
+        see get_subdocuments, or fewer with early_exit or shrink_prompts).
+        """
+        subdocuments, numbers_of_tokens, model = self._get_subdocuments_and_model(text)
+        if len(subdocuments) == 1:
+            prediction = self._predict(
+                model,
+                self.prompt_variant.get_model_input(subdocuments[0]),
+                numbers_of_tokens[0],
+            )
             logger.info(f"Raw prediction for document: {prediction}")
+            self._record_completions(1, 1)
             return [prediction]
 
-    def predict(self, file_path: Union[str, Path]) -> Union[dict, str]:
+        if self.early_exit or self.shrink_prompts:
+            return self.predict_subdocuments_incrementally(
+                subdocuments, model, numbers_of_tokens
+            )
+
+        self._record_completions(len(subdocuments), len(subdocuments))
+        return self.predict_subdocuments(
+            [
+                self.prompt_variant.get_model_input(subdocument)
+                for subdocument in subdocuments
+            ],
+            model,
+            numbers_of_tokens,
+        )
+
+    def predict_with_model_output(
+        self, file_path: Union[str, Path]
+    ) -> Tuple[List[str], Union[dict, str]]:
         """
-        Return type depends on the parser.
+        Type of the parsed output depends on the parser.
 
         DictParser -> dict
         KleisterCharityParser -> str
         """
         text = self.pdf_to_text_model.get_text(file_path)
-        model_input = self.prompt_variant.get_model_input(text)
-        model_output = self.get_model_output(model_input)
+        model_output = self.get_model_output(text)
         parsed_output = self.get_parsed_output(model_output, self.keys)
-        return parsed_output
+        return model_output, parsed_output
 
-    def predict_directory(
-        self, directory_path: Union[str, Path]
-    ) -> Union[List[dict], List[str]]:
-        pass
+    async def aget_model_output(self, text: str) -> List[str]:
+        """
+        Coroutine version of get_model_output: all subdocuments of the document are
+        in flight at the same time (unless early_exit or shrink_prompts is used), the outputs
+        are returned in the order of the subdocuments.
+        """
+        subdocuments, numbers_of_tokens, model = self._get_subdocuments_and_model(text)
+        if (self.early_exit or self.shrink_prompts) and len(subdocuments) > 1:
+            return await self.apredict_subdocuments_incrementally(
+                subdocuments, model, numbers_of_tokens
+            )
+
+        model_inputs = [
+            self.prompt_variant.get_model_input(subdocument)
+            for subdocument in subdocuments
+        ]
+        model_output = list(
+            await asyncio.gather(
+                *(
+                    self._apredict(model, model_input, number_of_tokens)
+                    for model_input, number_of_tokens in zip(
+                        model_inputs, numbers_of_tokens
+                    )
+                )
+            )
+        )
+        self._record_completions(len(model_inputs), len(model_inputs))
+        if len(model_output) == 1:
+            logger.info(f"Raw prediction for document: {model_output[0]}")
+        return model_output
+
+    async def apredict_with_model_output(
+        self, file_path: Union[str, Path]
+    ) -> Tuple[List[str], Union[dict, str]]:
+        """
+        Coroutine version of predict_with_model_output.
+        """
+        # text extraction (and OCR) is blocking, so it runs in the default thread pool of the loop
+        text = await asyncio.get_running_loop().run_in_executor(
+            None, self.pdf_to_text_model.get_text, file_path
+        )
+        model_output = await self.aget_model_output(text)
+        parsed_output = self.get_parsed_output(model_output, self.keys)
+        return model_output, parsed_output
+
+    async def apredict_many(
+        self,
+        file_paths: Iterable[Union[str, Path]],
+        max_concurrent_documents: int = 256,
+    ) -> List[Union[dict, str]]:
+        """
+        Coroutine version of predict_many: up to max_concurrent_documents documents (and all
+        of their subdocuments) are in flight on the running event loop, without a thread per request.
+
+        Returns the predictions in the order of file_paths.
+        """
+        semaphore = asyncio.Semaphore(max_concurrent_documents)
+
+        async def apredict(file_path: Union[str, Path]) -> Union[dict, str]:
+            async with semaphore:
+                return (await self.apredict_with_model_output(file_path))[1]
+
+        return list(await asyncio.gather(*(apredict(path) for path in file_paths)))
+
+    def predict_many_async(
+        self,
+        file_paths: Iterable[Union[str, Path]],
+        max_concurrent_documents: int = 256,
+    ) -> List[Union[dict, str]]:
+        """
+        Runs apredict_many on a new event loop (the blocking entry point of the asyncio path).
+        """
+
+        async def run() -> List[Union[dict, str]]:
+            try:
+                return await self.apredict_many(
+                    file_paths, max_concurrent_documents=max_concurrent_documents
+                )
+            finally:
+                await close_async_session()
+
+        return asyncio.run(run())
+
+
+class RouterLLMPipeline(LLMPipeline):
+    """
+    LLMPipeline with several models that sends every document to the model that suits its length:
+    of the models whose max_input_tokens fit the whole document (with prompt and shots),
+    the one with the lowest expected cost or latency according to its ModelProfile.
+    So short documents go to a cheap small-context model and a document is only split
+    (or truncated, see long_document_handling_variant) if it doesn't fit into any of the models,
+    in which case the model with the largest context is used.
+
+    Every document is tokenized once, the token count is used for routing and for splitting.
+
+    self.stats["routed_documents"][i] counts the documents that were sent to the model of routes[i].
+    """
+
+    def __init__(
+        self,
+        keys: List[str],
+        routes: List[Tuple[LargeLanguageModel, ModelProfile]],
+        pdf_to_text_model: AbstractPDFToTextModel,
+        prompt_variant: Prompt,
+        long_document_handling_variant: LONG_DOCUMENT_HANDLING_VARIANTS,
+        parser: Parser,
+        shots: Optional[List[str]],
+        routing_objective: ROUTING_OBJECTIVES = ROUTING_OBJECTIVES.COST,
+        **kwargs,
+    ):
+        """
+        :param routes: the models to choose from and their price and speed
+        :param routing_objective: what to minimize when several models fit a document
+        :param kwargs: see LLMPipeline (max_workers, early_exit, ...)
+        """
+        # documents that don't fit into any of the models are split for the largest one (self.model)
+        self._largest_route = max(
+            range(len(routes)), key=lambda i: routes[i][0].max_input_tokens
+        )
+        super().__init__(
+            keys=keys,
+            model=routes[self._largest_route][0],
+            pdf_to_text_model=pdf_to_text_model,
+            prompt_variant=prompt_variant,
+            long_document_handling_variant=long_document_handling_variant,
+            parser=parser,
+            shots=shots,
+            **kwargs,
+        )
+        self.routes = routes
+        self.routing_objective = routing_objective
+        # per route and not per model name, two routes may well have models with the same repr
+        self.stats["routed_documents"] = [0] * len(routes)
+
+    def __repr__(self):
+        return f"RouterLLMPipeline(prompt_variant={self.prompt_variant}, models={[model for model, _ in self.routes]}, parser={self.parser}, shots={self.prompt_variant.shots})"
+
+    def _get_subdocuments_and_model(
+        self, text: str
+    ) -> Tuple[List[str], List[int], LargeLanguageModel]:
+        tokenized_document = self.tokenize(text)
+        number_of_tokens_model_input = (
+            self.prompt_variant.get_model_input_number_of_tokens(
+                len(tokenized_document["input_ids"])
+            )
+        )
+        route = select_route(
+            self.routes, number_of_tokens_model_input, self.routing_objective
+        )
+
+        if route is None:  # too long for all models
+            route = self._largest_route
+            subdocuments = self._get_subdocuments_with_number_of_tokens(
+                text, tokenized_document
+            )
+        else:
+            subdocuments = [(text, len(tokenized_document["input_ids"]))]
+        subdocuments, numbers_of_tokens = self._to_model_input_numbers_of_tokens(
+            subdocuments
+        )
+        model = self.routes[route][0]
+
+        logger.info(
+            f"Routed document with {number_of_tokens_model_input} tokens to route {route} ({model})"
+        )
+        with self._stats_lock:
+            self.stats["routed_documents"][route] += 1
+        return subdocuments, numbers_of_tokens, model
 
 
 class BaselinePipeline(AbstractPipeline):
@@ -291,6 +987,7 @@ class BaselinePipeline(AbstractPipeline):
         ner_tagger: NER_TAGGERS,
         error_percentage: float,
         allowed_entity_range: int,
+        max_workers: int = 1,
     ):
         super().__init__(
             keys=keys,
@@ -301,18 +998,16 @@ class BaselinePipeline(AbstractPipeline):
             ),
             pdf_to_text_model=pdf_to_text_model,
             parser=parser,
+            max_workers=max_workers,
         )
 
     def __repr__(self):
         return f"BaselinePipeline(pdf_to_text_model={self.pdf_to_text_model}, model={self.model}, parser={self.parser}, ner_tagger={self.model.ner_tagger})"
 
-    def predict(self, file_path: Union[str, Path]) -> Union[dict, str]:
+    def predict_with_model_output(
+        self, file_path: Union[str, Path]
+    ) -> Tuple[str, Union[dict, str]]:
         text = self.pdf_to_text_model.get_text(file_path)
         model_output = self.model.predict(text, self.keys)
         parsed_output = self.parser.parse_model_output(model_output, self.keys)
-        return parsed_output
-
-    def predict_directory(
-        self, directory_path: Union[str, Path]
-    ) -> Union[List[dict], List[str]]:
-        pass
+        return model_output, parsed_output
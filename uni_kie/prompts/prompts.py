@@ -1,6 +1,6 @@
 from typing import List, Optional
 
-from transformers import GPT2TokenizerFast
+from uni_kie.constants import TOKENIZERS
 
 STOP_KEY = "\n<|stop key|>"
 
@@ -25,33 +25,30 @@ class Prompt:
 class NeutralPrompt(Prompt):
     def __init__(self, prompt_keys: List[str], shots: Optional[List[dict]] = None):
         super().__init__(prompt_keys=prompt_keys)
-        self.prompt_text = f'\n\nExtract {self._key_list_to_string(self.prompt_keys + [STOP_KEY[1:]])} from the document above. If you can\'t find a key-value pair in the document set the value to "null".\n\nKey: Value\n{self.prompt_keys[0]}:'
-        self.tokenized_prompt_text = GPT2TokenizerFast.from_pretrained("gpt2")(
-            self.prompt_text
-        )  # TODO: use constants.py (can't because circular import)
-        self.prompt_number_of_tokens = len(self.tokenized_prompt_text["input_ids"])
+        tokenizer = TOKENIZERS.GPT2_TOKENIZER_FAST
+
+        self.prompt_text = self._get_prompt_text(self.prompt_keys)
+        self.prompt_text_input_ids = tokenizer(self.prompt_text)["input_ids"]
+        self.prompt_number_of_tokens = len(self.prompt_text_input_ids)
         self.prompt_char_length = len(self.prompt_text)
         self.start_of_document = ""
         self.end_of_document = ""
 
         self.shots = False
-        self.model_input_shots_number_of_tokens = 0
+        self.model_input_shots = ""
+        self.model_input_shots_input_ids = []
 
         if shots:
             self.shots = True
-            self.model_input_shots = ""
             self.start_of_document = (
                 "Find below the OCR'd text of an example document:\n###\n"
             )
             for shot in shots:
                 self.model_input_shots += f"{self.start_of_document}{shot['input']}{self.end_of_document}{self.prompt_text}{shot['target_model_output']}\n"
 
-            self.tokenized_model_input_shots = GPT2TokenizerFast.from_pretrained(
-                "gpt2"
-            )(self.model_input_shots)
-            self.model_input_shots_number_of_tokens = len(
-                self.tokenized_model_input_shots["input_ids"]
-            )
+            self.model_input_shots_input_ids = tokenizer(self.model_input_shots)[
+                "input_ids"
+            ]
 
             # modify the start and end of document for the actual model input (i.e. the new document)
             self.start_of_document = (
@@ -61,31 +58,51 @@ class NeutralPrompt(Prompt):
 
             # for future work, we might also want to change the prompt text for the actual model input (i.e. the new document)
             # self.prompt_text = f'\n\nExtract {self._key_list_to_string(self.prompt_keys + [STOP_KEY[1:]])} from the document above. If you can\'t find a key-value pair in the document set the value to "null". Your solution cannot be identical to the example.\n\nKey: Value\n{self.prompt_keys[0]}:'
-            # self.tokenized_prompt_text = GPT2TokenizerFast.from_pretrained("gpt2")(
-            #     self.prompt_text
-            # )
-            # self.prompt_number_of_tokens = len(self.tokenized_prompt_text["input_ids"])
+            # self.prompt_text_input_ids = tokenizer(self.prompt_text)["input_ids"]
+            # self.prompt_number_of_tokens = len(self.prompt_text_input_ids)
             # self.prompt_char_length = len(self.prompt_text)
 
-        self.tokenized_start_of_document = GPT2TokenizerFast.from_pretrained("gpt2")(
-            self.start_of_document
-        )
-        self.start_of_document_number_of_tokens = len(
-            self.tokenized_start_of_document["input_ids"]
-        )
-        self.tokenized_end_of_document = GPT2TokenizerFast.from_pretrained("gpt2")(
-            self.end_of_document
-        )
-        self.end_of_document_number_of_tokens = len(
-            self.tokenized_end_of_document["input_ids"]
-        )
+        self.model_input_shots_number_of_tokens = len(self.model_input_shots_input_ids)
+        self.start_of_document_input_ids = tokenizer(self.start_of_document)[
+            "input_ids"
+        ]
+        self.start_of_document_number_of_tokens = len(self.start_of_document_input_ids)
+        self.end_of_document_input_ids = tokenizer(self.end_of_document)["input_ids"]
+        self.end_of_document_number_of_tokens = len(self.end_of_document_input_ids)
 
     def __repr__(self):
         return super().__repr__()
 
-    def get_model_input(self, input_doc: str) -> str:
+    def _get_prompt_text(self, prompt_keys: List[str]) -> str:
+        return f'\n\nExtract {self._key_list_to_string(prompt_keys + [STOP_KEY[1:]])} from the document above. If you can\'t find a key-value pair in the document set the value to "null".\n\nKey: Value\n{prompt_keys[0]}:'
+
+    def get_model_input(
+        self, input_doc: str, prompt_keys: Optional[List[str]] = None
+    ) -> str:
+        """
+        :param prompt_keys: only ask for these keys (a subset of self.prompt_keys in the same order,
+            e.g. the keys that earlier subdocuments left null) instead of all keys. The shots stay the same.
+        """
+        prompt_text = (
+            self.prompt_text
+            if prompt_keys is None or prompt_keys == self.prompt_keys
+            else self._get_prompt_text(prompt_keys)
+        )
         if self.shots:
-            return f"{self.model_input_shots}{self.start_of_document}{input_doc}{self.end_of_document}{self.prompt_text}"
+            return f"{self.model_input_shots}{self.start_of_document}{input_doc}{self.end_of_document}{prompt_text}"
 
         else:
-            return f"{self.start_of_document}{input_doc}{self.end_of_document}{self.prompt_text}"
+            return f"{self.start_of_document}{input_doc}{self.end_of_document}{prompt_text}"
+
+    def get_model_input_number_of_tokens(self, input_doc_number_of_tokens: int) -> int:
+        """
+        Number of tokens of get_model_input(input_doc) given the number of tokens of input_doc,
+        computed from the pre-tokenized segments (i.e. without tokenizing the model input).
+        """
+        return (
+            self.model_input_shots_number_of_tokens
+            + self.start_of_document_number_of_tokens
+            + input_doc_number_of_tokens
+            + self.end_of_document_number_of_tokens
+            + self.prompt_number_of_tokens
+        )
@@ -0,0 +1,60 @@
+import importlib
+import threading
+from functools import lru_cache
+from typing import Any, Callable
+
+from uni_kie import create_logger
+
+logger = create_logger(__name__)
+
+_NOT_LOADED = object()
+
+
+class LazyAttribute:
+    """
+    A class attribute whose value is only created when it is accessed for the first time
+    and then shared by the whole process (thread-safe).
+
+    Used in constants.py so that e.g. importing MODELS doesn't import transformers, openai
+    or spacy before they are actually selected.
+    """
+
+    def __init__(self, factory: Callable[[], Any]):
+        self.factory = factory
+        self.value = _NOT_LOADED
+        self._lock = threading.Lock()
+
+    def __get__(self, instance, owner) -> Any:
+        if self.value is _NOT_LOADED:
+            with self._lock:
+                if self.value is _NOT_LOADED:
+                    self.value = self.factory()
+        return self.value
+
+
+def lazy_import(module: str, name: str) -> LazyAttribute:
+    return LazyAttribute(lambda: getattr(importlib.import_module(module), name))
+
+
+def load_pretrained_tokenizer(name: str):
+    """
+    Loads a (fast) tokenizer from the local huggingface cache and only
+    goes online if it isn't cached yet.
+    """
+    from transformers import AutoTokenizer
+
+    try:
+        return AutoTokenizer.from_pretrained(name, local_files_only=True)
+    except OSError:  # not in the local cache yet
+        logger.info(f"Tokenizer {name} not found in local cache, downloading it")
+        return AutoTokenizer.from_pretrained(name)
+
+
+@lru_cache(maxsize=None)
+def load_spacy_model(name: str):
+    """
+    Loads a spacy pipeline once per process (e.g. multiple baseline models share it).
+    """
+    import spacy
+
+    return spacy.load(name)
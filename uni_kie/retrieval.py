@@ -0,0 +1,154 @@
+import math
+from collections import Counter
+from typing import Dict, List, Optional
+
+import numpy as np
+import regex
+
+from uni_kie import create_logger
+from uni_kie.models.baseline import get_best_match_span
+
+logger = create_logger(__name__)
+
+
+def tokenize(text: str) -> List[str]:
+    return regex.findall(r"\w+", text.lower())
+
+
+class BM25:
+    """
+    Okapi BM25 over a (small) collection of chunks, e.g. the chunks of a single document.
+
+    :param chunks: the texts to score
+    :param k1: term frequency saturation
+    :param b: length normalization
+    """
+
+    def __init__(self, chunks: List[str], k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.term_frequencies = [Counter(tokenize(chunk)) for chunk in chunks]
+        self.chunk_lengths = np.array(
+            [sum(term_frequency.values()) for term_frequency in self.term_frequencies]
+        )
+        self.average_chunk_length = max(self.chunk_lengths.mean(), 1) if chunks else 1
+
+        document_frequencies = Counter()
+        for term_frequency in self.term_frequencies:
+            document_frequencies.update(term_frequency.keys())
+        number_of_chunks = len(chunks)
+        self.idf = {
+            term: math.log((number_of_chunks - frequency + 0.5) / (frequency + 0.5) + 1)
+            for term, frequency in document_frequencies.items()
+        }
+
+    def get_scores(self, query: str) -> np.ndarray:
+        scores = np.zeros(len(self.term_frequencies))
+        length_normalization = self.k1 * (
+            1 - self.b + self.b * self.chunk_lengths / self.average_chunk_length
+        )
+        for term in set(tokenize(query)):
+            if term not in self.idf:
+                continue
+            frequencies = np.array(
+                [term_frequency[term] for term_frequency in self.term_frequencies]
+            )
+            scores += (
+                self.idf[term]
+                * frequencies
+                * (self.k1 + 1)
+                / (frequencies + length_normalization)
+            )
+        return scores
+
+
+class ChunkRetriever:
+    """
+    Selects the chunks of a long document that most likely contain the values of the keys,
+    so that only those are sent to the model instead of every subdocument.
+
+    A chunk is scored per key with BM25 on the key and its synonyms (e.g. "Year Ended" for
+    "Period End Date"), plus fuzzy_match_bonus for every synonym that fuzzily matches
+    in the chunk (the same matching as the baseline models, which is robust to OCR errors).
+
+    :param synonyms: alternative names of the keys (keys without synonyms are searched for as they are),
+        e.g. KLEISTER_CHARITY_CONSTANTS.SYNONYMS
+    :param error_percentage: allowed errors of a fuzzy match in percent of the length of the synonym
+    :param fuzzy_match_bonus: added to the BM25 score for every synonym that fuzzily matches
+    """
+
+    def __init__(
+        self,
+        synonyms: Optional[Dict[str, List[str]]] = None,
+        error_percentage: float = 0.2,
+        fuzzy_match_bonus: float = 1.0,
+    ):
+        self.synonyms = synonyms or {}
+        self.error_percentage = error_percentage
+        self.fuzzy_match_bonus = fuzzy_match_bonus
+
+    def __repr__(self):
+        return f"ChunkRetriever(error_percentage={self.error_percentage}, fuzzy_match_bonus={self.fuzzy_match_bonus})"
+
+    def get_scores(self, chunks: List[str], keys: List[str]) -> Dict[str, np.ndarray]:
+        """
+        Returns the score of every chunk for every key.
+        """
+        bm25 = BM25(chunks)
+        scores = {}
+        for key in keys:
+            synonyms = self.synonyms.get(key, [key])
+            key_scores = bm25.get_scores(" ".join(synonyms))
+            for synonym in synonyms:
+                key_scores += self.fuzzy_match_bonus * np.array(
+                    [
+                        get_best_match_span(
+                            chunk, regex.escape(synonym), self.error_percentage
+                        )
+                        is not None
+                        for chunk in chunks
+                    ]
+                )
+            scores[key] = key_scores
+        return scores
+
+    def select(
+        self,
+        chunks: List[str],
+        chunk_costs: List[int],
+        keys: List[str],
+        top_k: int,
+        budget: int,
+    ) -> List[int]:
+        """
+        Returns the indices (in document order) of the chunks to send to the model: the best
+        chunk of every key, then the second best of every key, ... (at most top_k per key)
+        as long as the sum of their costs (i.e. number of tokens) stays within budget.
+
+        Chunks with the same score are ranked in document order, so if no key is found at all
+        the beginning of the document is selected.
+        """
+        scores = self.get_scores(chunks, keys)
+        rankings = {
+            key: np.argsort(-key_scores, kind="stable")[:top_k]
+            for key, key_scores in scores.items()
+        }
+
+        selected = set()
+        used_budget = 0
+        for rank in range(top_k):
+            for key in keys:
+                if rank >= len(rankings[key]):
+                    continue
+                chunk_index = int(rankings[key][rank])
+                if chunk_index in selected:
+                    continue
+                if used_budget + chunk_costs[chunk_index] > budget:
+                    continue  # a shorter chunk (e.g. the last one) may still fit
+                selected.add(chunk_index)
+                used_budget += chunk_costs[chunk_index]
+
+        logger.info(
+            f"Selected {len(selected)} of {len(chunks)} chunks ({used_budget} of {budget} tokens)."
+        )
+        return sorted(selected)